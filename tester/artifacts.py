@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List
+
+# Name of the metadata file stored in every cache entry
+METADATA_FILE_NAME = "metadata.json"
+
+
+def _get_directory_size(path: str) -> int:
+    size = 0
+    for directory_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            file_path = os.path.join(directory_path, file_name)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+
+    return size
+
+
+def _ignore_existing_files(source: str, destination: str):
+    # Ignore files already present in the destination, directories are still
+    # merged.
+    def ignore(directory_path: str, names: List[str]) -> List[str]:
+        destination_path = os.path.join(
+            destination, os.path.relpath(directory_path, source)
+        )
+        ignored_names = []
+        for name in names:
+            path = os.path.join(destination_path, name)
+            if os.path.lexists(path) and not os.path.isdir(path):
+                ignored_names.append(name)
+
+        return ignored_names
+
+    return ignore
+
+
+class ArtifactCache:
+    """
+    Local store of build artifacts keyed by revision hash and build configuration.
+
+    Every entry is a directory with one subdirectory per stored artifact
+    directory. Entries not used for the longest time are evicted once the total
+    size exceeds the quota.
+    """
+
+    def __init__(self, path: str, max_size: int) -> None:
+        self.PATH = path
+        self.MAX_SIZE = max_size
+        os.makedirs(self.PATH, exist_ok=True)
+
+    @staticmethod
+    def get_key(revision_hash: str, build_configuration: List[str]) -> str:
+        """
+        Get the cache key for artifacts of the given revision built with the given
+        configuration (e.g. CMake arguments).
+        """
+        key_data = "\n".join([revision_hash] + build_configuration)
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+    def restore(self, key: str, destinations: Dict[str, str]) -> bool:
+        """
+        Replace the given destinations (artifact name -> directory path) with the
+        cached artifact directories of the given key. Files of a destination not
+        stored in the cache (e.g. build system files) are kept.
+
+        Every destination is assembled in a temporary directory next to it and
+        swapped in with a rename, so an interrupted restore never leaves a mix of
+        two builds. Restored files keep their original modification times.
+
+        Returns True on cache hit and False on cache miss.
+        """
+        entry_path = os.path.join(self.PATH, key)
+        if not os.path.isdir(entry_path):
+            return False
+
+        for name in destinations:
+            if not os.path.isdir(os.path.join(entry_path, name)):
+                return False
+
+        temporary_paths = {}
+        try:
+            for name, destination in destinations.items():
+                destination = os.path.normpath(destination)
+                temporary_path = destination + ".restore" + str(os.getpid())
+                shutil.rmtree(temporary_path, ignore_errors=True)
+                temporary_paths[destination] = temporary_path
+
+                shutil.copytree(
+                    os.path.join(entry_path, name), temporary_path, symlinks=True
+                )
+                if os.path.isdir(destination):
+                    shutil.copytree(
+                        destination,
+                        temporary_path,
+                        symlinks=True,
+                        ignore=_ignore_existing_files(destination, temporary_path),
+                        dirs_exist_ok=True,
+                    )
+        except BaseException:
+            for temporary_path in temporary_paths.values():
+                shutil.rmtree(temporary_path, ignore_errors=True)
+            raise
+
+        for destination, temporary_path in temporary_paths.items():
+            old_path = destination + ".old" + str(os.getpid())
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.isdir(destination):
+                os.rename(destination, old_path)
+            os.rename(temporary_path, destination)
+            shutil.rmtree(old_path, ignore_errors=True)
+
+        # Mark the entry as recently used.
+        os.utime(entry_path)
+        return True
+
+    def store(
+        self, key: str, sources: Dict[str, str], ignored_patterns: List[str] = None
+    ) -> None:
+        """
+        Copy the given artifact directories (artifact name -> directory path) into
+        the cache under the given key and evict old entries above the quota.
+        Files and directories matching any of the ignored glob patterns are not
+        stored.
+        """
+        entry_path = os.path.join(self.PATH, key)
+        if os.path.isdir(entry_path):
+            os.utime(entry_path)
+            return
+
+        # Copy into a temporary directory first so an interrupted copy never
+        # looks like a complete entry.
+        temporary_entry_path = entry_path + ".tmp" + str(os.getpid())
+        shutil.rmtree(temporary_entry_path, ignore_errors=True)
+        for name, source in sources.items():
+            shutil.copytree(
+                source,
+                os.path.join(temporary_entry_path, name),
+                symlinks=True,
+                ignore=shutil.ignore_patterns(*(ignored_patterns or [])),
+            )
+
+        metadata = {
+            "size": _get_directory_size(temporary_entry_path),
+            "date_added": time.time(),
+        }
+        with open(os.path.join(temporary_entry_path, METADATA_FILE_NAME), "w") as file:
+            json.dump(metadata, file)
+
+        os.rename(temporary_entry_path, entry_path)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Delete least recently used entries until the cache fits in the quota.
+        """
+        entries = []
+        for key in os.listdir(self.PATH):
+            entry_path = os.path.join(self.PATH, key)
+            metadata_path = os.path.join(entry_path, METADATA_FILE_NAME)
+            if not os.path.isfile(metadata_path):
+                continue
+
+            with open(metadata_path) as metadata_file:
+                size = json.load(metadata_file)["size"]
+            entries.append((os.stat(entry_path).st_mtime, size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.MAX_SIZE:
+                break
+
+            print(f"Evicting build artifacts {os.path.basename(entry_path)}")
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= size
@@ -1,10 +1,21 @@
+from contextlib import ExitStack
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
+import json
+import os
+import queue
+import random
+import shutil
+import threading
 import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
 
 import requests
 from requests import adapters, auth
 
+from config import CONFIG
 from results import LITResult, CTSResult
 
 
@@ -21,13 +32,53 @@ def retry_request(request_function, **kwargs):
         except requests.exceptions.ConnectionError:
             print(f"Connection error after {str(time_between_tries)} seconds!")
         except requests.exceptions.HTTPError as exception:
-            if exception.response.status_code == 404:
+            # Missing jobs and jobs no longer dispatched to this runner (409)
+            # are reported by the caller.
+            if exception.response.status_code in (404, 409):
                 return exception.response
 
             print(f"HTTP error after {str(time_between_tries)} seconds!")
     raise
 
 
+def _serialize_lit_result(result: LITResult) -> dict:
+    """
+    Get the API representation of a LIT result.
+    """
+    return {
+        "test_path": result.test_path,
+        "passing": result.passing,
+        "rerun_count": result.rerun_count,
+        "rerun_pass_count": result.rerun_pass_count,
+    }
+
+
+def _serialize_cts_result(result: CTSResult) -> dict:
+    """
+    Get the API representation of a CTS result (without the dump).
+    """
+    return {
+        "test_category": result.test_category,
+        "test_name": result.test_name,
+        "timedout": result.timedout,
+        "passing": result.passing,
+        "start_time": datetime.isoformat(result.start_time)[:-3] + "Z",
+        "end_time": datetime.isoformat(result.end_time)[:-3] + "Z",
+        "standard_output": result.standard_output,
+        "standard_error": result.standard_error,
+        "test_executable": result.test_executable,
+        "test_arguments": result.test_arguments,
+        "suite_version": result.suite_version,
+        "igc_version": result.igc_version,
+        "neo_version": result.neo_version,
+        "dump_policy": DumpPolicy[result.dump_policy.upper()].value,
+        "rerun_passing": result.rerun_passing,
+        "rerun_count": result.rerun_count,
+        "rerun_pass_count": result.rerun_pass_count,
+        "output_truncated": result.output_truncated,
+    }
+
+
 class JobStatus(Enum):
     SKIPPED = "S"
     QUEUED = "Q"
@@ -35,6 +86,30 @@ class JobStatus(Enum):
     TESTING = "T"
     COMPLETED = "C"
     BUILD_FAILED = "F"
+    DEFERRED = "W"
+
+
+class LitSelection(Enum):
+    ALL = "A"
+    AFFECTED_FIRST = "F"
+    AFFECTED_ONLY = "O"
+
+
+class DumpPolicy(Enum):
+    ALWAYS = "A"
+    ON_FAILURE = "F"
+    NEVER = "N"
+
+
+@dataclass
+class QueuedJob:
+    pk: int = None
+    revision_hash: str = None
+    scheduled_testgroups: Dict[str, bool] = field(default_factory=dict)
+    lit_selection: LitSelection = LitSelection.ALL
+    changed_files: List[str] = field(default_factory=list)
+    selected_lit_tests: List[str] = field(default_factory=list)
+    selected_cts_tests: List[str] = field(default_factory=list)
 
 
 class APISession:
@@ -51,9 +126,18 @@ class APISession:
             adapters.HTTPAdapter(),
         )
 
-    def get_queued_job(self):
+    def clone(self) -> "APISession":
+        """
+        Create a new session with the same API endpoint and credentials, e.g. for
+        use from another thread.
+        """
+        return APISession(
+            self.API_ENDPOINT, self.SESSION.auth.username, self.SESSION.auth.password
+        )
+
+    def get_queued_job(self) -> Optional[QueuedJob]:
         """
-        Get a tuple representing a job for testing or None.
+        Get a job for testing or None.
         Sending this request automatically marks the job as "Dispatched".
         """
         # Deliberately send "POST" request since dispatching changes database data.
@@ -61,18 +145,64 @@ class APISession:
 
         if response.status_code == 204:
             # No jobs for testing available.
-            return (None, None, None)
+            return None
 
         data = response.json()
 
-        pk = data["pk"]
-        revision_hash = data["revision_hash"]
-        scheduled_testgroups = {}
+        job = QueuedJob(
+            data["pk"],
+            data["revision_hash"],
+            lit_selection=LitSelection(data["lit_selection"]),
+            changed_files=data["changed_files"],
+            selected_lit_tests=data["selected_lit_tests"],
+            selected_cts_tests=data["selected_cts_tests"],
+        )
         for key in data:
             if key.startswith("run_"):
-                scheduled_testgroups[key[len("run_") :]] = data[key]
+                job.scheduled_testgroups[key[len("run_") :]] = data[key]
 
-        return (pk, revision_hash, scheduled_testgroups)
+        # Warn about scheduled CTS categories this runner has no tests for.
+        for testgroup, scheduled in job.scheduled_testgroups.items():
+            if testgroup.startswith("cts_") and scheduled:
+                if not CONFIG.get_cts_tests_in_category(testgroup[len("cts_") :]):
+                    print(f"No OpenCL CTS tests defined for scheduled {testgroup}")
+
+        return job
+
+    def get_requested_outputs(self) -> List[dict]:
+        """
+        Get test runs whose full output was requested, each with the result's
+        primary key (pk), revision_hash, test_category, test_name and start_time.
+        """
+        response = retry_request(
+            self.SESSION.get, url=self.API_ENDPOINT + "outputs/requested/"
+        )
+
+        if response.status_code == 404:
+            # The API does not support full output requests.
+            return []
+
+        return [
+            dict(
+                data,
+                start_time=datetime.fromisoformat(data["start_time"].rstrip("Z")),
+            )
+            for data in response.json()
+        ]
+
+    def post_full_output(self, pk: int, output_path: str) -> None:
+        """
+        Upload the full output of a CTS result with a given primary key (pk).
+        """
+        with open(output_path, "rb") as output_file:
+            response = retry_request(
+                self.SESSION.post,
+                url=self.API_ENDPOINT + "cts/" + str(pk) + "/output/",
+                files={"full_output": output_file},
+            )
+
+        if response.status_code == 404:
+            raise ValueError("Result with specified primary key (pk) does not exist")
 
     def get_job_status(self, pk: int) -> JobStatus:
         """
@@ -88,19 +218,70 @@ class APISession:
         data = response.json()
         return JobStatus(data["status"])
 
-    def update_job_status(self, pk: int, status: JobStatus) -> None:
+    def get_test_durations(self) -> Dict[Tuple[str, str], float]:
+        """
+        Get the median durations in seconds of CTS tests in recently completed jobs
+        keyed by (test category, test name). Sends a single request without
+        retrying, since the durations are optional.
+        """
+        response = self.SESSION.get(url=self.API_ENDPOINT + "durations/", timeout=60)
+        response.raise_for_status()
+
+        return {
+            (data["test_category"], data["test_name"]): data["median_duration"]
+            for data in response.json()
+        }
+
+    def renew_job_lease(self, pk: int, progress: dict = None) -> bool:
+        """
+        Renew the lease of a job with given primary key (pk) dispatched to this
+        runner and report its progress (current_test, tests_done and
+        tests_remaining). Sends a single request without retrying.
+
+        Returns False if the job was cancelled or is no longer leased to this
+        runner and True otherwise.
+        """
+        response = self.SESSION.post(
+            url=self.API_ENDPOINT + "job/" + str(pk) + "/lease/",
+            json=progress or {},
+            timeout=60,
+        )
+
+        if response.status_code == 404:
+            raise ValueError("Job with specified primary key (pk) does not exist")
+
+        if response.status_code == 403:
+            # The lease expired and the job was dispatched to another runner.
+            return False
+
+        response.raise_for_status()
+        return not response.json()["cancelled"]
+
+    def update_job_status(
+        self, pk: int, status: JobStatus, status_details: str = None
+    ) -> None:
         """
-        Update status of a job with given primary key (pk).
+        Update status (and optionally status details) of a job with given primary
+        key (pk).
         """
+        data = {"status": status.value}
+        if status_details is not None:
+            data["status_details"] = status_details
+
         response = retry_request(
             self.SESSION.put,
             url=self.API_ENDPOINT + "job/" + str(pk) + "/",
-            data={"status": status.value},
+            data=data,
         )
 
         if response.status_code == 404:
             raise ValueError("Job with specified primary key (pk) does not exist")
 
+        if response.status_code == 409:
+            # The lease expired and the job was dispatched to another runner.
+            print(f"Job {pk} is no longer dispatched to this runner")
+            return
+
         response.raise_for_status()
 
     def post_lit_result(self, pk: int, result: LITResult) -> None:
@@ -110,7 +291,7 @@ class APISession:
         response = retry_request(
             self.SESSION.post,
             url=self.API_ENDPOINT + "job/" + str(pk) + "/lit/",
-            data={"test_path": result.test_path, "passing": result.passing},
+            data=_serialize_lit_result(result),
         )
 
         if response.status_code == 404:
@@ -120,30 +301,569 @@ class APISession:
         """
         Post a CTS result for a job with a given primary key (pk).
         """
-        files = {}
-        if result.dump_path:
-            files = {"dump": open(result.dump_path, "rb")}
+        with ExitStack() as stack:
+            files = {}
+            if result.dump_path:
+                files = {"dump": stack.enter_context(open(result.dump_path, "rb"))}
+
+            response = retry_request(
+                self.SESSION.post,
+                url=self.API_ENDPOINT + "job/" + str(pk) + "/cts/",
+                data=_serialize_cts_result(result),
+                files=files,
+            )
+
+        if response.status_code == 404:
+            raise ValueError("Job with specified primary key (pk) does not exist")
 
+    def post_lit_results(self, pk: int, results: List[LITResult]) -> None:
+        """
+        Post many LIT results at once for a job with a given primary key (pk).
+        """
         response = retry_request(
             self.SESSION.post,
-            url=self.API_ENDPOINT + "job/" + str(pk) + "/cts/",
+            url=self.API_ENDPOINT + "job/" + str(pk) + "/lit/bulk/",
+            json=[_serialize_lit_result(result) for result in results],
+        )
+
+        if response.status_code == 404:
+            raise ValueError("Job with specified primary key (pk) does not exist")
+
+    def post_cts_results(self, pk: int, results: List[CTSResult]) -> None:
+        """
+        Post many CTS results at once for a job with a given primary key (pk).
+        """
+        with ExitStack() as stack:
+            files = {}
+            for index, result in enumerate(results):
+                if result.dump_path:
+                    files["dump_" + str(index)] = stack.enter_context(
+                        open(result.dump_path, "rb")
+                    )
+
+            response = retry_request(
+                self.SESSION.post,
+                url=self.API_ENDPOINT + "job/" + str(pk) + "/cts/bulk/",
+                data={
+                    "results": json.dumps(
+                        [_serialize_cts_result(result) for result in results]
+                    )
+                },
+                files=files,
+            )
+
+        if response.status_code == 404:
+            raise ValueError("Job with specified primary key (pk) does not exist")
+
+
+def get_lit_result_size(result: LITResult) -> int:
+    """
+    Get the number of bytes a LIT result adds to a posted batch.
+    """
+    return len(json.dumps(_serialize_lit_result(result)).encode())
+
+
+def get_cts_result_size(result: CTSResult) -> int:
+    """
+    Get the number of bytes a CTS result adds to a posted batch (without the dump).
+    """
+    return len(json.dumps(_serialize_cts_result(result)).encode())
+
+
+class ResultBatch:
+    """
+    Collects results and posts them together once batch_size results are
+    collected, their serialized size would exceed batch_max_bytes, or
+    batch_interval seconds passed since the oldest one was added. Batches due by
+    time are posted from a background thread, so results are not held back while
+    a long test runs. Remaining results are posted when leaving the "with" block,
+    also when it is left with an exception.
+
+    Results are posted outside of the lock protecting the collected results, so
+    adding results never waits for a request made by the background thread.
+    Batches are still posted in the order their results were added.
+    """
+
+    def __init__(
+        self,
+        post_function: Callable[[list], None],
+        batch_size: int,
+        batch_interval: int,
+        batch_max_bytes: int,
+        result_size_function: Callable[[object], int],
+    ) -> None:
+        self.POST_FUNCTION = post_function
+        self.BATCH_SIZE = batch_size
+        self.BATCH_INTERVAL = batch_interval
+        self.BATCH_MAX_BYTES = batch_max_bytes
+        self.RESULT_SIZE_FUNCTION = result_size_function
+        self.results = []
+        self.results_bytes = 0
+        self.oldest_result_time = None
+        self.condition = threading.Condition()
+        self.post_lock = threading.Lock()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.thread.join()
+
+        # Results of tests that already ran are valid even if the testing loop
+        # failed, the exception propagates after posting them.
+        self.flush()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self.condition:
+                if self.stopped:
+                    return
+
+                if not self.results:
+                    self.condition.wait()
+                    continue
+
+                time_left = (
+                    self.oldest_result_time + self.BATCH_INTERVAL - time.monotonic()
+                )
+                if time_left > 0:
+                    self.condition.wait(time_left)
+                    continue
+
+            self.flush()
+
+    def add(self, result) -> None:
+        """
+        Add a result to the batch and post the batch if it is due.
+        """
+        result_bytes = self.RESULT_SIZE_FUNCTION(result)
+
+        # Post the collected results first if the result would make the request
+        # too large for the API to accept.
+        with self.condition:
+            too_large = self.results_bytes + result_bytes > self.BATCH_MAX_BYTES
+        if too_large:
+            self.flush()
+
+        with self.condition:
+            if not self.results:
+                self.oldest_result_time = time.monotonic()
+                # Start waiting for the interval of the new batch.
+                self.condition.notify()
+            self.results.append(result)
+            self.results_bytes += result_bytes
+
+            due = (
+                len(self.results) >= self.BATCH_SIZE
+                or time.monotonic() - self.oldest_result_time >= self.BATCH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Post all collected results.
+        """
+        # The post lock is taken before the results, so batches are posted in
+        # the order they were taken.
+        with self.post_lock:
+            with self.condition:
+                results = self.results
+                self.results = []
+                self.results_bytes = 0
+
+            if results:
+                self.POST_FUNCTION(results)
+
+
+class JobLease:
+    """
+    Renews the lease of a job every renewal_interval seconds from a background
+    thread while inside the "with" block, reports the latest progress and records
+    a cancellation reported by the API.
+    """
+
+    def __init__(self, session: APISession, pk: int, renewal_interval: int) -> None:
+        self.SESSION = session
+        self.PK = pk
+        self.RENEWAL_INTERVAL = renewal_interval
+        self.progress = {}
+        self.cancelled = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._renew_loop, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def _renew_loop(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                if not self.SESSION.renew_job_lease(self.PK, self.progress):
+                    print(f"Job {self.PK} was cancelled")
+                    self.cancelled.set()
+                    return
+            except (requests.exceptions.RequestException, ValueError) as exception:
+                # Keep testing, the lease is renewed again in the next interval.
+                print(f"Renewing lease of job {self.PK} failed: {exception}")
+
+            self.stopped.wait(self.RENEWAL_INTERVAL)
+
+    def update_progress(
+        self, current_test: str, tests_done: int, tests_remaining: int
+    ) -> None:
+        """
+        Set the progress reported with the next lease renewal.
+        """
+        self.progress = {
+            "current_test": current_test[:250],
+            "tests_done": tests_done,
+            "tests_remaining": tests_remaining,
+        }
+
+    def is_cancelled(self) -> bool:
+        """
+        Check whether the API reported the job as cancelled.
+        """
+        return self.cancelled.is_set()
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests for reset_timeout seconds after failure_threshold
+    consecutive failures, then lets a single trial request through.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.FAILURE_THRESHOLD = failure_threshold
+        self.RESET_TIMEOUT = reset_timeout
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def get_wait_time(self) -> float:
+        """
+        Get the number of seconds until the next request may be sent.
+        """
+        return max(0.0, self.open_until - time.monotonic())
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.FAILURE_THRESHOLD:
+            print(f"API unreachable, pausing uploads for {self.RESET_TIMEOUT} seconds")
+            self.open_until = time.monotonic() + self.RESET_TIMEOUT
+
+
+class BackgroundUploader:
+    """
+    Sends result uploads and job status updates to the API from a background
+    thread, in the order they were submitted.
+
+    Every upload is first persisted (together with its files) to the spool
+    directory and deleted only after the API accepted it, so pending uploads
+    survive a runner restart and are sent when the uploader is created again.
+    Rejected uploads are kept in a subdirectory of the spool.
+    """
+
+    # Backoff of retried uploads: the delay is a random number of seconds between
+    # zero and min(MAX_BACKOFF, BASE_BACKOFF * 2^attempt).
+    BASE_BACKOFF = 5
+    MAX_BACKOFF = 30 * 60
+
+    # Pause all uploads for CIRCUIT_RESET_TIMEOUT seconds after
+    # CIRCUIT_FAILURE_THRESHOLD failed attempts in a row.
+    CIRCUIT_FAILURE_THRESHOLD = 5
+    CIRCUIT_RESET_TIMEOUT = 10 * 60
+
+    # Client error responses that may succeed when retried later
+    RETRIED_STATUS_CODES = [401, 403, 408, 429]
+
+    # Response to uploads for a job no longer dispatched to this runner, e.g.
+    # uploads left in the spool of a job reclaimed while the runner was down
+    STALE_JOB_STATUS_CODE = 409
+
+    # Rejections of bulk uploads that are retried split in two halves, e.g. a
+    # batch larger than the API accepts or a batch with a single invalid result
+    SPLIT_STATUS_CODES = [400, 413]
+
+    # Spool subdirectory keeping rejected uploads for inspection
+    REJECTED_DIRECTORY_NAME = "rejected"
+
+    def __init__(self, session: APISession, spool_path: str, queue_size: int) -> None:
+        self.API_ENDPOINT = session.API_ENDPOINT
+        self.SPOOL_PATH = spool_path
+        os.makedirs(self.SPOOL_PATH, exist_ok=True)
+
+        # The background thread uses a separate session with the same credentials.
+        self.SESSION = requests.Session()
+        self.SESSION.headers = session.SESSION.headers
+        self.SESSION.auth = session.SESSION.auth
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.circuit_breaker = CircuitBreaker(
+            self.CIRCUIT_FAILURE_THRESHOLD, self.CIRCUIT_RESET_TIMEOUT
+        )
+
+        self.thread = threading.Thread(target=self._send_loop, daemon=True)
+        self.thread.start()
+
+        # Resend uploads left over from a previous run.
+        pending_entries = sorted(
+            name for name in os.listdir(self.SPOOL_PATH) if name.endswith(".json")
+        )
+        if pending_entries:
+            print(f"Resending {len(pending_entries)} uploads from the spool")
+        for name in pending_entries:
+            self.queue.put(name)
+
+    def _submit(
+        self,
+        method: str,
+        path: str,
+        data: dict = None,
+        json_data=None,
+        files: Dict[str, str] = None,
+    ) -> None:
+        """
+        Persist a request to the spool and queue it for sending. Given files
+        (form field -> file path) are moved into the spool.
+        """
+        entry_id = f"{time.time_ns():020d}-{uuid.uuid4().hex}"
+
+        spooled_files = {}
+        for field_name, file_path in (files or {}).items():
+            spooled_file_name = entry_id + "-" + field_name
+            shutil.move(file_path, os.path.join(self.SPOOL_PATH, spooled_file_name))
+            spooled_files[field_name] = spooled_file_name
+
+        entry = {
+            "method": method,
+            "path": path,
+            "data": data,
+            "json": json_data,
+            "files": spooled_files,
+        }
+        self._write_entry(entry_id + ".json", entry)
+        self.queue.put(entry_id + ".json")
+
+    def _write_entry(self, entry_name: str, entry: dict) -> None:
+        # Write the entry atomically, so a crash never leaves a partial entry.
+        entry_path = os.path.join(self.SPOOL_PATH, entry_name)
+        with open(entry_path + ".tmp", "w") as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(entry_path + ".tmp", entry_path)
+
+    def _send_entry(self, entry: dict) -> requests.Response:
+        with ExitStack() as stack:
+            files = {
+                field_name: stack.enter_context(
+                    open(os.path.join(self.SPOOL_PATH, file_name), "rb")
+                )
+                for field_name, file_name in entry["files"].items()
+            }
+
+            return self.SESSION.request(
+                entry["method"],
+                self.API_ENDPOINT + entry["path"],
+                data=entry["data"],
+                json=entry["json"],
+                files=files or None,
+                timeout=10 * 60,
+            )
+
+    def _remove_entry(self, entry_name: str, entry: dict) -> None:
+        for file_name in entry["files"].values():
+            os.remove(os.path.join(self.SPOOL_PATH, file_name))
+        os.remove(os.path.join(self.SPOOL_PATH, entry_name))
+
+    def _reject_entry(self, entry_name: str, entry: dict) -> None:
+        rejected_path = os.path.join(self.SPOOL_PATH, self.REJECTED_DIRECTORY_NAME)
+        os.makedirs(rejected_path, exist_ok=True)
+        for file_name in entry["files"].values():
+            os.replace(
+                os.path.join(self.SPOOL_PATH, file_name),
+                os.path.join(rejected_path, file_name),
+            )
+        os.replace(
+            os.path.join(self.SPOOL_PATH, entry_name),
+            os.path.join(rejected_path, entry_name),
+        )
+
+    def _split_entry(self, entry_name: str, entry: dict) -> List[str]:
+        """
+        Replace a bulk upload of more than one result with two uploads of half of
+        its results each. Returns the names of the new entries, or an empty list if
+        the entry cannot be split.
+        """
+        if entry["json"] is not None:
+            results = entry["json"]
+        elif entry["data"] is not None and "results" in entry["data"]:
+            results = json.loads(entry["data"]["results"])
+        else:
+            return []
+        if not isinstance(results, list) or len(results) < 2:
+            return []
+
+        # The halves sort right after each other in place of the split entry, so
+        # they are resent in order after a restart.
+        half_entry_names = []
+        middle = len(results) // 2
+        for half, (start, end) in enumerate([(0, middle), (middle, len(results))]):
+            half_entry = dict(entry)
+            if entry["json"] is not None:
+                half_entry["json"] = results[start:end]
+            else:
+                half_entry["data"] = dict(entry["data"])
+                half_entry["data"]["results"] = json.dumps(results[start:end])
+
+            # Dumps are posted in fields named after the index of their result.
+            half_entry["files"] = {
+                "dump_" + str(index - start): entry["files"]["dump_" + str(index)]
+                for index in range(start, end)
+                if "dump_" + str(index) in entry["files"]
+            }
+
+            half_entry_name = entry_name[: -len(".json")] + "-" + str(half) + ".json"
+            self._write_entry(half_entry_name, half_entry)
+            half_entry_names.append(half_entry_name)
+
+        # The spooled files now belong to the halves.
+        os.remove(os.path.join(self.SPOOL_PATH, entry_name))
+        return half_entry_names
+
+    def _send_spooled_entry(self, entry_name: str) -> List[str]:
+        """
+        Send a spooled entry, retrying until the API accepts or rejects it. Returns
+        the names of entries to send in its place, if it was split.
+        """
+        with open(os.path.join(self.SPOOL_PATH, entry_name)) as entry_file:
+            entry = json.load(entry_file)
+
+        attempt = 0
+        while True:
+            time.sleep(self.circuit_breaker.get_wait_time())
+
+            try:
+                response = self._send_entry(entry)
+            except requests.exceptions.RequestException as exception:
+                print(f"Upload of {entry['path']} failed: {exception}")
+                response = None
+
+            if (
+                response is not None
+                and response.status_code < 500
+                and response.status_code not in self.RETRIED_STATUS_CODES
+            ):
+                self.circuit_breaker.record_success()
+                break
+
+            self.circuit_breaker.record_failure()
+            backoff = min(self.MAX_BACKOFF, self.BASE_BACKOFF * 2**attempt)
+            time.sleep(random.uniform(0, backoff))
+            attempt += 1
+
+        if response.ok:
+            self._remove_entry(entry_name, entry)
+            return []
+
+        if response.status_code == self.STALE_JOB_STATUS_CODE:
+            # The job was reclaimed, its results belong to another run.
+            print(
+                f"Upload of {entry['path']} is for a job no longer "
+                "dispatched to this runner, dropping it"
+            )
+            self._remove_entry(entry_name, entry)
+            return []
+
+        if response.status_code in self.SPLIT_STATUS_CODES:
+            half_entry_names = self._split_entry(entry_name, entry)
+            if half_entry_names:
+                print(
+                    f"Upload of {entry['path']} was rejected "
+                    f"with HTTP {response.status_code}, splitting it"
+                )
+                return half_entry_names
+
+        # Client errors will not go away by retrying.
+        print(
+            f"Upload of {entry['path']} was rejected "
+            f"with HTTP {response.status_code}, moving it to "
+            f"{self.REJECTED_DIRECTORY_NAME}"
+        )
+        self._reject_entry(entry_name, entry)
+        return []
+
+    def _send_loop(self) -> None:
+        while True:
+            entry_name = self.queue.get()
+
+            # Entries split from a rejected entry are sent before the next queued
+            # entry, keeping the order of the uploads.
+            pending_entries = [entry_name]
+            while pending_entries:
+                pending_entries[:0] = self._send_spooled_entry(pending_entries.pop(0))
+
+            self.queue.task_done()
+
+    def join(self) -> None:
+        """
+        Wait until all submitted uploads were sent.
+        """
+        self.queue.join()
+
+    def post_lit_results(self, pk: int, results: List[LITResult]) -> None:
+        """
+        Queue many LIT results of a job with a given primary key (pk) for posting.
+        """
+        self._submit(
+            "post",
+            "job/" + str(pk) + "/lit/bulk/",
+            json_data=[_serialize_lit_result(result) for result in results],
+        )
+
+    def post_cts_results(self, pk: int, results: List[CTSResult]) -> None:
+        """
+        Queue many CTS results of a job with a given primary key (pk) for posting.
+        Dump archives of the results are moved into the spool.
+        """
+        files = {}
+        for index, result in enumerate(results):
+            if result.dump_path:
+                files["dump_" + str(index)] = result.dump_path
+
+        self._submit(
+            "post",
+            "job/" + str(pk) + "/cts/bulk/",
             data={
-                "test_category": result.test_category,
-                "test_name": result.test_name,
-                "timedout": result.timedout,
-                "passing": result.passing,
-                "start_time": datetime.isoformat(result.start_time)[:-3] + "Z",
-                "end_time": datetime.isoformat(result.end_time)[:-3] + "Z",
-                "standard_output": result.standard_output,
-                "standard_error": result.standard_error,
-                "test_executable": result.test_executable,
-                "test_arguments": result.test_arguments,
-                "suite_version": result.suite_version,
-                "igc_version": result.igc_version,
-                "neo_version": result.neo_version,
+                "results": json.dumps(
+                    [_serialize_cts_result(result) for result in results]
+                )
             },
             files=files,
         )
 
-        if response.status_code == 404:
-            raise ValueError("Job with specified primary key (pk) does not exist")
+    def update_job_status(
+        self, pk: int, status: JobStatus, status_details: str = None
+    ) -> None:
+        """
+        Queue a status update of a job with a given primary key (pk). The update
+        is sent after all previously queued results.
+        """
+        data = {"status": status.value}
+        if status_details is not None:
+            data["status_details"] = status_details
+
+        self._submit("put", "job/" + str(pk) + "/", data=data)
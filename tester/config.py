@@ -1,6 +1,9 @@
 import os
 import json
-from typing import List
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
 
 # Location of the config.json file
 CONFIG_FILE_PATH = os.path.join(
@@ -14,45 +17,304 @@ CTS_FILE_PATH = os.path.join(
 )
 
 
-def _read_config_value(key: str) -> str:
-    with open(CONFIG_FILE_PATH) as config_file:
+@dataclass
+class TesterSettings:
+    cts_build_path: str = None
+    tested_repository_build_path: str = None
+    backend_wrapper_build_path: str = None
+    igc_version: str = None
+    neo_version: str = None
+    cts_version: str = None
+    cts_parallel_jobs: int = 1
+    result_batch_size: int = 100
+    result_batch_interval: int = 60
+    result_batch_max_bytes: int = 2000000
+    cmake_generator: str = "Unix Makefiles"
+    build_compile_jobs: int = 4
+    build_link_jobs: int = 2
+    compiler_cache: str = ""
+    compiler_cache_path: str = ""
+    compiler_cache_max_size: str = ""
+    lit_selection_history_depth: int = 5000
+    artifact_cache_path: str = ""
+    artifact_cache_max_size_gb: int = 100
+    upload_spool_path: str = "~/.cache/spirv-backend-testing/spool/"
+    upload_queue_size: int = 1000
+    lease_renewal_interval: int = 60
+    dump_compressor: str = "gzip"
+    dump_compression_level: int = 6
+    dump_archive_jobs: int = 2
+    dump_policy: str = "on_failure"
+    flaky_reruns: int = 2
+    output_head_lines: int = 200
+    output_tail_lines: int = 200
+    output_max_matched_lines: int = 200
+    output_failure_pattern: str = (
+        "(?i)fail|error|mismatch|assert|exception|expected|ulp"
+    )
+    output_store_path: str = "~/.cache/spirv-backend-testing/outputs/"
+    output_store_max_size_gb: int = 20
+
+
+@dataclass
+class CtsTest:
+    test_category: str = None
+    test_name: str = None
+    executable_path: str = None
+    arguments: List[str] = None
+    environment: List[str] = None
+    time_limit: int = None
+    exclusive: bool = False
+
+
+def _read_settings(config_file_path: str) -> TesterSettings:
+    with open(config_file_path) as config_file:
         config_dict = json.load(config_file)
+
+    def read_value(key: str):
         if not key in config_dict:
-            raise KeyError(f"Key {key} was not found in the config file")
+            # Keys without a default value in TesterSettings are mandatory.
+            default = getattr(TesterSettings, key.lower())
+            if default is None:
+                raise KeyError(f"Key {key} was not found in the config file")
+
+            return default
 
         return config_dict[key]
 
+    settings = TesterSettings(
+        cts_build_path=os.path.expanduser(read_value("CTS_BUILD_PATH")),
+        tested_repository_build_path=os.path.expanduser(
+            read_value("TESTED_REPOSITORY_BUILD_PATH")
+        ),
+        backend_wrapper_build_path=os.path.expanduser(
+            read_value("BACKEND_WRAPPER_BUILD_PATH")
+        ),
+        igc_version=read_value("IGC_VERSION"),
+        neo_version=read_value("NEO_VERSION"),
+        cts_version=read_value("CTS_VERSION"),
+        cts_parallel_jobs=int(read_value("CTS_PARALLEL_JOBS")),
+        result_batch_size=int(read_value("RESULT_BATCH_SIZE")),
+        result_batch_interval=int(read_value("RESULT_BATCH_INTERVAL")),
+        result_batch_max_bytes=int(read_value("RESULT_BATCH_MAX_BYTES")),
+        cmake_generator=read_value("CMAKE_GENERATOR"),
+        build_compile_jobs=int(read_value("BUILD_COMPILE_JOBS")),
+        build_link_jobs=int(read_value("BUILD_LINK_JOBS")),
+        compiler_cache=read_value("COMPILER_CACHE"),
+        compiler_cache_path=os.path.expanduser(read_value("COMPILER_CACHE_PATH")),
+        compiler_cache_max_size=read_value("COMPILER_CACHE_MAX_SIZE"),
+        lit_selection_history_depth=int(read_value("LIT_SELECTION_HISTORY_DEPTH")),
+        artifact_cache_path=os.path.expanduser(read_value("ARTIFACT_CACHE_PATH")),
+        artifact_cache_max_size_gb=int(read_value("ARTIFACT_CACHE_MAX_SIZE_GB")),
+        upload_spool_path=os.path.expanduser(read_value("UPLOAD_SPOOL_PATH")),
+        upload_queue_size=int(read_value("UPLOAD_QUEUE_SIZE")),
+        lease_renewal_interval=int(read_value("LEASE_RENEWAL_INTERVAL")),
+        dump_compressor=read_value("DUMP_COMPRESSOR"),
+        dump_compression_level=int(read_value("DUMP_COMPRESSION_LEVEL")),
+        dump_archive_jobs=int(read_value("DUMP_ARCHIVE_JOBS")),
+        dump_policy=read_value("DUMP_POLICY"),
+        flaky_reruns=int(read_value("FLAKY_RERUNS")),
+        output_head_lines=int(read_value("OUTPUT_HEAD_LINES")),
+        output_tail_lines=int(read_value("OUTPUT_TAIL_LINES")),
+        output_max_matched_lines=int(read_value("OUTPUT_MAX_MATCHED_LINES")),
+        output_failure_pattern=read_value("OUTPUT_FAILURE_PATTERN"),
+        output_store_path=os.path.expanduser(read_value("OUTPUT_STORE_PATH")),
+        output_store_max_size_gb=int(read_value("OUTPUT_STORE_MAX_SIZE_GB")),
+    )
+
+    if settings.cts_parallel_jobs < 1:
+        raise ValueError("Invalid number of parallel CTS jobs")
+
+    if settings.result_batch_size < 1:
+        raise ValueError("Invalid result batch size")
+
+    if settings.result_batch_max_bytes < 1:
+        raise ValueError("Invalid maximum result batch size in bytes")
+
+    if settings.build_compile_jobs < 1 or settings.build_link_jobs < 1:
+        raise ValueError("Invalid number of parallel build jobs")
+
+    if settings.dump_compressor not in ("gzip", "zstd"):
+        raise ValueError("Invalid dump compressor")
+
+    if settings.dump_archive_jobs < 1:
+        raise ValueError("Invalid number of parallel dump archive jobs")
+
+    if settings.dump_policy not in ("always", "on_failure", "never"):
+        raise ValueError("Invalid dump policy")
+
+    if settings.flaky_reruns < 0:
+        raise ValueError("Invalid number of flaky test re-runs")
+
+    if settings.output_head_lines < 0 or settings.output_tail_lines < 1:
+        raise ValueError("Invalid number of retained output lines")
+
+    return settings
+
+
+def _read_cts_tests(cts_file_path: str) -> List[CtsTest]:
+    with open(cts_file_path) as cts_file:
+        return [
+            CtsTest(
+                test_category=test["test_category"],
+                test_name=test["test_name"],
+                executable_path=test["executable_path"],
+                arguments=test["arguments"].split(),
+                environment=test["environment"].split(),
+                time_limit=test["time_limit"],
+                exclusive=test["exclusive"],
+            )
+            for test in json.load(cts_file)
+        ]
+
+
+class TesterConfig:
+    """
+    Parsed config.json and indexed cts.json shared by the whole tester.
+
+    Both files are parsed once and parsed again only after their modification
+    time changes.
+    """
+
+    def __init__(self, config_file_path: str, cts_file_path: str) -> None:
+        self._config_file_path = config_file_path
+        self._cts_file_path = cts_file_path
+        self._lock = threading.Lock()
+
+        self._config_mtime = None
+        self._settings = None
+
+        self._cts_mtime = None
+        self._cts_tests = []
+        self._cts_tests_by_key: Dict[Tuple[str, str], CtsTest] = {}
+        self._cts_tests_by_category: Dict[str, List[CtsTest]] = {}
+
+    def _reload_if_changed(self) -> None:
+        with self._lock:
+            config_mtime = os.stat(self._config_file_path).st_mtime_ns
+            if config_mtime != self._config_mtime:
+                self._settings = _read_settings(self._config_file_path)
+                self._config_mtime = config_mtime
+
+            cts_mtime = os.stat(self._cts_file_path).st_mtime_ns
+            if cts_mtime != self._cts_mtime:
+                cts_tests = _read_cts_tests(self._cts_file_path)
+                cts_tests_by_key = {}
+                cts_tests_by_category = {}
+                for test in cts_tests:
+                    cts_tests_by_key[(test.test_category, test.test_name)] = test
+                    cts_tests_by_category.setdefault(test.test_category, []).append(
+                        test
+                    )
+
+                self._cts_tests = cts_tests
+                self._cts_tests_by_key = cts_tests_by_key
+                self._cts_tests_by_category = cts_tests_by_category
+                self._cts_mtime = cts_mtime
+
+    @property
+    def settings(self) -> TesterSettings:
+        self._reload_if_changed()
+        return self._settings
+
+    def get_cts_tests(self) -> List[CtsTest]:
+        """
+        Get all OpenCL CTS tests in the order of the cts.json file.
+        """
+        self._reload_if_changed()
+        return self._cts_tests
+
+    def get_cts_tests_in_category(self, test_category: str) -> List[CtsTest]:
+        """
+        Get all OpenCL CTS tests in the given category.
+        """
+        self._reload_if_changed()
+        return self._cts_tests_by_category.get(test_category, [])
+
+    def get_cts_test_categories(self) -> List[str]:
+        """
+        Get all OpenCL CTS test categories in the order of the cts.json file.
+        """
+        self._reload_if_changed()
+        return list(self._cts_tests_by_category)
+
+    def get_cts_test(self, test_category: str, test_name: str) -> CtsTest:
+        """
+        Get the definition of the given OpenCL CTS test.
+        """
+        self._reload_if_changed()
+        try:
+            return self._cts_tests_by_key[(test_category, test_name)]
+        except KeyError:
+            raise KeyError(f"Test {test_category}/{test_name} definition was not found")
+
+    def validate(self) -> None:
+        """
+        Make sure all configured directories and the tools used by the selected
+        configuration exist.
+        """
+        settings = self.settings
+
+        if not os.path.isdir(settings.cts_build_path):
+            raise OSError("Invalid CTS build directory path")
+
+        if not os.path.isdir(settings.tested_repository_build_path):
+            raise OSError("Invalid tested repository build directory path")
+
+        if not os.path.isdir(settings.backend_wrapper_build_path):
+            raise OSError("Invalid backend wrapper build directory path")
+
+        if settings.cmake_generator == "Ninja" and not shutil.which("ninja"):
+            raise OSError("Ninja generator is configured but ninja was not found")
+
+        if settings.compiler_cache and not shutil.which(settings.compiler_cache):
+            raise OSError(f"Compiler cache {settings.compiler_cache} was not found")
+
+        if settings.dump_compressor == "zstd" and not shutil.which("zstd"):
+            raise OSError("zstd dump compressor is configured but zstd was not found")
+
+
+# Configuration shared by the runner and the API session
+CONFIG = TesterConfig(CONFIG_FILE_PATH, CTS_FILE_PATH)
+
 
 def get_cts_build_path() -> str:
     """
     Get the absolute path to the OpenCL CTS build directory.
     """
-    path = os.path.expanduser(_read_config_value("CTS_BUILD_PATH"))
+    path = CONFIG.settings.cts_build_path
     if not os.path.isdir(path):
         raise OSError("Invalid CTS build directory path")
 
     return path
 
 
-def get_cts_test_list() -> str:
+def get_cts_test_list() -> List[CtsTest]:
     """
     Get list of all OpenCL CTS tests.
     """
-    with open(CTS_FILE_PATH) as cts_file:
-        cts_test_list = json.load(cts_file)
-        return cts_test_list
+    return CONFIG.get_cts_tests()
+
+
+def get_cts_test_categories() -> List[str]:
+    """
+    Get list of all OpenCL CTS test categories.
+    """
+    return CONFIG.get_cts_test_categories()
+
+
+def get_cts_test(test_category: str, test_name: str) -> CtsTest:
+    """
+    Get the definition of the given OpenCL CTS test.
+    """
+    return CONFIG.get_cts_test(test_category, test_name)
 
 
 def get_cts_test_executable_relative_path(test_category: str, test_name: str) -> str:
     """
     Get the executable relative path for the given OpenCL CTS test.
     """
-    test_list = get_cts_test_list()
-    for test in test_list:
-        if test["test_category"] == test_category and test["test_name"] == test_name:
-            return test["executable_path"]
-
-    raise KeyError(f"Test {test_category}/{test_name} definition was not found")
+    return get_cts_test(test_category, test_name).executable_path
 
 
 def get_cts_test_executable_absolute_path(test_category: str, test_name: str) -> str:
@@ -69,43 +331,230 @@ def get_cts_test_arguments(test_category: str, test_name: str) -> List[str]:
     """
     Get a list of CLI arguments required to run the given OpenCL CTS test.
     """
-    test_list = get_cts_test_list()
-    for test in test_list:
-        if test["test_category"] == test_category and test["test_name"] == test_name:
-            return test["arguments"].split()
-
-    raise KeyError(f"Test {test_category}/{test_name} definition was not found")
+    return get_cts_test(test_category, test_name).arguments
 
 
 def get_cts_test_environment(test_category: str, test_name: str) -> List[str]:
     """
     Get a list of environment variables for the given OpenCL CTS test.
     """
-    test_list = get_cts_test_list()
-    for test in test_list:
-        if test["test_category"] == test_category and test["test_name"] == test_name:
-            return test["environment"].split()
-
-    raise KeyError(f"Test {test_category}/{test_name} definition was not found")
+    return get_cts_test(test_category, test_name).environment
 
 
 def get_cts_test_time_limit(test_category: str, test_name: str) -> int:
     """
     Get a the time limit for the given OpenCL CTS test.
     """
-    test_list = get_cts_test_list()
-    for test in test_list:
-        if test["test_category"] == test_category and test["test_name"] == test_name:
-            return test["time_limit"]
+    return get_cts_test(test_category, test_name).time_limit
+
+
+def get_cts_test_exclusive(test_category: str, test_name: str) -> bool:
+    """
+    Check whether the given OpenCL CTS test must run alone on the machine.
+    """
+    return get_cts_test(test_category, test_name).exclusive
+
+
+def get_cts_parallel_jobs() -> int:
+    """
+    Get the maximum number of OpenCL CTS tests run at the same time.
+    """
+    return CONFIG.settings.cts_parallel_jobs
+
+
+def get_result_batch_size() -> int:
+    """
+    Get the maximum number of results posted to the API in a single request.
+    """
+    return CONFIG.settings.result_batch_size
+
 
-    raise KeyError(f"Test {test_category}/{test_name} definition was not found")
+def get_result_batch_interval() -> int:
+    """
+    Get the maximum number of seconds a result waits in a batch before posting.
+    """
+    return CONFIG.settings.result_batch_interval
+
+
+def get_result_batch_max_bytes() -> int:
+    """
+    Get the maximum number of bytes of results posted to the API in a single
+    request. A single larger result is still posted alone.
+    """
+    return CONFIG.settings.result_batch_max_bytes
+
+
+def get_cmake_generator() -> str:
+    """
+    Get the name of the CMake generator used to build the tested projects.
+    """
+    return CONFIG.settings.cmake_generator
+
+
+def get_build_compile_jobs() -> int:
+    """
+    Get the number of parallel compile jobs used to build the tested projects.
+    """
+    return CONFIG.settings.build_compile_jobs
+
+
+def get_build_link_jobs() -> int:
+    """
+    Get the number of parallel link jobs used to build the LLVM project.
+    """
+    return CONFIG.settings.build_link_jobs
+
+
+def get_compiler_cache() -> str:
+    """
+    Get the compiler cache executable (e.g. ccache) or an empty string if compiler
+    caching is disabled.
+    """
+    return CONFIG.settings.compiler_cache
+
+
+def get_compiler_cache_path() -> str:
+    """
+    Get the absolute path to the compiler cache directory.
+    """
+    return CONFIG.settings.compiler_cache_path
+
+
+def get_compiler_cache_max_size() -> str:
+    """
+    Get the maximum size of the compiler cache directory (e.g. "20G").
+    """
+    return CONFIG.settings.compiler_cache_max_size
+
+
+def get_lit_selection_history_depth() -> int:
+    """
+    Get the number of recent backend commits used to map changed backend sources
+    to affected LIT tests.
+    """
+    return CONFIG.settings.lit_selection_history_depth
+
+
+def get_artifact_cache_path() -> str:
+    """
+    Get the absolute path to the build artifact cache directory or an empty string
+    if build artifacts are not cached.
+    """
+    return CONFIG.settings.artifact_cache_path
+
+
+def get_artifact_cache_max_size() -> int:
+    """
+    Get the maximum size of the build artifact cache in bytes.
+    """
+    return CONFIG.settings.artifact_cache_max_size_gb * 1024 * 1024 * 1024
+
+
+def get_upload_spool_path() -> str:
+    """
+    Get the absolute path to the directory persisting uploads not yet sent.
+    """
+    return CONFIG.settings.upload_spool_path
+
+
+def get_upload_queue_size() -> int:
+    """
+    Get the maximum number of uploads waiting to be sent before testing pauses.
+    """
+    return CONFIG.settings.upload_queue_size
+
+
+def get_lease_renewal_interval() -> int:
+    """
+    Get the number of seconds between renewals of a tested job's lease.
+    """
+    return CONFIG.settings.lease_renewal_interval
+
+
+def get_dump_compressor() -> str:
+    """
+    Get the compressor used for dump archives ("gzip" or "zstd").
+    """
+    return CONFIG.settings.dump_compressor
+
+
+def get_dump_compression_level() -> int:
+    """
+    Get the compression level of dump archives.
+    """
+    return CONFIG.settings.dump_compression_level
+
+
+def get_dump_archive_jobs() -> int:
+    """
+    Get the number of dump archives created in parallel in the background.
+    """
+    return CONFIG.settings.dump_archive_jobs
+
+
+def get_dump_policy() -> str:
+    """
+    Get when compiler dumps of CTS tests are captured: "always", "on_failure" (by
+    re-running failed tests with dumps enabled) or "never".
+    """
+    return CONFIG.settings.dump_policy
+
+
+def get_flaky_reruns() -> int:
+    """
+    Get the maximum number of times a failed test is re-run to detect flakiness.
+    """
+    return CONFIG.settings.flaky_reruns
+
+
+def get_output_head_lines() -> int:
+    """
+    Get the number of first lines of a test output always retained.
+    """
+    return CONFIG.settings.output_head_lines
+
+
+def get_output_tail_lines() -> int:
+    """
+    Get the number of last lines of a test output always retained.
+    """
+    return CONFIG.settings.output_tail_lines
+
+
+def get_output_max_matched_lines() -> int:
+    """
+    Get the maximum number of lines between the head and tail of a test output
+    retained for matching the failure pattern.
+    """
+    return CONFIG.settings.output_max_matched_lines
+
+
+def get_output_failure_pattern() -> str:
+    """
+    Get the regular expression matching test output lines that matter for failures.
+    """
+    return CONFIG.settings.output_failure_pattern
+
+
+def get_output_store_path() -> str:
+    """
+    Get the absolute path to the local store of full test outputs.
+    """
+    return CONFIG.settings.output_store_path
+
+
+def get_output_store_max_size() -> int:
+    """
+    Get the maximum size of the local store of full test outputs in bytes.
+    """
+    return CONFIG.settings.output_store_max_size_gb * 1024 * 1024 * 1024
 
 
 def get_tested_repository_build_path() -> str:
     """
     Get the absolute path to the tested repository build directory.
     """
-    path = os.path.expanduser(_read_config_value("TESTED_REPOSITORY_BUILD_PATH"))
+    path = CONFIG.settings.tested_repository_build_path
     if not os.path.isdir(path):
         raise OSError("Invalid tested repository build directory path")
 
@@ -116,7 +565,7 @@ def get_backend_wrapper_build_path() -> str:
     """
     Get the absolute path to the backend wrapper build directory.
     """
-    path = os.path.expanduser(_read_config_value("BACKEND_WRAPPER_BUILD_PATH"))
+    path = CONFIG.settings.backend_wrapper_build_path
     if not os.path.isdir(path):
         raise OSError("Invalid backend wrapper build directory path")
 
@@ -127,18 +576,18 @@ def get_igc_version() -> str:
     """
     Get the version of the Intel Graphics Compiler.
     """
-    return _read_config_value("IGC_VERSION")
+    return CONFIG.settings.igc_version
 
 
 def get_neo_version() -> str:
     """
     Get the version of the Intel Graphics Compute Runtime.
     """
-    return _read_config_value("NEO_VERSION")
+    return CONFIG.settings.neo_version
 
 
 def get_cts_version() -> str:
     """
     Get the version of the OpenCL CTS test suite.
     """
-    return _read_config_value("CTS_VERSION")
+    return CONFIG.settings.cts_version
@@ -0,0 +1,113 @@
+import os
+import shutil
+import subprocess
+import tarfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict
+
+# Extension of dump archives created with each of the supported compressors
+ARCHIVE_EXTENSIONS = {"gzip": ".tar.gz", "zstd": ".tar.zst"}
+
+
+def _is_relevant_dump(file_name: str) -> bool:
+    return "backend" in file_name or ".cl" in file_name
+
+
+@dataclass
+class DumpArchive:
+    path: str = None
+    dump_size: int = 0
+    archive_size: int = 0
+    duration: float = 0
+
+
+class DumpArchiver:
+    """
+    Archives dump directories of finished tests on background threads.
+
+    Relevant dump files are streamed straight from the dump directory into a
+    compressed tar archive, which is then deleted. Compressing with zstd requires
+    the zstd executable.
+    """
+
+    def __init__(self, compressor: str, compression_level: int, jobs: int) -> None:
+        self.COMPRESSOR = compressor
+        self.COMPRESSION_LEVEL = compression_level
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.executor.shutdown(wait=True)
+
+    def submit(self, dumps_directory_path: str) -> Future:
+        """
+        Archive the given dump directory in the background. The returned future
+        resolves to a DumpArchive with the path to the archive (None if there were
+        no relevant dumps) and the time and disk space the dumps took.
+        """
+        return self.executor.submit(self._archive, dumps_directory_path)
+
+    def _write_archive(self, archive_path: str, file_paths: Dict[str, str]) -> None:
+        if self.COMPRESSOR == "gzip":
+            with tarfile.open(
+                archive_path, "w:gz", compresslevel=self.COMPRESSION_LEVEL
+            ) as archive:
+                for name, path in file_paths.items():
+                    archive.add(path, arcname=name)
+            return
+
+        # Leaving the Popen block closes the pipe and waits for zstd to exit.
+        with open(archive_path, "wb") as archive_file, subprocess.Popen(
+            ["zstd", "-q", "-" + str(self.COMPRESSION_LEVEL), "-c"],
+            stdin=subprocess.PIPE,
+            stdout=archive_file,
+        ) as process:
+            try:
+                with tarfile.open(fileobj=process.stdin, mode="w|") as archive:
+                    for name, path in file_paths.items():
+                        archive.add(path, arcname=name)
+                process.stdin.close()
+            except BaseException:
+                # Do not leave zstd waiting for the rest of a failed archive.
+                process.kill()
+                raise
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, "zstd")
+
+    def _archive(self, dumps_directory_path: str) -> DumpArchive:
+        start_time = time.monotonic()
+        dump_archive = DumpArchive()
+
+        file_paths = {}
+        with os.scandir(dumps_directory_path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    dump_archive.dump_size += entry.stat().st_size
+                if _is_relevant_dump(entry.name):
+                    file_paths[entry.name] = entry.path
+
+        if file_paths:
+            archive_path = (
+                dumps_directory_path.rstrip("/") + ARCHIVE_EXTENSIONS[self.COMPRESSOR]
+            )
+            try:
+                self._write_archive(archive_path, file_paths)
+                dump_archive.path = archive_path
+                dump_archive.archive_size = os.path.getsize(archive_path)
+            except (
+                OSError,
+                tarfile.TarError,
+                subprocess.CalledProcessError,
+            ) as exception:
+                print(f"Archiving dumps in {dumps_directory_path} failed: {exception}")
+                if os.path.exists(archive_path):
+                    os.remove(archive_path)
+
+        shutil.rmtree(dumps_directory_path, ignore_errors=True)
+        dump_archive.duration = time.monotonic() - start_time
+        return dump_archive
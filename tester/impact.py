@@ -0,0 +1,107 @@
+import os
+import subprocess
+from typing import Dict, List, Optional, Set
+
+# Directory with the LLVM SPIR-V backend sources (relative to the repository root)
+BACKEND_SOURCE_DIRECTORY = "llvm/lib/Target/SPIRV/"
+
+# Directory with the LLVM SPIR-V LIT tests (relative to the repository root)
+LIT_TEST_DIRECTORY = "llvm/test/CodeGen/SPIRV/"
+
+# Directory LIT test paths are reported relative to (relative to the repository root)
+LIT_TEST_SUITE_DIRECTORY = "llvm/test/"
+
+# Extensions of files in the LIT test directory that are tests themselves
+LIT_TEST_EXTENSIONS = (".ll", ".mir")
+
+
+def _is_lit_test(path: str) -> bool:
+    return (
+        path.startswith(LIT_TEST_DIRECTORY)
+        and path.endswith(LIT_TEST_EXTENSIONS)
+        and not "/Inputs/" in path
+    )
+
+
+def _get_co_changed_lit_tests(
+    repository_path: str, history_depth: int
+) -> Dict[str, Set[str]]:
+    """
+    Get a dictionary mapping each backend source file to LIT tests changed in the
+    same commits within the last history_depth commits touching the backend.
+    """
+    log = subprocess.check_output(
+        [
+            "git",
+            "log",
+            "-n",
+            str(history_depth),
+            "--format=%x00",
+            "--name-only",
+            "HEAD",
+            "--",
+            BACKEND_SOURCE_DIRECTORY,
+            LIT_TEST_DIRECTORY,
+        ],
+        cwd=repository_path,
+    ).decode("utf-8")
+
+    co_changed_tests = {}
+    for commit in log.split("\0"):
+        changed_files = [path for path in commit.splitlines() if path]
+        tests = {path for path in changed_files if _is_lit_test(path)}
+        if not tests:
+            continue
+
+        for path in changed_files:
+            if path.startswith(BACKEND_SOURCE_DIRECTORY):
+                co_changed_tests.setdefault(path, set()).update(tests)
+
+    return co_changed_tests
+
+
+def get_affected_lit_tests(
+    repository_path: str, changed_files: List[str], history_depth: int
+) -> Optional[List[str]]:
+    """
+    Get a sorted list of LIT test paths (as reported by llvm-lit) affected by the
+    given changed files of the checked out revision, or None if the impact cannot
+    be determined and all LIT tests should run.
+
+    Changed tests are affected directly. A changed backend source file affects the
+    tests that were changed together with it in the git history. Changes to any
+    other file (e.g. LIT configuration or code outside the backend) fall back to
+    running all tests.
+    """
+    if not changed_files:
+        return None
+
+    affected_tests = set()
+    co_changed_tests = None
+
+    for path in changed_files:
+        if _is_lit_test(path):
+            affected_tests.add(path)
+        elif path.startswith(BACKEND_SOURCE_DIRECTORY):
+            if co_changed_tests is None:
+                co_changed_tests = _get_co_changed_lit_tests(
+                    repository_path, history_depth
+                )
+
+            if not co_changed_tests.get(path):
+                return None
+
+            affected_tests.update(co_changed_tests[path])
+        else:
+            return None
+
+    # Only keep tests that still exist in the lit test tree.
+    affected_test_paths = [
+        os.path.relpath(path, LIT_TEST_SUITE_DIRECTORY)
+        for path in affected_tests
+        if os.path.isfile(os.path.join(repository_path, path))
+    ]
+    if not affected_test_paths:
+        return None
+
+    return sorted(affected_test_paths)
@@ -0,0 +1,223 @@
+import gzip
+import os
+import re
+import shutil
+from collections import deque
+from datetime import datetime
+from typing import BinaryIO, Optional
+
+# Maximum number of bytes read as a single line (longer lines are split)
+MAX_READ_LENGTH = 64 * 1024
+
+# Maximum number of characters of a line kept in the retained output
+MAX_LINE_LENGTH = 1000
+
+
+class OutputSummary:
+    """
+    Bounded summary of a test output stream fed line by line.
+
+    Keeps the first head_lines and the last tail_lines lines, and up to
+    max_matched_lines lines in between matching the failure pattern. Whether the
+    stream reported a passed test or a failure is tracked as lines are fed.
+    """
+
+    def __init__(
+        self,
+        head_lines: int,
+        tail_lines: int,
+        max_matched_lines: int,
+        failure_pattern: str,
+    ) -> None:
+        self.HEAD_LINES = head_lines
+        self.MAX_MATCHED_LINES = max_matched_lines
+        self.FAILURE_PATTERN = re.compile(failure_pattern)
+        self.head = []
+        self.tail = deque(maxlen=tail_lines)
+        self.matched = []
+        self.line_count = 0
+        self.reported_pass = False
+        self.reported_failure = False
+
+    def feed(self, line: str) -> None:
+        """
+        Add the next line (including the line break) of the stream.
+        """
+        self.line_count += 1
+        if "PASSED test." in line:
+            self.reported_pass = True
+        if "failed" in line.lower():
+            self.reported_failure = True
+
+        if len(line) > MAX_LINE_LENGTH:
+            line = line[:MAX_LINE_LENGTH] + " [...]\n"
+
+        if len(self.head) < self.HEAD_LINES:
+            self.head.append(line)
+            return
+
+        # Keep a line dropped from the tail if it matters for failures.
+        if len(self.tail) == self.tail.maxlen:
+            line_number, dropped_line = self.tail[0]
+            if len(self.matched) < self.MAX_MATCHED_LINES:
+                if self.FAILURE_PATTERN.search(dropped_line):
+                    self.matched.append((line_number, dropped_line))
+        self.tail.append((self.line_count, line))
+
+    def is_truncated(self) -> bool:
+        """
+        Check whether any line of the stream is not retained.
+        """
+        return self.line_count > len(self.head) + len(self.tail)
+
+    def get_text(self) -> str:
+        """
+        Get the retained output with markers for omitted lines.
+        """
+        text = "".join(self.head)
+        if self.is_truncated():
+            omitted = self.line_count - len(self.head) - len(self.tail)
+            text += f"[... {omitted} lines omitted, matching lines kept below ...]\n"
+            for line_number, line in self.matched:
+                text += f"[line {line_number}] {line}"
+            text += "[... end of omitted lines ...]\n"
+        text += "".join(line for _, line in self.tail)
+
+        if text and not text.endswith("\n"):
+            text += "\n"
+        return text
+
+
+class OutputCapture:
+    """
+    Captures an output stream of a subprocess into a temporary file, which is
+    summarized incrementally while the subprocess is running.
+    """
+
+    def __init__(self, path: str, summary: OutputSummary) -> None:
+        self.PATH = path
+        self.summary = summary
+        self.file = open(path, "wb")
+        self.reader = open(path, "rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.file.close()
+        self.reader.close()
+        if os.path.exists(self.PATH):
+            os.remove(self.PATH)
+
+    def update(self, final: bool = False) -> None:
+        """
+        Feed the complete lines written since the last update to the summary. With
+        final set, an incomplete last line is fed as well.
+        """
+        while True:
+            line = self.reader.readline(MAX_READ_LENGTH)
+            if not line:
+                return
+
+            if not line.endswith(b"\n") and len(line) < MAX_READ_LENGTH and not final:
+                # Wait for the rest of the line.
+                self.reader.seek(-len(line), os.SEEK_CUR)
+                return
+
+            self.summary.feed(line.decode("utf-8", errors="replace"))
+
+    def copy_to(self, output_file: BinaryIO) -> None:
+        """
+        Copy the full captured output into the given file.
+        """
+        self.file.flush()
+        with open(self.PATH, "rb") as input_file:
+            shutil.copyfileobj(input_file, output_file)
+
+
+class OutputStore:
+    """
+    Local store of compressed full test outputs, kept until the outputs not used
+    for the longest time exceed the quota.
+    """
+
+    def __init__(self, path: str, max_size: int) -> None:
+        self.PATH = path
+        self.MAX_SIZE = max_size
+        os.makedirs(self.PATH, exist_ok=True)
+
+    def _get_path(
+        self,
+        revision_hash: str,
+        test_category: str,
+        test_name: str,
+        start_time: datetime,
+    ) -> str:
+        timestamp = start_time.strftime("%Y%m%d%H%M%S")
+        file_name = test_category + "_" + test_name + "_" + timestamp + ".log.gz"
+        return os.path.join(self.PATH, revision_hash, file_name)
+
+    def store(
+        self,
+        output_path: str,
+        revision_hash: str,
+        test_category: str,
+        test_name: str,
+        start_time: datetime,
+    ) -> None:
+        """
+        Move the given compressed output of a test run into the store.
+        """
+        path = self._get_path(revision_hash, test_category, test_name, start_time)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(output_path, path)
+        self.evict()
+
+    def get(
+        self,
+        revision_hash: str,
+        test_category: str,
+        test_name: str,
+        start_time: datetime,
+    ) -> Optional[str]:
+        """
+        Get the path to the stored output of a test run or None.
+        """
+        path = self._get_path(revision_hash, test_category, test_name, start_time)
+        if not os.path.isfile(path):
+            return None
+
+        os.utime(path)
+        return path
+
+    def evict(self) -> None:
+        """
+        Delete least recently used outputs until the store fits in the quota.
+        """
+        outputs = []
+        for directory_path, _, file_names in os.walk(self.PATH):
+            for file_name in file_names:
+                path = os.path.join(directory_path, file_name)
+                status = os.stat(path)
+                outputs.append((status.st_mtime, status.st_size, path))
+
+        total_size = sum(size for _, size, _ in outputs)
+        for _, size, path in sorted(outputs):
+            if total_size <= self.MAX_SIZE:
+                break
+
+            os.remove(path)
+            total_size -= size
+
+
+def write_full_output(
+    path: str, stdout_capture: OutputCapture, stderr_capture: OutputCapture
+) -> None:
+    """
+    Write the full captured standard output and error into a compressed file.
+    """
+    with gzip.open(path, "wb", compresslevel=1) as output_file:
+        output_file.write(b"=== Standard output ===\n")
+        stdout_capture.copy_to(output_file)
+        output_file.write(b"\n=== Standard error ===\n")
+        stderr_capture.copy_to(output_file)
@@ -6,6 +6,8 @@ from datetime import datetime
 class LITResult:
     test_path: str = None
     passing: bool = None
+    rerun_count: int = 0
+    rerun_pass_count: int = 0
 
     def print(self):
         print(f"{self.test_path} (", end="")
@@ -13,6 +15,11 @@ class LITResult:
             print("PASSED", end="")
         else:
             print("FAILED", end="")
+        if self.rerun_count:
+            print(
+                f", passed {self.rerun_pass_count} of {self.rerun_count} re-runs",
+                end="",
+            )
         print(")")
 
 
@@ -32,6 +39,15 @@ class CTSResult:
     igc_version: str = None
     neo_version: str = None
     dump_path: str = None
+    dump_size: int = 0
+    dump_archive_size: int = 0
+    dump_time: float = 0
+    dump_policy: str = None
+    rerun_passing: bool = None
+    rerun_count: int = 0
+    rerun_pass_count: int = 0
+    output_truncated: bool = False
+    full_output_path: str = None
 
     def print(self):
         print(f"{self.test_category}/{self.test_name} (", end="")
@@ -41,4 +57,14 @@ class CTSResult:
             print("TIMED OUT", end="")
         else:
             print("FAILED", end="")
+        if self.rerun_count:
+            print(
+                f", passed {self.rerun_pass_count} of {self.rerun_count} re-runs",
+                end="",
+            )
         print(")")
+        if self.dump_size:
+            print(
+                f"Dumps: {self.dump_size} bytes archived to {self.dump_archive_size}"
+                f" bytes in {self.dump_time:.2f} seconds"
+            )
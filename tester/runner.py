@@ -1,13 +1,56 @@
+import hashlib
 import os
+import re
 import shutil
 import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-from communication import APISession, JobStatus
+import requests
+
+from communication import (
+    APISession,
+    BackgroundUploader,
+    JobLease,
+    JobStatus,
+    LitSelection,
+    QueuedJob,
+    ResultBatch,
+    get_cts_result_size,
+    get_lit_result_size,
+)
 from config import *
+from artifacts import ArtifactCache
+from dumps import DumpArchiver
+from impact import get_affected_lit_tests
+from output import OutputCapture, OutputStore, OutputSummary, write_full_output
 from results import CTSResult, LITResult
 
+# Number of seconds between timeout and cancellation checks of a running CTS test
+CTS_POLL_INTERVAL = 1
+
+# Number of seconds between checks for requested full test outputs
+OUTPUT_REQUEST_POLL_INTERVAL = 5 * 60
+
+# Name of the file storing a hash of the last successful CMake configure arguments
+CONFIGURE_STAMP_FILE_NAME = ".tester_configure_stamp"
+
+# Build system files not stored in the build artifact cache
+BUILD_SYSTEM_FILE_PATTERNS = [
+    "CMakeFiles",
+    "CMakeCache.txt",
+    "*.cmake",
+    "Makefile",
+    "build.ninja",
+    ".ninja_*",
+    "*.o",
+    CONFIGURE_STAMP_FILE_NAME,
+]
+
 
 def _checkout_llvm_spirv_backend_revision(hash: str) -> bool:
     """
@@ -53,24 +96,87 @@ def _checkout_llvm_spirv_backend_revision(hash: str) -> bool:
     return True
 
 
-def _build_llvm_spirv_backend() -> bool:
+def _get_build_environment() -> Dict[str, str]:
     """
-    Configure and build the LLVM SPIR-V backend.
+    Get the environment for configuring and building the tested projects.
+    """
+    environment = os.environ.copy()
+    environment.pop("RUNNER_KEY", None)
+
+    if get_compiler_cache():
+        # Without a configured directory or size the compiler cache's own
+        # defaults apply.
+        if get_compiler_cache_path():
+            environment["CCACHE_DIR"] = get_compiler_cache_path()
+        if get_compiler_cache_max_size():
+            environment["CCACHE_MAXSIZE"] = get_compiler_cache_max_size()
+        environment["CCACHE_BASEDIR"] = os.path.dirname(
+            os.path.normpath(get_tested_repository_build_path())
+        )
+
+    return environment
+
+
+def _get_cmake_options() -> List[str]:
+    """
+    Get CMake options shared by all tested projects.
+    """
+    options = ["-G", get_cmake_generator()]
+
+    compiler_cache = get_compiler_cache()
+    if compiler_cache:
+        options += [
+            "-DCMAKE_C_COMPILER_LAUNCHER=" + compiler_cache,
+            "-DCMAKE_CXX_COMPILER_LAUNCHER=" + compiler_cache,
+        ]
+
+    return options
+
+
+def _read_cmake_cache_value(cmake_cache_path: str, key: str) -> Optional[str]:
+    """
+    Get the value of the given variable from a CMakeCache.txt file or None.
+    """
+    with open(cmake_cache_path) as cmake_cache_file:
+        for line in cmake_cache_file:
+            if line.startswith(key + ":"):
+                return line.split("=", 1)[1].rstrip("\n")
+
+    return None
+
+
+def _configure_cmake_project(build_path: str, arguments: List[str]) -> bool:
+    """
+    Configure a CMake project in the given build directory unless it was already
+    configured with the same arguments. The build tool itself re-runs CMake when
+    any of the project's CMake files changed.
 
     Returns True on success and False on failure.
     """
-    llvm_build_path = get_tested_repository_build_path()
+    cmake_cache_path = os.path.join(build_path, "CMakeCache.txt")
+    stamp_path = os.path.join(build_path, CONFIGURE_STAMP_FILE_NAME)
+    stamp = hashlib.sha256("\n".join(arguments).encode("utf-8")).hexdigest()
+
+    if os.path.isfile(cmake_cache_path) and os.path.isfile(stamp_path):
+        with open(stamp_path) as stamp_file:
+            if stamp_file.read() == stamp:
+                print("Configure inputs did not change, skipping CMake configure")
+                return True
+
+        os.remove(stamp_path)
+
+    # CMake refuses to switch the generator of an already configured directory.
+    if os.path.isfile(cmake_cache_path):
+        generator = _read_cmake_cache_value(cmake_cache_path, "CMAKE_GENERATOR")
+        if generator != get_cmake_generator():
+            os.remove(cmake_cache_path)
+            shutil.rmtree(os.path.join(build_path, "CMakeFiles"), ignore_errors=True)
 
-    # Configure the CMake project.
     try:
         run_result = subprocess.run(
-            [
-                "cmake",
-                "-DCMAKE_BUILD_TYPE=Debug",
-                "-DLLVM_EXPERIMENTAL_TARGETS_TO_BUILD=SPIRV",
-                "../llvm/",
-            ],
-            cwd=llvm_build_path,
+            ["cmake"] + arguments,
+            cwd=build_path,
+            env=_get_build_environment(),
             timeout=10 * 60,
         )
     except subprocess.TimeoutExpired:
@@ -79,12 +185,24 @@ def _build_llvm_spirv_backend() -> bool:
     if not run_result.returncode == 0:
         return False
 
-    # Build the project.
+    with open(stamp_path, "w") as stamp_file:
+        stamp_file.write(stamp)
+
+    return True
+
+
+def _build_cmake_project(build_path: str, timeout: int) -> bool:
+    """
+    Build an already configured CMake project in the given build directory.
+
+    Returns True on success and False on failure.
+    """
     try:
         run_result = subprocess.run(
-            ["make", "-j4"],
-            cwd=llvm_build_path,
-            timeout=12 * 60 * 60,
+            ["cmake", "--build", ".", "--parallel", str(get_build_compile_jobs())],
+            cwd=build_path,
+            env=_get_build_environment(),
+            timeout=timeout,
         )
     except subprocess.TimeoutExpired:
         return False
@@ -95,144 +213,463 @@ def _build_llvm_spirv_backend() -> bool:
     return True
 
 
-def _build_llvm_backend_wrapper() -> bool:
+def _reset_compiler_cache_stats() -> None:
     """
-    Configure and build the LLVM backend wrapper.
+    Zero the compiler cache statistics, if compiler caching is enabled.
+    """
+    if not get_compiler_cache():
+        return
+
+    subprocess.run(
+        [get_compiler_cache(), "--zero-stats"],
+        stdout=subprocess.DEVNULL,
+        env=_get_build_environment(),
+    )
+
+
+def _get_compiler_cache_stats() -> Optional[Tuple[int, int]]:
+    """
+    Get a (hits, misses) tuple of the compiler cache since the last reset or None
+    if compiler caching is disabled or the statistics are not available.
+    """
+    if not get_compiler_cache():
+        return None
+
+    run_result = subprocess.run(
+        [get_compiler_cache(), "--print-stats"],
+        stdout=subprocess.PIPE,
+        env=_get_build_environment(),
+    )
+    if not run_result.returncode == 0:
+        return None
+
+    stats = {}
+    for line in run_result.stdout.decode("utf-8").splitlines():
+        key, _, value = line.partition("\t")
+        if value.isdigit():
+            stats[key] = int(value)
+
+    hits = stats.get("direct_cache_hit", 0) + stats.get("preprocessed_cache_hit", 0)
+    misses = stats.get("cache_miss", 0)
+    return (hits, misses)
+
+
+def _get_llvm_spirv_backend_configure_arguments() -> List[str]:
+    """
+    Get CMake configure arguments of the LLVM SPIR-V backend.
+    """
+    return _get_cmake_options() + [
+        "-DCMAKE_BUILD_TYPE=Debug",
+        "-DLLVM_EXPERIMENTAL_TARGETS_TO_BUILD=SPIRV",
+        "-DLLVM_PARALLEL_COMPILE_JOBS=" + str(get_build_compile_jobs()),
+        "-DLLVM_PARALLEL_LINK_JOBS=" + str(get_build_link_jobs()),
+        "../llvm/",
+    ]
+
+
+def _get_llvm_backend_wrapper_configure_arguments() -> List[str]:
+    """
+    Get CMake configure arguments of the LLVM backend wrapper.
+    """
+    return _get_cmake_options() + [
+        "-DLLVM_DIR=" + get_tested_repository_build_path() + "lib/cmake/llvm",
+        "..",
+    ]
+
+
+def _build_llvm_spirv_backend() -> bool:
+    """
+    Configure and build the LLVM SPIR-V backend.
 
     Returns True on success and False on failure.
     """
     llvm_build_path = get_tested_repository_build_path()
-    backend_wrapper_build_path = get_backend_wrapper_build_path()
 
     # Configure the CMake project.
-    try:
-        run_result = subprocess.run(
-            [
-                "cmake",
-                "-DLLVM_DIR=" + llvm_build_path + "lib/cmake/llvm",
-                "..",
-            ],
-            cwd=backend_wrapper_build_path,
-            timeout=10 * 60,
-        )
-    except subprocess.TimeoutExpired:
+    success = _configure_cmake_project(
+        llvm_build_path, _get_llvm_spirv_backend_configure_arguments()
+    )
+    if not success:
         return False
 
-    if not run_result.returncode == 0:
+    # Build the project.
+    return _build_cmake_project(llvm_build_path, timeout=12 * 60 * 60)
+
+
+def _build_llvm_backend_wrapper() -> bool:
+    """
+    Configure and build the LLVM backend wrapper.
+
+    Returns True on success and False on failure.
+    """
+    backend_wrapper_build_path = get_backend_wrapper_build_path()
+
+    # Configure the CMake project.
+    success = _configure_cmake_project(
+        backend_wrapper_build_path, _get_llvm_backend_wrapper_configure_arguments()
+    )
+    if not success:
         return False
 
     # Build the project.
-    try:
-        run_result = subprocess.run(
-            ["make", "-j4"],
-            cwd=backend_wrapper_build_path,
-            timeout=1 * 60 * 60,
-        )
-    except subprocess.TimeoutExpired:
+    return _build_cmake_project(backend_wrapper_build_path, timeout=1 * 60 * 60)
+
+
+def _get_output_store() -> OutputStore:
+    """
+    Get the local store of full test outputs.
+    """
+    return OutputStore(get_output_store_path(), get_output_store_max_size())
+
+
+def _get_build_artifact_cache() -> Optional[ArtifactCache]:
+    """
+    Get the build artifact cache or None if build artifacts are not cached.
+    """
+    if not get_artifact_cache_path():
+        return None
+
+    return ArtifactCache(get_artifact_cache_path(), get_artifact_cache_max_size())
+
+
+def _get_build_artifact_directories() -> Dict[str, str]:
+    """
+    Get the directories with build artifacts needed for testing a revision
+    (artifact name -> directory path).
+    """
+    return {
+        "llvm-bin": os.path.join(get_tested_repository_build_path(), "bin"),
+        "backend-wrapper": get_backend_wrapper_build_path(),
+    }
+
+
+def _get_build_artifact_key(revision_hash: str) -> str:
+    """
+    Get the build artifact cache key of the given revision built with the current
+    build configuration.
+    """
+    return ArtifactCache.get_key(
+        revision_hash,
+        _get_llvm_spirv_backend_configure_arguments()
+        + _get_llvm_backend_wrapper_configure_arguments(),
+    )
+
+
+def _build(revision_hash: str) -> bool:
+    """
+    Build the LLVM SPIR-V backend and the backend wrapper for the checked out
+    revision or restore them from the build artifact cache.
+
+    Returns True on success and False on failure.
+    """
+    artifact_cache = _get_build_artifact_cache()
+    if artifact_cache:
+        artifact_key = _get_build_artifact_key(revision_hash)
+        if artifact_cache.restore(artifact_key, _get_build_artifact_directories()):
+            print(f"Restored build artifacts for revision {revision_hash}")
+            return True
+
+    # Build the LLVM project.
+    print("Building the LLVM project...")
+    success = _build_llvm_spirv_backend()
+    if not success:
+        print("Building the LLVM project failed")
         return False
 
-    if not run_result.returncode == 0:
+    # Build the backend wrapper.
+    print("Building the backend wrapper...")
+    success = _build_llvm_backend_wrapper()
+    if not success:
+        print("Building the backend wrapper failed")
         return False
 
+    if artifact_cache:
+        artifact_cache.store(
+            artifact_key,
+            _get_build_artifact_directories(),
+            BUILD_SYSTEM_FILE_PATTERNS,
+        )
+
     return True
 
 
-def _run_all_lit_tests() -> List[LITResult]:
+def _parse_lit_result(line: str) -> Optional[LITResult]:
+    """
+    Create a LITResult from a line of llvm-lit output or None if the line does not
+    report a test result.
+    """
+    if not ": LLVM :: " in line:
+        return None
+
+    test_path = line.split(" ")[3]
+    passing = not "FAIL" in line
+    return LITResult(test_path, passing)
+
+
+def _run_lit_tests(
+    is_cancelled: Callable[[], bool] = lambda: False,
+    test_paths: List[str] = None,
+    excluded_test_paths: List[str] = None,
+) -> Iterator[LITResult]:
     """
-    Run all LLVM SPIR-V LIT tests and create a LITResult for each.
+    Run LLVM SPIR-V LIT tests and yield a LITResult for each as soon as llvm-lit
+    reports it.
+
+    All tests are run unless a list of test paths (relative to llvm/test/) is
+    given. Tests in excluded_test_paths are skipped.
+
+    llvm-lit is terminated if is_cancelled returns True after a reported test.
     """
     lit_executable = os.path.join(get_tested_repository_build_path(), "bin/llvm-lit")
-    lit_test_directory = os.path.join(
-        get_tested_repository_build_path(), "../llvm/test/CodeGen/SPIRV/"
+    lit_test_suite_directory = os.path.join(
+        get_tested_repository_build_path(), "../llvm/test/"
     )
 
-    # Run all lit tests and catch the output.
-    run_result = subprocess.run(
-        [lit_executable, lit_test_directory, "--max-time", "30"], stdout=subprocess.PIPE
-    )
-    standard_output = run_result.stdout.decode("utf-8")
+    arguments = ["--max-time", "30"]
+    if test_paths is None:
+        arguments.append(os.path.join(lit_test_suite_directory, "CodeGen/SPIRV/"))
+    else:
+        arguments += [os.path.join(lit_test_suite_directory, p) for p in test_paths]
 
-    # Create a LITResult for each line with result.
-    results = []
-    for line in standard_output.splitlines():
-        if not ": LLVM :: " in line:
-            continue
+    if excluded_test_paths:
+        arguments += [
+            "--filter-out",
+            "|".join(re.escape(path) + "$" for path in excluded_test_paths),
+        ]
 
-        test_path = line.split(" ")[3]
-        passing = not "FAIL" in line
-        results.append(LITResult(test_path, passing))
+    # Run the lit tests and read the output line by line.
+    with subprocess.Popen(
+        [lit_executable] + arguments,
+        stdout=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    ) as process:
+        for line in process.stdout:
+            result = _parse_lit_result(line.rstrip("\n"))
+            if result:
+                yield result
 
-    return results
+            if is_cancelled():
+                process.terminate()
+                break
 
 
-def _run_cts_test(test_category: str, test_name: str) -> CTSResult:
+def _run_selected_lit_tests(
+    job: QueuedJob, is_cancelled: Callable[[], bool]
+) -> Iterator[LITResult]:
     """
-    Run the specified CTS test and create a CTSResult for the run.
+    Run LLVM SPIR-V LIT tests following the LIT selection of the given job, or
+    only the tests selected by a targeted job.
+
+    Tests affected by the revision's changed files run first, the remaining
+    tests follow unless only affected tests were requested. All tests run in the
+    usual way if the affected tests cannot be determined.
     """
-    test_executable = get_cts_test_executable_absolute_path(test_category, test_name)
-    test_arguments = get_cts_test_arguments(test_category, test_name)
-    test_environment = get_cts_test_environment(test_category, test_name)
-    test_time_limit = get_cts_test_time_limit(test_category, test_name)
+    if job.selected_lit_tests:
+        print(f"Running {len(job.selected_lit_tests)} selected LIT tests...")
+        yield from _run_lit_tests(is_cancelled, test_paths=job.selected_lit_tests)
+        return
 
-    # Prepare a temporary directory for dump files.
-    dumps_directory_name = (
-        test_category + "_" + test_name + "_" + datetime.now().strftime("%Y%m%d%H%M%S")
+    affected_test_paths = None
+    if job.lit_selection != LitSelection.ALL:
+        affected_test_paths = get_affected_lit_tests(
+            os.path.join(get_tested_repository_build_path(), ".."),
+            job.changed_files,
+            get_lit_selection_history_depth(),
+        )
+
+    if affected_test_paths is None:
+        yield from _run_lit_tests(is_cancelled)
+        return
+
+    print(f"Running {len(affected_test_paths)} LIT tests affected by the revision...")
+    yield from _run_lit_tests(is_cancelled, test_paths=affected_test_paths)
+
+    if job.lit_selection == LitSelection.AFFECTED_FIRST and not is_cancelled():
+        print("Running remaining LIT tests...")
+        yield from _run_lit_tests(is_cancelled, excluded_test_paths=affected_test_paths)
+
+
+def _rerun_failed_lit_tests(
+    results: List[LITResult], max_reruns: int, is_cancelled: Callable[[], bool]
+) -> None:
+    """
+    Re-run the given failed LIT tests up to max_reruns times, each until a re-run
+    passes, and count the re-runs in their results.
+    """
+    failed_results = {result.test_path: result for result in results}
+    for _ in range(max_reruns):
+        if not failed_results or is_cancelled():
+            return
+
+        print(f"Re-running {len(failed_results)} failed LIT tests...")
+        test_paths = list(failed_results)
+        for rerun_result in _run_lit_tests(is_cancelled, test_paths=test_paths):
+            result = failed_results.get(rerun_result.test_path)
+            if not result:
+                continue
+
+            result.rerun_count += 1
+            if rerun_result.passing:
+                result.rerun_pass_count += 1
+                del failed_results[result.test_path]
+                result.print()
+
+
+def _create_output_capture(
+    test_category: str, test_name: str, suffix: str
+) -> OutputCapture:
+    """
+    Create a capture of a test output stream in a new temporary file.
+    """
+    file_descriptor, path = tempfile.mkstemp(
+        prefix=test_category + "_" + test_name + "_", suffix=suffix
     )
-    dumps_directory_path = os.path.join("/tmp/", dumps_directory_name + "/")
-    os.mkdir(dumps_directory_path)
+    os.close(file_descriptor)
+
+    summary = OutputSummary(
+        get_output_head_lines(),
+        get_output_tail_lines(),
+        get_output_max_matched_lines(),
+        get_output_failure_pattern(),
+    )
+    return OutputCapture(path, summary)
+
+
+def _run_cts_test(
+    test_category: str,
+    test_name: str,
+    archiver: DumpArchiver,
+    dumps_enabled: bool,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Optional[Tuple[CTSResult, Optional[Future]]]:
+    """
+    Run the specified CTS test and create a CTSResult for the run. If enabled,
+    dumps of the test are archived in the background by the given archiver, the
+    returned future (None if there are no dumps) resolves to the archive.
+
+    The test is killed and None is returned as soon as is_cancelled returns True.
+    """
+    test = get_cts_test(test_category, test_name)
+    test_executable = os.path.join(get_cts_build_path(), test.executable_path)
+    test_arguments = test.arguments
+    test_environment = test.environment
+    test_time_limit = test.time_limit
+
+    # A test missing from the CTS build fails alone instead of stopping the job.
+    if not os.path.isfile(test_executable):
+        now = datetime.now()
+        message = f"Test executable {test_executable} was not found"
+        result = CTSResult(
+            test_category,
+            test_name,
+            False,
+            False,
+            now,
+            now,
+            message,
+            message,
+            test_executable,
+            " ".join(test_arguments),
+            get_cts_version(),
+            get_igc_version(),
+            get_neo_version(),
+        )
+        return result, None
 
     # Setup the test environment.
     environment = os.environ.copy()
     environment.pop("RUNNER_KEY", None)
-    environment["IGC_ShaderDumpEnable"] = "1"
-    environment["IGC_ShaderDumpPidDisable"] = "1"
-    environment["IGC_DumpToCustomDir"] = dumps_directory_path
+
+    # Prepare a new temporary directory for dump files, unique even for re-runs
+    # and same-named tests running at the same time.
+    dumps_directory_path = None
+    if dumps_enabled:
+        dumps_directory_path = (
+            tempfile.mkdtemp(prefix=test_category + "_" + test_name + "_") + "/"
+        )
+
+        environment["IGC_ShaderDumpEnable"] = "1"
+        environment["IGC_ShaderDumpPidDisable"] = "1"
+        environment["IGC_DumpToCustomDir"] = dumps_directory_path
 
     for variable in test_environment:
         environment[variable] = "1"
 
-    # Start the test.
-    start_time = datetime.now()
-    try:
-        run_result = subprocess.run(
+    # Capture the outputs into temporary files summarized while the test runs.
+    stdout_capture = _create_output_capture(test_category, test_name, ".stdout")
+    stderr_capture = _create_output_capture(test_category, test_name, ".stderr")
+    with stdout_capture, stderr_capture:
+        # Start the test.
+        start_time = datetime.now()
+        process = subprocess.Popen(
             [test_executable] + test_arguments,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stdout=stdout_capture.file,
+            stderr=stderr_capture.file,
             cwd=os.path.dirname(test_executable),
             env=environment,
-            timeout=test_time_limit * 60,
-        )
-        passing = run_result.returncode == 0 and (
-            "PASSED test." in run_result.stdout.decode("utf-8")
-            or "failed" not in run_result.stdout.decode("utf-8").lower()
         )
+
+        # Wait for the test to finish, checking for timeout and cancellation.
+        cancelled = False
         timedout = False
-        standard_output = run_result.stdout.decode("utf-8").replace("\\n", "\n")
-        standard_error = run_result.stderr.decode("utf-8").replace("\\n", "\n")
-    except subprocess.TimeoutExpired:
-        passing = False
-        timedout = True
-        standard_output = f"Test timed out after {test_time_limit} minutes"
-        standard_error = f"Test timed out after {test_time_limit} minutes"
-    end_time = datetime.now()
-    # Testing ended.
-
-    # If dump files were generated, delete all irrelevant dumps and make an archive.
-    # Delete the dumps directory after.
-    if os.listdir(dumps_directory_path):
-        all_dump_files = os.listdir(dumps_directory_path)
-        for file in all_dump_files:
-            if not "backend" in file and not ".cl" in file:
-                os.remove(os.path.join(dumps_directory_path, file))
-
-        shutil.make_archive(dumps_directory_path[:-1], "gztar", dumps_directory_path)
-        dumps_path = dumps_directory_path[:-1] + ".tar.gz"
-        shutil.rmtree(dumps_directory_path)
-    else:
-        dumps_path = None
-        os.rmdir(dumps_directory_path)
+        while True:
+            try:
+                process.wait(timeout=CTS_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                stdout_capture.update()
+                stderr_capture.update()
+
+                elapsed = datetime.now() - start_time
+                cancelled = is_cancelled()
+                timedout = elapsed.total_seconds() > test_time_limit * 60
+                if cancelled or timedout:
+                    process.kill()
+                    process.wait()
+                    break
+
+        stdout_capture.update(final=True)
+        stderr_capture.update(final=True)
+        end_time = datetime.now()
+        # Testing ended.
+
+        stdout_summary = stdout_capture.summary
+        passing = (
+            not timedout
+            and process.returncode == 0
+            and (stdout_summary.reported_pass or not stdout_summary.reported_failure)
+        )
+        standard_output = stdout_summary.get_text().replace("\\n", "\n")
+        standard_error = stderr_capture.summary.get_text().replace("\\n", "\n")
+        if timedout:
+            standard_output += f"Test timed out after {test_time_limit} minutes"
+            standard_error += f"Test timed out after {test_time_limit} minutes"
+
+        # Keep the full outputs if they did not fit into the summaries.
+        output_truncated = (
+            stdout_summary.is_truncated() or stderr_capture.summary.is_truncated()
+        )
+        full_output_path = None
+        if output_truncated and not cancelled:
+            full_output_path = stdout_capture.PATH[: -len(".stdout")] + ".log.gz"
+            write_full_output(full_output_path, stdout_capture, stderr_capture)
+
+    if cancelled:
+        if dumps_directory_path:
+            shutil.rmtree(dumps_directory_path)
+        return None
+
+    # If dump files were generated, archive the relevant dumps in the background,
+    # so the next test can start right away.
+    dump_archive = None
+    if dumps_directory_path:
+        if os.listdir(dumps_directory_path):
+            dump_archive = archiver.submit(dumps_directory_path)
+        else:
+            os.rmdir(dumps_directory_path)
 
-    return CTSResult(
+    result = CTSResult(
         test_category,
         test_name,
         passing,
@@ -246,29 +683,215 @@ def _run_cts_test(test_category: str, test_name: str) -> CTSResult:
         get_cts_version(),
         get_igc_version(),
         get_neo_version(),
-        dumps_path,
+        output_truncated=output_truncated,
+        full_output_path=full_output_path,
     )
+    return result, dump_archive
 
 
-def test_remote_queued_job(session: APISession) -> bool:
+def _run_cts_test_with_reruns(
+    test_category: str,
+    test_name: str,
+    archiver: DumpArchiver,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Optional[Tuple[CTSResult, Optional[Future]]]:
     """
-    Get a queued job from the API, checkout the given revision, build the backend,
-    build the wrapper, run the tests, and post the results.
+    Run the specified CTS test capturing dumps according to the dump policy and
+    re-run it up to FLAKY_RERUNS times if it fails, until a re-run passes. The
+    result of the first run is kept together with the outcomes of the re-runs.
 
-    Returns False in case no testing job was available or current job was cancelled.
+    With the "on_failure" policy the test runs without dumps first. A failed or
+    timed out test is then re-run at least once, with dumps enabled for the first
+    re-run only.
     """
-    # Get a single queued job from the API. The status of this job is autmatically
-    # changed from "Queued" to "Dispatched".
-    pk, revision_hash, scheduled_testgroups = session.get_queued_job()
+    dump_policy = get_dump_policy()
+    run = _run_cts_test(
+        test_category, test_name, archiver, dump_policy == "always", is_cancelled
+    )
+    if run is None:
+        return None
 
-    if not pk:
-        # No job for testing
+    result, dump_archive = run
+    result.dump_policy = dump_policy
+    if result.passing:
+        return result, dump_archive
+
+    max_reruns = get_flaky_reruns()
+    if dump_policy == "on_failure":
+        max_reruns = max(max_reruns, 1)
+
+    while result.rerun_count < max_reruns and not result.rerun_pass_count:
+        dumps_enabled = dump_policy == "on_failure" and result.rerun_count == 0
+        print(
+            f"Re-running {test_category}/{test_name}"
+            + (" with dumps enabled" if dumps_enabled else "")
+        )
+        rerun = _run_cts_test(
+            test_category, test_name, archiver, dumps_enabled, is_cancelled
+        )
+        if rerun is None:
+            # Keep the outcome of the first run if cancelled while re-running.
+            break
+
+        rerun_result, rerun_dump_archive = rerun
+        result.rerun_count += 1
+        if rerun_result.passing:
+            result.rerun_pass_count += 1
+        if dumps_enabled:
+            result.rerun_passing = rerun_result.passing
+            dump_archive = rerun_dump_archive
+        if rerun_result.full_output_path:
+            os.remove(rerun_result.full_output_path)
+
+    return result, dump_archive
+
+
+def _get_cts_test_result(future: Future) -> Optional[CTSResult]:
+    """
+    Get the CTSResult of a finished test run with its dump archive (if any).
+    """
+    run = future.result()
+    if run is None:
+        return None
+
+    result, dump_archive = run
+    if dump_archive:
+        dump_archive = dump_archive.result()
+        result.dump_path = dump_archive.path
+        result.dump_size = dump_archive.dump_size
+        result.dump_archive_size = dump_archive.archive_size
+        result.dump_time = dump_archive.duration
+
+    return result
+
+
+def _is_cts_test_archived(future: Future) -> bool:
+    """
+    Check whether a test run and the archiving of its dumps have finished.
+    """
+    if not future.done():
         return False
 
-    print(f"Testing job {pk} for revision {revision_hash}")
+    run = future.result()
+    return run is None or run[1] is None or run[1].done()
 
-    # Change the status to "Testing".
-    session.update_job_status(pk, JobStatus.TESTING)
+
+def _run_cts_tests(
+    tests: List[CtsTest], is_cancelled: Callable[[], bool] = lambda: False
+) -> Iterator[CTSResult]:
+    """
+    Run the given OpenCL CTS tests on a pool of workers and yield a CTSResult for
+    each test in the order of the given list.
+
+    Up to CTS_PARALLEL_JOBS shared tests run at the same time, while tests marked
+    as exclusive run alone. Dumps are archived in the background without holding
+    up the next test. Once is_cancelled returns True, no new test is started and
+    running tests are killed without yielding a result.
+    """
+    parallel_jobs = get_cts_parallel_jobs()
+    archiver = DumpArchiver(
+        get_dump_compressor(), get_dump_compression_level(), get_dump_archive_jobs()
+    )
+
+    with archiver, ThreadPoolExecutor(max_workers=parallel_jobs) as executor:
+        # Started tests as (future, exclusive) pairs in the order of the list.
+        started = deque()
+
+        for test in tests:
+            exclusive = test.exclusive
+
+            # Wait until the test can be started: an exclusive test needs an idle
+            # machine, a shared test needs a free worker and no exclusive test.
+            while True:
+                running = [pair for pair in started if not pair[0].done()]
+                if not running:
+                    break
+                if not exclusive and len(running) < parallel_jobs:
+                    if not any(running_exclusive for _, running_exclusive in running):
+                        break
+                wait([future for future, _ in running], return_when=FIRST_COMPLETED)
+
+            # Yield finished results, keeping the order of the list.
+            while started and _is_cts_test_archived(started[0][0]):
+                result = _get_cts_test_result(started.popleft()[0])
+                if result:
+                    yield result
+
+            if is_cancelled():
+                break
+
+            future = executor.submit(
+                _run_cts_test_with_reruns,
+                test.test_category,
+                test.test_name,
+                archiver,
+                is_cancelled,
+            )
+            started.append((future, exclusive))
+
+        # Yield the remaining results.
+        while started:
+            result = _get_cts_test_result(started.popleft()[0])
+            if result:
+                yield result
+
+
+def _order_cts_tests_by_duration(
+    tests: List[CtsTest], durations: Dict[Tuple[str, str], float]
+) -> List[CtsTest]:
+    """
+    Order the given OpenCL CTS tests for running in parallel: exclusive tests
+    first (as they run alone anyway), then the longest shared tests first so the
+    workers finish at about the same time. Tests without a known duration are
+    assumed to be long and keep their relative order.
+    """
+    get_duration = lambda test: durations.get(
+        (test.test_category, test.test_name), float("inf")
+    )
+    exclusive_tests = [test for test in tests if test.exclusive]
+    shared_tests = [test for test in tests if not test.exclusive]
+
+    return exclusive_tests + sorted(shared_tests, key=get_duration, reverse=True)
+
+
+def _get_scheduled_cts_tests(job: QueuedJob) -> List[CtsTest]:
+    """
+    Get the list of OpenCL CTS tests in categories scheduled to run, limited to
+    the tests selected by a targeted job.
+    """
+    scheduled_tests = []
+    for test_category in CONFIG.get_cts_test_categories():
+        if job.scheduled_testgroups.get("cts_" + test_category):
+            scheduled_tests += CONFIG.get_cts_tests_in_category(test_category)
+
+    if job.selected_cts_tests:
+        scheduled_tests = [
+            test
+            for test in scheduled_tests
+            if test.test_category + "/" + test.test_name in job.selected_cts_tests
+        ]
+
+    return scheduled_tests
+
+
+def _test_job(
+    job: QueuedJob,
+    session: APISession,
+    uploader: BackgroundUploader,
+    is_cancelled: Callable[[], bool],
+    report_progress: Callable[[str, int, int], None],
+) -> bool:
+    """
+    Checkout the given job's revision, build the backend, build the wrapper, run
+    the tests, and post the results in the background. The latest test, the number
+    of finished tests and the number of remaining tests are passed to
+    report_progress after every result.
+
+    Returns False in case the job was cancelled.
+    """
+    pk = job.pk
+    revision_hash = job.revision_hash
+    scheduled_testgroups = job.scheduled_testgroups
 
     # Checkout the given LLVM commit.
     success = _checkout_llvm_spirv_backend_revision(revision_hash)
@@ -277,62 +900,206 @@ def test_remote_queued_job(session: APISession) -> bool:
         session.update_job_status(pk, JobStatus.BUILD_FAILED)
         return True
 
-    # Build the LLVM project.
-    print("Building the LLVM project...")
-    success = _build_llvm_spirv_backend()
+    # Build the LLVM project and the backend wrapper. The checkout is still
+    # needed when the build is restored, since LIT tests run from the sources.
+    _reset_compiler_cache_stats()
+    success = _build(revision_hash)
     if not success:
-        print("Building the LLVM project failed")
         session.update_job_status(pk, JobStatus.BUILD_FAILED)
         return True
 
-    # Build the backend wrapper.
-    print("Building the backend wrapper...")
-    success = _build_llvm_backend_wrapper()
-    if not success:
-        print("Building the backend wrapper failed")
-        session.update_job_status(pk, JobStatus.BUILD_FAILED)
-        return True
+    # Report compiler cache efficiency of the builds with the job.
+    compiler_cache_stats = _get_compiler_cache_stats()
+    if compiler_cache_stats:
+        hits, misses = compiler_cache_stats
+        status_details = f"Compiler cache: {hits} hits, {misses} misses"
+        print(status_details)
+        session.update_job_status(pk, JobStatus.TESTING, status_details)
 
     # Make sure the job was not cancelled before running the test.
-    if session.get_job_status(pk) != JobStatus.TESTING:
+    if is_cancelled():
         print("Testing job was cancelled")
         return True
 
-    # If scheduled in this job, run all SPIR-V LIT tests and post the results.
+    # Only CTS tests are counted in the reported progress: the number of LIT tests
+    # is not known upfront and they run much faster, so counting them would make
+    # the estimated completion time far too optimistic.
+    cts_tests = _get_scheduled_cts_tests(job)
+    if get_cts_parallel_jobs() > 1:
+        try:
+            durations = session.get_test_durations()
+            cts_tests = _order_cts_tests_by_duration(cts_tests, durations)
+        except (requests.exceptions.RequestException, ValueError) as exception:
+            print(f"Getting test durations failed: {exception}")
+    tests_done = 0
+    tests_remaining = len(cts_tests)
+
+    # If scheduled in this job, run the selected SPIR-V LIT tests and post the
+    # results as they are reported.
     print("Running LIT tests...")
     if "lit_all" in scheduled_testgroups and scheduled_testgroups["lit_all"]:
-        lit_results = _run_all_lit_tests()
-        for result in lit_results:
-            result.print()
-            session.post_lit_result(pk, result)
+        post_lit_results = lambda results: uploader.post_lit_results(pk, results)
+        flaky_reruns = get_flaky_reruns()
+        with ResultBatch(
+            post_lit_results,
+            get_result_batch_size(),
+            get_result_batch_interval(),
+            get_result_batch_max_bytes(),
+            get_lit_result_size,
+        ) as batch:
+            # Failed tests are posted once their re-runs are done.
+            failed_results = []
+            for result in _run_selected_lit_tests(job, is_cancelled):
+                result.print()
+                if result.passing or not flaky_reruns:
+                    batch.add(result)
+                else:
+                    failed_results.append(result)
+                report_progress(result.test_path, tests_done, tests_remaining)
+
+            _rerun_failed_lit_tests(failed_results, flaky_reruns, is_cancelled)
+            for result in failed_results:
+                batch.add(result)
+
+        if is_cancelled():
+            print("Testing job was cancelled")
+            return False
 
     # Run all scheduled OpenCL CTS tests and post the results.
     print("Running OpenCL CTS tests...")
-    cts_tests = get_cts_test_list()
-    for test in cts_tests:
-        # Skip the test if it is not in the category scheduled to run.
-        if not ("cts_" + test["test_category"]) in scheduled_testgroups:
-            continue
+    dump_size = 0
+    dump_time = 0
+    output_store = _get_output_store()
+    post_cts_results = lambda results: uploader.post_cts_results(pk, results)
+    with ResultBatch(
+        post_cts_results,
+        get_result_batch_size(),
+        get_result_batch_interval(),
+        get_result_batch_max_bytes(),
+        get_cts_result_size,
+    ) as batch:
+        for result in _run_cts_tests(cts_tests, is_cancelled):
+            result.print()
+            if result.full_output_path:
+                output_store.store(
+                    result.full_output_path,
+                    revision_hash,
+                    result.test_category,
+                    result.test_name,
+                    result.start_time,
+                )
+                result.full_output_path = None
 
-        if not scheduled_testgroups["cts_" + test["test_category"]]:
-            continue
+            batch.add(result)
+            dump_size += result.dump_size
+            dump_time += result.dump_time
+            tests_done += 1
+            tests_remaining -= 1
+            report_progress(
+                result.test_category + "/" + result.test_name,
+                tests_done,
+                tests_remaining,
+            )
 
-        # Make sure the job was not cancelled before running the test.
-        if session.get_job_status(pk) != JobStatus.TESTING:
-            print("Testing job was cancelled")
-            return False
+    print(f"Archived {dump_size} bytes of dumps in {dump_time:.2f} seconds")
 
-        result = _run_cts_test(test["test_category"], test["test_name"])
-        result.print()
-        session.post_cts_result(pk, result)
-        if result.dump_path:
-            os.remove(result.dump_path)
+    if is_cancelled():
+        print("Testing job was cancelled")
+        return False
 
+    # Mark the job as completed once all its results are uploaded.
     print(f"Finished testing job {pk} for {revision_hash}")
-    session.update_job_status(pk, JobStatus.COMPLETED)
+    uploader.update_job_status(pk, JobStatus.COMPLETED)
     return True
 
 
+def test_remote_queued_job(session: APISession, uploader: BackgroundUploader) -> bool:
+    """
+    Get a queued job from the API, checkout the given revision, build the backend,
+    build the wrapper, run the tests, and post the results in the background.
+
+    The job's lease is renewed in the background while testing, reporting the
+    testing progress. A cancellation reported by the API or an expired lease
+    interrupts running tests.
+
+    Returns False in case no testing job was available or current job was cancelled.
+    """
+    # Get a single queued job from the API. The status of this job is autmatically
+    # changed from "Queued" to "Dispatched".
+    job = session.get_queued_job()
+
+    if not job:
+        # No job for testing
+        return False
+
+    print(f"Testing job {job.pk} for revision {job.revision_hash}")
+
+    # Change the status to "Testing".
+    session.update_job_status(job.pk, JobStatus.TESTING)
+
+    with JobLease(session.clone(), job.pk, get_lease_renewal_interval()) as lease:
+        return _test_job(
+            job, session, uploader, lease.is_cancelled, lease.update_progress
+        )
+
+
+def upload_requested_outputs(session: APISession) -> None:
+    """
+    Upload the full outputs of test runs requested through the API that are
+    kept in the local output store.
+    """
+    output_store = _get_output_store()
+    for request in session.get_requested_outputs():
+        path = output_store.get(
+            request["revision_hash"],
+            request["test_category"],
+            request["test_name"],
+            request["start_time"],
+        )
+        if path:
+            print(
+                f"Uploading full output of {request['test_category']}"
+                f"/{request['test_name']} for {request['revision_hash']}"
+            )
+            session.post_full_output(request["pk"], path)
+
+
+class RequestedOutputUploader:
+    """
+    Uploads requested full test outputs every poll_interval seconds from a
+    background thread while inside the "with" block, so a request made while a
+    long job runs does not wait for the job to finish.
+    """
+
+    def __init__(self, session: APISession, poll_interval: int) -> None:
+        self.SESSION = session
+        self.POLL_INTERVAL = poll_interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._upload_loop, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def _upload_loop(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                upload_requested_outputs(self.SESSION)
+            except (
+                requests.exceptions.RequestException,
+                ValueError,
+                OSError,
+            ) as exception:
+                # Try again in the next interval.
+                print(f"Uploading requested outputs failed: {exception}")
+
+            self.stopped.wait(self.POLL_INTERVAL)
+
+
 def test_local_full_job() -> None:
     """
     Run all LIT and OpenCL CTS tests on a local HEAD revision of the backend.
@@ -343,15 +1110,15 @@ def test_local_full_job() -> None:
 
     # Run all SPIR-V LIT tests.
     print("Running LIT tests...")
-    lit_results = _run_all_lit_tests()
-    for result in lit_results:
+    for result in _run_lit_tests():
         result.print()
 
     # Run all scheduled OpenCL CTS tests.
     print("Running OpenCL CTS tests...")
     cts_tests = get_cts_test_list()
-    for test in cts_tests:
-        result = _run_cts_test(test["test_category"], test["test_name"])
+    for result in _run_cts_tests(cts_tests):
         result.print()
+        if result.full_output_path:
+            print(f"Full output: {result.full_output_path}")
 
     print(f"Finished full testing job for local HEAD revision")
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from artifacts import METADATA_FILE_NAME, ArtifactCache
+
+
+class ArtifactCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.build_path = os.path.join(self.path, "build")
+        self.cache = ArtifactCache(os.path.join(self.path, "cache"), 1024 * 1024)
+
+    def write_file(self, relative_path, content):
+        path = os.path.join(self.build_path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def read_file(self, relative_path):
+        with open(os.path.join(self.build_path, relative_path)) as file:
+            return file.read()
+
+    def test_key_depends_on_revision_and_configuration(self):
+        key = ArtifactCache.get_key("a" * 40, ["-G", "Ninja"])
+        self.assertEqual(key, ArtifactCache.get_key("a" * 40, ["-G", "Ninja"]))
+        self.assertNotEqual(key, ArtifactCache.get_key("b" * 40, ["-G", "Ninja"]))
+        self.assertNotEqual(key, ArtifactCache.get_key("a" * 40, ["-G", "Make"]))
+
+    def test_restore_misses_unknown_key(self):
+        self.assertFalse(self.cache.restore("missing", {"bin": self.build_path}))
+
+    def test_restores_stored_artifacts(self):
+        tool_path = self.write_file("bin/tool", "built")
+        os.utime(tool_path, (1000, 1000))
+        self.write_file("bin/CMakeCache.txt", "stored configuration")
+        self.cache.store(
+            "key", {"bin": os.path.join(self.build_path, "bin")}, ["CMakeCache.txt"]
+        )
+
+        # Rebuild another revision in place.
+        self.write_file("bin/tool", "rebuilt")
+        self.write_file("bin/other", "rebuilt")
+        self.write_file("bin/CMakeCache.txt", "live configuration")
+
+        self.assertTrue(
+            self.cache.restore("key", {"bin": os.path.join(self.build_path, "bin/")})
+        )
+        self.assertEqual(self.read_file("bin/tool"), "built")
+        self.assertEqual(os.stat(tool_path).st_mtime, 1000)
+        # Files not stored in the cache are kept.
+        self.assertEqual(self.read_file("bin/CMakeCache.txt"), "live configuration")
+        self.assertEqual(self.read_file("bin/other"), "rebuilt")
+        self.assertEqual(os.listdir(self.build_path), ["bin"])
+
+    def test_restores_missing_destination(self):
+        self.write_file("bin/tool", "built")
+        self.cache.store("key", {"bin": os.path.join(self.build_path, "bin")})
+        shutil.rmtree(self.build_path)
+
+        self.assertTrue(
+            self.cache.restore("key", {"bin": os.path.join(self.build_path, "bin")})
+        )
+        self.assertEqual(self.read_file("bin/tool"), "built")
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = ArtifactCache(os.path.join(self.path, "small-cache"), 150)
+        self.write_file("bin/tool", "x" * 100)
+        cache.store("old", {"bin": os.path.join(self.build_path, "bin")})
+        os.utime(os.path.join(cache.PATH, "old"), (1000, 1000))
+        cache.store("new", {"bin": os.path.join(self.build_path, "bin")})
+
+        self.assertEqual(os.listdir(cache.PATH), ["new"])
+        self.assertTrue(
+            os.path.isfile(os.path.join(cache.PATH, "new", METADATA_FILE_NAME))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
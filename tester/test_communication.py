@@ -0,0 +1,254 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import requests
+from communication import APISession, BackgroundUploader, CircuitBreaker, ResultBatch
+from results import LITResult
+
+# Number of seconds a test waits for a background post
+POST_TIMEOUT = 5
+
+
+class ResultBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.posted_batches = []
+
+    def post(self, results):
+        self.posted_batches.append(results)
+
+    def create_batch(self, batch_size=3, batch_interval=60, batch_max_bytes=100):
+        return ResultBatch(self.post, batch_size, batch_interval, batch_max_bytes, len)
+
+    def test_posts_full_batches(self):
+        with self.create_batch() as batch:
+            for result in ["a", "b", "c", "d"]:
+                batch.add(result)
+
+            self.assertEqual(self.posted_batches, [["a", "b", "c"]])
+
+        self.assertEqual(self.posted_batches, [["a", "b", "c"], ["d"]])
+
+    def test_posts_before_exceeding_max_bytes(self):
+        with self.create_batch(batch_max_bytes=10) as batch:
+            batch.add("12345")
+            batch.add("123456")
+
+            self.assertEqual(self.posted_batches, [["12345"]])
+
+        self.assertEqual(self.posted_batches, [["12345"], ["123456"]])
+
+    def test_posts_due_batch_in_background(self):
+        posted = threading.Event()
+
+        def post(results):
+            self.posted_batches.append(results)
+            posted.set()
+
+        with ResultBatch(post, 100, 0.1, 100, len) as batch:
+            batch.add("a")
+            self.assertTrue(posted.wait(POST_TIMEOUT))
+
+        self.assertEqual(self.posted_batches, [["a"]])
+
+    def test_posts_remaining_results_on_exception(self):
+        with self.assertRaises(RuntimeError):
+            with self.create_batch() as batch:
+                batch.add("a")
+                raise RuntimeError("Testing failed")
+
+        self.assertEqual(self.posted_batches, [["a"]])
+
+    def test_adds_while_background_post_is_in_progress(self):
+        post_started = threading.Event()
+        post_released = threading.Event()
+
+        def post(results):
+            post_started.set()
+            post_released.wait(POST_TIMEOUT)
+            self.posted_batches.append(results)
+
+        with ResultBatch(post, 100, 0.1, 100, len) as batch:
+            batch.add("a")
+            self.assertTrue(post_started.wait(POST_TIMEOUT))
+
+            # The background thread is posting, adding must not wait for it.
+            start_time = time.monotonic()
+            batch.add("b")
+            self.assertLess(time.monotonic() - start_time, POST_TIMEOUT / 2)
+            post_released.set()
+
+        self.assertEqual(self.posted_batches, [["a"], ["b"]])
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        circuit_breaker = CircuitBreaker(2, 60)
+        circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.get_wait_time(), 0)
+
+        circuit_breaker.record_failure()
+        self.assertGreater(circuit_breaker.get_wait_time(), 0)
+
+    def test_success_closes(self):
+        circuit_breaker = CircuitBreaker(2, 60)
+        circuit_breaker.record_failure()
+        circuit_breaker.record_success()
+        circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.get_wait_time(), 0)
+
+        circuit_breaker.record_failure()
+        circuit_breaker.record_success()
+        self.assertEqual(circuit_breaker.get_wait_time(), 0)
+
+
+class BackgroundUploaderTests(unittest.TestCase):
+    def setUp(self):
+        self.spool_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_path)
+
+        session = APISession("http://localhost/api/", "runner", "key")
+        self.uploader = BackgroundUploader(session, self.spool_path, 100)
+        # Retry right away.
+        self.uploader.BASE_BACKOFF = 0
+
+        self.sent_requests = []
+        self.status_codes = []
+        self.uploader.SESSION = mock.Mock()
+        self.uploader.SESSION.request.side_effect = self.send
+
+    def send(self, method, url, data=None, json=None, files=None, timeout=None):
+        self.sent_requests.append(
+            {
+                "url": url,
+                "json": json,
+                "data": data,
+                "files": {name: file.read() for name, file in (files or {}).items()},
+            }
+        )
+        response = requests.Response()
+        response.status_code = self.status_codes.pop(0) if self.status_codes else 200
+        return response
+
+    def post_lit_results(self, count):
+        results = [LITResult(f"test{i}.ll", True) for i in range(count)]
+        self.uploader.post_lit_results(1, results)
+        self.uploader.join()
+
+    def get_spooled_entries(self, path):
+        return sorted(name for name in os.listdir(path) if name.endswith(".json"))
+
+    def test_sends_upload_and_empties_spool(self):
+        self.post_lit_results(2)
+
+        self.assertEqual(len(self.sent_requests), 1)
+        self.assertEqual(
+            self.sent_requests[0]["url"], "http://localhost/api/job/1/lit/bulk/"
+        )
+        self.assertEqual(len(self.sent_requests[0]["json"]), 2)
+        self.assertEqual(os.listdir(self.spool_path), [])
+
+    def test_retries_server_errors(self):
+        self.status_codes = [500, 503]
+        self.post_lit_results(1)
+
+        self.assertEqual(len(self.sent_requests), 3)
+        self.assertEqual(os.listdir(self.spool_path), [])
+
+    def test_splits_rejected_bulk_upload(self):
+        self.status_codes = [413, 200, 400, 200, 400]
+        self.post_lit_results(4)
+
+        sent_tests = [
+            [result["test_path"] for result in request["json"]]
+            for request in self.sent_requests
+        ]
+        self.assertEqual(
+            sent_tests,
+            [
+                ["test0.ll", "test1.ll", "test2.ll", "test3.ll"],
+                ["test0.ll", "test1.ll"],
+                ["test2.ll", "test3.ll"],
+                ["test2.ll"],
+                ["test3.ll"],
+            ],
+        )
+        self.assertEqual(
+            os.listdir(self.spool_path), [BackgroundUploader.REJECTED_DIRECTORY_NAME]
+        )
+
+    def test_splits_dumps_with_their_results(self):
+        self.status_codes = [413]
+        dumps_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dumps_path)
+        results = []
+        for i in range(2):
+            dump_path = os.path.join(dumps_path, f"dump{i}.tar.gz")
+            with open(dump_path, "wb") as dump_file:
+                dump_file.write(b"dump" + str(i).encode("utf-8"))
+            result = mock.Mock(dump_path=dump_path)
+            results.append(result)
+
+        with mock.patch(
+            "communication._serialize_cts_result",
+            side_effect=lambda result: {"dump": os.path.basename(result.dump_path)},
+        ):
+            self.uploader.post_cts_results(1, results)
+            self.uploader.join()
+
+        sent_files = [request["files"] for request in self.sent_requests]
+        self.assertEqual(
+            sent_files,
+            [
+                {"dump_0": b"dump0", "dump_1": b"dump1"},
+                {"dump_0": b"dump0"},
+                {"dump_0": b"dump1"},
+            ],
+        )
+        self.assertEqual(os.listdir(self.spool_path), [])
+
+    def test_rejects_single_result(self):
+        self.status_codes = [400]
+        self.post_lit_results(1)
+
+        self.assertEqual(len(self.sent_requests), 1)
+        rejected_path = os.path.join(
+            self.spool_path, BackgroundUploader.REJECTED_DIRECTORY_NAME
+        )
+        self.assertEqual(len(self.get_spooled_entries(rejected_path)), 1)
+        self.assertEqual(self.get_spooled_entries(self.spool_path), [])
+
+    def test_drops_upload_for_stale_job(self):
+        self.status_codes = [BackgroundUploader.STALE_JOB_STATUS_CODE]
+        self.post_lit_results(2)
+
+        self.assertEqual(len(self.sent_requests), 1)
+        self.assertEqual(os.listdir(self.spool_path), [])
+
+    def test_resends_spooled_uploads(self):
+        entry = {
+            "method": "put",
+            "path": "job/1/",
+            "data": {"status": "F"},
+            "json": None,
+            "files": {},
+        }
+        with open(os.path.join(self.spool_path, "0-left-over.json"), "w") as file:
+            json.dump(entry, file)
+
+        session = APISession("http://localhost/api/", "runner", "key")
+        with mock.patch("requests.Session.request", side_effect=self.send):
+            uploader = BackgroundUploader(session, self.spool_path, 100)
+            uploader.join()
+
+        self.assertEqual(len(self.sent_requests), 1)
+        self.assertEqual(self.sent_requests[0]["data"], {"status": "F"})
+        self.assertEqual(os.listdir(self.spool_path), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
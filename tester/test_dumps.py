@@ -0,0 +1,68 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+from dumps import DumpArchiver
+
+
+class DumpArchiverTests(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def create_dumps_directory(self, file_names):
+        dumps_directory_path = tempfile.mkdtemp(dir=self.path) + "/"
+        for file_name in file_names:
+            with open(os.path.join(dumps_directory_path, file_name), "w") as file:
+                file.write(file_name * 10)
+        return dumps_directory_path
+
+    def test_archives_relevant_dumps(self):
+        dumps_directory_path = self.create_dumps_directory(
+            ["kernel.cl", "kernel_backend.spv", "kernel.ll", "options.txt"]
+        )
+        with DumpArchiver("gzip", 1, 2) as archiver:
+            dump_archive = archiver.submit(dumps_directory_path).result()
+
+        self.assertEqual(dump_archive.path, dumps_directory_path[:-1] + ".tar.gz")
+        with tarfile.open(dump_archive.path) as archive:
+            self.assertEqual(
+                sorted(archive.getnames()), ["kernel.cl", "kernel_backend.spv"]
+            )
+        self.assertGreater(dump_archive.dump_size, 0)
+        self.assertEqual(dump_archive.archive_size, os.path.getsize(dump_archive.path))
+        self.assertFalse(os.path.exists(dumps_directory_path))
+
+    def test_skips_archive_without_relevant_dumps(self):
+        dumps_directory_path = self.create_dumps_directory(["kernel.ll"])
+        with DumpArchiver("gzip", 1, 1) as archiver:
+            dump_archive = archiver.submit(dumps_directory_path).result()
+
+        self.assertIsNone(dump_archive.path)
+        self.assertEqual(os.listdir(self.path), [])
+
+    @unittest.skipUnless(shutil.which("zstd"), "zstd is not installed")
+    def test_archives_with_zstd(self):
+        dumps_directory_path = self.create_dumps_directory(["kernel.cl"])
+        with DumpArchiver("zstd", 3, 1) as archiver:
+            dump_archive = archiver.submit(dumps_directory_path).result()
+
+        self.assertEqual(dump_archive.path, dumps_directory_path[:-1] + ".tar.zst")
+        self.assertGreater(dump_archive.archive_size, 0)
+
+    def test_removes_partial_archive_on_failure(self):
+        dumps_directory_path = self.create_dumps_directory(["kernel.cl"])
+        os.chmod(os.path.join(dumps_directory_path, "kernel.cl"), 0)
+        if os.access(os.path.join(dumps_directory_path, "kernel.cl"), os.R_OK):
+            self.skipTest("File permissions are not enforced")
+
+        with DumpArchiver("gzip", 1, 1) as archiver:
+            dump_archive = archiver.submit(dumps_directory_path).result()
+
+        self.assertIsNone(dump_archive.path)
+        self.assertEqual(os.listdir(self.path), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
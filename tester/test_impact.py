@@ -0,0 +1,112 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from impact import get_affected_lit_tests
+
+# Number of commits searched for tests changed together with backend sources
+HISTORY_DEPTH = 100
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class AffectedLitTestsTests(unittest.TestCase):
+    def setUp(self):
+        self.repository_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repository_path)
+        self.git("init", "-q")
+
+        self.commit(
+            [
+                "llvm/lib/Target/SPIRV/SPIRVBuiltins.cpp",
+                "llvm/test/CodeGen/SPIRV/builtins.ll",
+                "llvm/test/CodeGen/SPIRV/Inputs/helper.ll",
+            ]
+        )
+        self.commit(
+            [
+                "llvm/lib/Target/SPIRV/SPIRVBuiltins.cpp",
+                "llvm/lib/Target/SPIRV/SPIRVUtils.cpp",
+                "llvm/test/CodeGen/SPIRV/utils.ll",
+            ]
+        )
+        self.commit(["llvm/lib/Target/SPIRV/SPIRVISelLowering.cpp"])
+
+    def git(self, *arguments):
+        subprocess.check_call(
+            [
+                "git",
+                "-c",
+                "user.name=Tester",
+                "-c",
+                "user.email=tester@example.com",
+            ]
+            + list(arguments),
+            cwd=self.repository_path,
+        )
+
+    def commit(self, paths):
+        for path in paths:
+            absolute_path = os.path.join(self.repository_path, path)
+            os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+            with open(absolute_path, "a") as file:
+                file.write("change\n")
+
+        self.git("add", "--", *paths)
+        self.git("commit", "-q", "-m", "Change")
+
+    def get_affected_lit_tests(self, changed_files):
+        return get_affected_lit_tests(
+            self.repository_path, changed_files, HISTORY_DEPTH
+        )
+
+    def test_selects_changed_tests(self):
+        self.assertEqual(
+            self.get_affected_lit_tests(["llvm/test/CodeGen/SPIRV/utils.ll"]),
+            ["CodeGen/SPIRV/utils.ll"],
+        )
+
+    def test_selects_tests_changed_with_backend_sources(self):
+        self.assertEqual(
+            self.get_affected_lit_tests(["llvm/lib/Target/SPIRV/SPIRVBuiltins.cpp"]),
+            ["CodeGen/SPIRV/builtins.ll", "CodeGen/SPIRV/utils.ll"],
+        )
+
+    def test_falls_back_without_co_changed_tests(self):
+        self.assertIsNone(
+            self.get_affected_lit_tests(["llvm/lib/Target/SPIRV/SPIRVISelLowering.cpp"])
+        )
+
+    def test_falls_back_for_files_outside_backend(self):
+        self.assertIsNone(
+            self.get_affected_lit_tests(
+                [
+                    "llvm/test/CodeGen/SPIRV/utils.ll",
+                    "llvm/lib/CodeGen/MachineInstr.cpp",
+                ]
+            )
+        )
+
+    def test_falls_back_for_test_inputs(self):
+        self.assertIsNone(
+            self.get_affected_lit_tests(["llvm/test/CodeGen/SPIRV/Inputs/helper.ll"])
+        )
+
+    def test_falls_back_without_changed_files(self):
+        self.assertIsNone(self.get_affected_lit_tests([]))
+
+    def test_ignores_deleted_tests(self):
+        self.git("rm", "-q", "llvm/test/CodeGen/SPIRV/utils.ll")
+        self.git("commit", "-q", "-m", "Delete test")
+
+        self.assertIsNone(
+            self.get_affected_lit_tests(["llvm/lib/Target/SPIRV/SPIRVUtils.cpp"])
+        )
+        self.assertEqual(
+            self.get_affected_lit_tests(["llvm/lib/Target/SPIRV/SPIRVBuiltins.cpp"]),
+            ["CodeGen/SPIRV/builtins.ll"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from output import (
+    MAX_LINE_LENGTH,
+    OutputCapture,
+    OutputStore,
+    OutputSummary,
+    write_full_output,
+)
+
+# Failure pattern used by the tests
+FAILURE_PATTERN = "(?i)error"
+
+
+class OutputSummaryTests(unittest.TestCase):
+    def feed_lines(self, summary, lines):
+        for line in lines:
+            summary.feed(line + "\n")
+
+    def test_keeps_short_output(self):
+        summary = OutputSummary(2, 2, 2, FAILURE_PATTERN)
+        self.feed_lines(summary, ["a", "b", "c"])
+
+        self.assertFalse(summary.is_truncated())
+        self.assertEqual(summary.get_text(), "a\nb\nc\n")
+
+    def test_keeps_head_tail_and_matched_lines(self):
+        summary = OutputSummary(1, 1, 1, FAILURE_PATTERN)
+        self.feed_lines(summary, ["head", "x", "error 1", "error 2", "y", "tail"])
+
+        self.assertTrue(summary.is_truncated())
+        self.assertEqual(
+            summary.get_text(),
+            "head\n"
+            "[... 4 lines omitted, matching lines kept below ...]\n"
+            "[line 3] error 1\n"
+            "[... end of omitted lines ...]\n"
+            "tail\n",
+        )
+
+    def test_reports_pass_and_failure(self):
+        summary = OutputSummary(1, 1, 0, FAILURE_PATTERN)
+        self.feed_lines(summary, ["PASSED test.", "2 tests FAILED"])
+
+        self.assertTrue(summary.reported_pass)
+        self.assertTrue(summary.reported_failure)
+
+    def test_shortens_long_lines(self):
+        summary = OutputSummary(1, 1, 0, FAILURE_PATTERN)
+        summary.feed("a" * (MAX_LINE_LENGTH + 1) + "\n")
+
+        self.assertEqual(summary.get_text(), "a" * MAX_LINE_LENGTH + " [...]\n")
+
+
+class OutputCaptureTests(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def create_capture(self, name):
+        return OutputCapture(
+            os.path.join(self.path, name), OutputSummary(10, 10, 0, FAILURE_PATTERN)
+        )
+
+    def test_feeds_complete_lines(self):
+        with self.create_capture("test.stdout") as capture:
+            capture.file.write(b"first\nsec")
+            capture.file.flush()
+            capture.update()
+            self.assertEqual(capture.summary.line_count, 1)
+
+            capture.file.write(b"ond\nthird")
+            capture.file.flush()
+            capture.update()
+            self.assertEqual(capture.summary.line_count, 2)
+
+            capture.update(final=True)
+            self.assertEqual(capture.summary.get_text(), "first\nsecond\nthird\n")
+
+        self.assertEqual(os.listdir(self.path), [])
+
+    def test_writes_full_output(self):
+        full_output_path = os.path.join(self.path, "test.log.gz")
+        stdout_capture = self.create_capture("test.stdout")
+        stderr_capture = self.create_capture("test.stderr")
+        with stdout_capture, stderr_capture:
+            stdout_capture.file.write(b"output\n")
+            stderr_capture.file.write(b"error\n")
+            write_full_output(full_output_path, stdout_capture, stderr_capture)
+
+        with gzip.open(full_output_path, "rb") as full_output_file:
+            self.assertEqual(
+                full_output_file.read(),
+                b"=== Standard output ===\noutput\n"
+                b"\n=== Standard error ===\nerror\n",
+            )
+
+
+class OutputStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def create_output(self, name, size):
+        output_path = os.path.join(self.path, name)
+        with open(output_path, "wb") as output_file:
+            output_file.write(b"x" * size)
+        return output_path
+
+    def test_stores_and_evicts_outputs(self):
+        store = OutputStore(os.path.join(self.path, "store"), 150)
+        start_time = datetime(2024, 1, 1)
+        store.store(self.create_output("a", 100), "rev", "api", "a", start_time)
+        self.assertIsNotNone(store.get("rev", "api", "a", start_time))
+
+        store.store(self.create_output("b", 100), "rev", "api", "b", start_time)
+        self.assertIsNone(store.get("rev", "api", "a", start_time))
+        self.assertIsNotNone(store.get("rev", "api", "b", start_time))
+
+
+if __name__ == "__main__":
+    unittest.main()
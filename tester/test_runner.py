@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import runner
+from config import CtsTest
+
+# Number of OpenCL CTS tests run at the same time by the tests
+PARALLEL_JOBS = 3
+
+
+def create_test(name, exclusive=False):
+    return CtsTest(test_category="api", test_name=name, exclusive=exclusive)
+
+
+class CtsRunnerPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = set()
+        self.started = []
+        self.overlaps = []
+        self.durations = {}
+
+        for name, value in [
+            ("get_cts_parallel_jobs", PARALLEL_JOBS),
+            ("get_dump_compressor", "gzip"),
+            ("get_dump_compression_level", 1),
+            ("get_dump_archive_jobs", 1),
+        ]:
+            patcher = mock.patch("runner." + name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = mock.patch(
+            "runner._run_cts_test_with_reruns", side_effect=self.run_test
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_test(self, test_category, test_name, archiver, is_cancelled):
+        with self.lock:
+            self.started.append(test_name)
+            self.overlaps.append((test_name, set(self.running)))
+            self.running.add(test_name)
+
+        time.sleep(self.durations.get(test_name, 0.01))
+
+        with self.lock:
+            self.running.remove(test_name)
+        return mock.Mock(test_name=test_name), None
+
+    def run_tests(self, tests, is_cancelled=lambda: False):
+        return [
+            result.test_name for result in runner._run_cts_tests(tests, is_cancelled)
+        ]
+
+    def test_yields_results_in_order(self):
+        self.durations = {"slow": 0.2}
+        tests = [create_test(name) for name in ["slow", "fast1", "fast2"]]
+
+        self.assertEqual(self.run_tests(tests), ["slow", "fast1", "fast2"])
+        # The fast tests did not wait for the slow one.
+        self.assertIn("slow", dict(self.overlaps)["fast2"])
+
+    def test_limits_parallel_tests(self):
+        tests = [create_test(f"test{i}") for i in range(10)]
+
+        self.assertEqual(len(self.run_tests(tests)), 10)
+        for _, running in self.overlaps:
+            self.assertLess(len(running), PARALLEL_JOBS)
+
+    def test_runs_exclusive_tests_alone(self):
+        self.durations = {"exclusive": 0.1}
+        tests = [
+            create_test("before1"),
+            create_test("before2"),
+            create_test("exclusive", exclusive=True),
+            create_test("after1"),
+            create_test("after2"),
+        ]
+
+        self.assertEqual(
+            self.run_tests(tests),
+            ["before1", "before2", "exclusive", "after1", "after2"],
+        )
+        overlaps = dict(self.overlaps)
+        self.assertEqual(overlaps["exclusive"], set())
+        self.assertNotIn("exclusive", overlaps["after1"])
+        self.assertNotIn("exclusive", overlaps["after2"])
+
+    def test_stops_starting_tests_when_cancelled(self):
+        tests = [create_test(f"test{i}") for i in range(10)]
+        is_cancelled = lambda: len(self.started) >= 2
+
+        self.run_tests(tests, is_cancelled)
+        self.assertLess(len(self.started), 10)
+
+
+class CtsTestOrderTests(unittest.TestCase):
+    def test_orders_exclusive_then_longest_tests(self):
+        tests = [
+            create_test("short"),
+            create_test("unknown"),
+            create_test("exclusive", exclusive=True),
+            create_test("long"),
+        ]
+        durations = {("api", "short"): 1, ("api", "long"): 10, ("api", "exclusive"): 5}
+
+        ordered_tests = runner._order_cts_tests_by_duration(tests, durations)
+        self.assertEqual(
+            [test.test_name for test in ordered_tests],
+            ["exclusive", "unknown", "long", "short"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
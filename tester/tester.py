@@ -1,21 +1,36 @@
 import argparse
 import sys
 from time import sleep
-from communication import APISession
-from runner import test_remote_queued_job, test_local_full_job
+from communication import APISession, BackgroundUploader
+from config import CONFIG, get_upload_queue_size, get_upload_spool_path
+from runner import (
+    OUTPUT_REQUEST_POLL_INTERVAL,
+    RequestedOutputUploader,
+    test_local_full_job,
+    test_remote_queued_job,
+)
 
 
 def run_automated_testing(api_endpoint: str, runner_name: str, runner_key: str) -> None:
     # Create a new session with the API.
     session = APISession(api_endpoint, runner_name, runner_key)
 
-    # Infinite test loop: get a testing job, build the environment, run the tests,
-    # and submit the results.
-    while True:
-        if not test_remote_queued_job(session):
-            # No queued job was available or a job was cancelled. Sleep for 5 minutes
-            # to not send API requests continuously.
-            sleep(5 * 60)
+    # Results are uploaded in the background, including the ones left over from
+    # a previous run.
+    uploader = BackgroundUploader(
+        session, get_upload_spool_path(), get_upload_queue_size()
+    )
+
+    # Full test outputs are uploaded on request in the background, also while
+    # testing a job.
+    with RequestedOutputUploader(session.clone(), OUTPUT_REQUEST_POLL_INTERVAL):
+        # Infinite test loop: get a testing job, build the environment, run the
+        # tests, and submit the results.
+        while True:
+            if not test_remote_queued_job(session, uploader):
+                # No queued job was available or a job was cancelled. Sleep for 5
+                # minutes to not send API requests continuously.
+                sleep(5 * 60)
 
 
 def run_manual_testing() -> None:
@@ -62,6 +77,9 @@ def main():
     )
     arguments = parser.parse_args()
 
+    # Make sure the configured paths are valid before testing anything.
+    CONFIG.validate()
+
     if arguments.mode == "auto":
         print("Testing all queued jobs in automated testing mode...")
         run_automated_testing(arguments.api, arguments.runnername, arguments.runnerkey)
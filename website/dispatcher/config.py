@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+from datetime import timedelta
+
+# Location of the config.json file
+CONFIG_FILE_PATH = os.path.join(
+    os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__))),
+    "config.json",
+)
+
+
+# Contents of the config.json file and its modification time when it was read
+_config_cache = {"mtime": None, "config": None}
+_config_lock = threading.Lock()
+
+
+def _read_config_value(key):
+    # Only parse the file again once it changed, jobs are prioritized in bulk.
+    with _config_lock:
+        config_mtime = os.stat(CONFIG_FILE_PATH).st_mtime_ns
+        if config_mtime != _config_cache["mtime"]:
+            with open(CONFIG_FILE_PATH) as config_file:
+                _config_cache["config"] = json.load(config_file)
+            _config_cache["mtime"] = config_mtime
+        config_dict = _config_cache["config"]
+
+    if not key in config_dict:
+        raise KeyError(f"Key {key} was not found in the config file")
+
+    return config_dict[key]
+
+
+def get_priority_boosts():
+    """
+    Get the time by which jobs of every priority class ("interactive",
+    "bisection", "rerun" and "primary") are moved ahead in the queue.
+    """
+    boosts = _read_config_value("PRIORITY_BOOST_HOURS")
+    return {name: timedelta(hours=hours) for name, hours in boosts.items()}
+
+
+def get_priority_duration_weight():
+    """
+    Get the factor of the estimated duration by which jobs are moved back in the
+    queue, so short jobs go ahead of long ones queued at about the same time.
+
+    With the default of 0.1, a job only loses its place to a job of the next
+    priority class queued at the same time (boosted 6 hours less) if it takes
+    over 60 hours more.
+    """
+    weight = float(_read_config_value("PRIORITY_DURATION_WEIGHT"))
+    if weight < 0:
+        raise ValueError("Invalid priority duration weight")
+
+    return weight
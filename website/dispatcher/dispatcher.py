@@ -1,18 +1,86 @@
+import statistics
 from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
 from django.utils import timezone
+from fetcher.config import get_tested_repository_main_branch_name
+from .config import get_priority_boosts, get_priority_duration_weight
 from fetcher.models import Revision
-from .models import Job, CtsResult
+from .models import (
+    Bisection,
+    Job,
+    CtsResult,
+    LitResult,
+    TestDuration,
+    TestFlakiness,
+)
 
+# Number of queued main branch primary jobs above which only the newest one stays
+# queued and the others are deferred
+COALESCING_QUEUE_THRESHOLD = 5
 
-def create_jobs():
+# Number of recently completed jobs the test durations are computed from
+DURATION_HISTORY_JOB_COUNT = 20
+
+# Number of recently completed jobs the flakiness of tests is computed from
+FLAKINESS_HISTORY_JOB_COUNT = 50
+
+# Number of latest completed main branch primary jobs checked for regressions
+BISECTION_HISTORY_JOB_COUNT = 10
+
+# Maximum number of regressed tests run in every step of a bisection
+BISECTION_MAX_TESTS = 50
+
+# Number of latest main branch revisions in the history of a test
+TEST_HISTORY_LENGTH = 1000
+
+
+def shard_job(job, shard_count):
+    """
+    Splits the test plan of a job into the given number of shards dispatched
+    separately. The first shard runs the LIT tests and the scheduled CTS
+    categories are distributed round-robin over the other shards first.
+    """
+    testgroups = job.get_scheduled_testgroups()
+    cts_testgroups = [name for name in testgroups if name.startswith("run_cts_")]
+
+    category_durations = get_category_durations()
+    for index in range(shard_count):
+        shard = Job(
+            revision=job.revision,
+            parent_job=job,
+            shard_index=index,
+            status=Job.Status.QUEUED,
+            lit_selection=job.lit_selection,
+            priority_class=job.priority_class,
+        )
+        for name in testgroups:
+            setattr(shard, name, False)
+
+        shard.run_lit_all = job.run_lit_all and index == 0
+        for i, name in enumerate(cts_testgroups):
+            if (i + 1) % shard_count == index:
+                setattr(shard, name, True)
+
+        prioritize_job(shard, category_durations)
+        print(shard)
+        shard.save()
+
+    job.shard_count = shard_count
+    job.save(update_fields=["shard_count"])
+
+
+def create_jobs(shard_count=1):
     """
     Creates primary jobs (running all tests from all test suites) for newly
-    fetched revisions.
+    fetched revisions. With more than one shard, the test plan of every job is
+    split into shards dispatched to different runners.
     """
     print("Creating jobs...")
 
     # Get all revisions which should not be skipped (having relevant changes).
     revisions = Revision.objects.filter(skip=False).order_by("date")
+    category_durations = get_category_durations()
 
     for revision in revisions:
         # Do not create a new job for revisions which already have a primary
@@ -20,16 +88,87 @@ def create_jobs():
         if Job.objects.filter(revision=revision, primary_job=True).exists():
             continue
 
-        job = Job(revision=revision, primary_job=True, status=Job.Status.QUEUED)
+        # Staging revisions only need quick feedback from affected LIT tests,
+        # main branch revisions run them first and all the other tests after.
+        # Developers wait for the results of staging revisions.
+        if revision.staging:
+            lit_selection = Job.LitSelection.AFFECTED_ONLY
+            priority_class = Job.PriorityClass.INTERACTIVE
+        else:
+            lit_selection = Job.LitSelection.AFFECTED_FIRST
+            priority_class = Job.PriorityClass.PRIMARY
+
+        job = Job(
+            revision=revision,
+            primary_job=True,
+            status=Job.Status.QUEUED,
+            lit_selection=lit_selection,
+            priority_class=priority_class,
+        )
+        prioritize_job(job, category_durations)
         print(job)
         job.save()
 
+        if shard_count > 1:
+            shard_job(job, shard_count)
+
+    coalesce_queued_jobs()
+
     print("Finished creating jobs!")
 
 
+def coalesce_queued_jobs():
+    """
+    Defers all queued main branch primary jobs except the one for the newest
+    revision once more than COALESCING_QUEUE_THRESHOLD of them are waiting, so
+    the newest revision is tested next however long the backlog grows.
+    """
+    # Jobs a bisection promoted are never deferred.
+    queued_jobs = Job.objects.filter(
+        primary_job=True,
+        status=Job.Status.QUEUED,
+        priority_class=Job.PriorityClass.PRIMARY,
+        revision__staging=False,
+    ).order_by("-revision__date")
+    if queued_jobs.count() <= COALESCING_QUEUE_THRESHOLD:
+        return
+
+    deferred_pks = list(queued_jobs.values_list("pk", flat=True)[1:])
+    print(f"Deferring {len(deferred_pks)} queued jobs...")
+
+    # Only jobs and shards which are still queued are deferred.
+    status_details = (
+        f"Deferred while over {COALESCING_QUEUE_THRESHOLD} main branch jobs were queued"
+    )
+    Job.objects.filter(
+        Q(pk__in=deferred_pks) | Q(parent_job__in=deferred_pks),
+        status=Job.Status.QUEUED,
+    ).update(status=Job.Status.DEFERRED, status_details=status_details)
+
+
+def requeue_deferred_job(revision=None):
+    """
+    Returns the deferred job for the given revision (by default for the newest
+    one) to the queue with its shards, to use spare runner capacity or to test a
+    revision a bisection needs. Returns the job, or None if no job is deferred.
+    """
+    jobs = Job.objects.filter(status=Job.Status.DEFERRED, parent_job__isnull=True)
+    if revision is not None:
+        jobs = jobs.filter(revision=revision)
+    job = jobs.order_by("-revision__date").first()
+    if job is None:
+        return None
+
+    Job.objects.filter(
+        Q(pk=job.pk) | Q(parent_job=job), status=Job.Status.DEFERRED
+    ).update(status=Job.Status.QUEUED, status_details="")
+    job.refresh_from_db()
+    return job
+
+
 def dispose_dumps():
     """
-    Deletes test dump files older than 60 days.
+    Deletes test dump and full output files older than 60 days.
     """
     print("Deleting dumps...")
 
@@ -44,4 +183,608 @@ def dispose_dumps():
         print(result.dump.name)
         result.dump.delete(save=True)
 
+    # Delete uploaded full outputs of the same age.
+    old_outputs = CtsResult.objects.filter(
+        date_added__lte=(timezone.now() - timedelta(days=60))
+    ).exclude(full_output="")
+
+    for result in old_outputs:
+        print(result, end=": ")
+        print(result.full_output.name)
+        result.full_output.delete(save=True)
+
     print("Finished deleting dumps!")
+
+
+def get_latest_lease_renewal_date():
+    """
+    Returns the date of the latest lease renewal of any running job, or None if
+    no job is running.
+    """
+    return Job.objects.filter(
+        status__in=(Job.Status.DISPATCHED, Job.Status.TESTING)
+    ).aggregate(Max("lease_renewal_date"))["lease_renewal_date__max"]
+
+
+def renew_leases_after_outage():
+    """
+    Renews the leases of all running jobs if no lease was renewed for a whole
+    lease duration, e.g. because the API was unreachable, so their runners get a
+    full lease to report back before the jobs are reclaimed.
+    """
+    now = timezone.now()
+    latest_renewal_date = get_latest_lease_renewal_date()
+    if latest_renewal_date and latest_renewal_date < now - Job.LEASE_DURATION:
+        Job.objects.filter(
+            status__in=(Job.Status.DISPATCHED, Job.Status.TESTING),
+            lease_renewal_date__lt=now - Job.LEASE_DURATION,
+        ).update(
+            lease_renewal_date=now, lease_expiration_date=now + Job.LEASE_DURATION
+        )
+
+
+def reclaim_expired_jobs():
+    """
+    Returns dispatched jobs whose runner stopped renewing the lease back to the
+    queue. Their partial results are kept, so the runner can resume the job if
+    it reports back before the job is dispatched again.
+
+    Nothing is reclaimed while no runner renewed a lease for a whole lease
+    duration: the runners are more likely cut off from the API than all gone.
+    """
+    print("Reclaiming expired jobs...")
+
+    latest_renewal_date = get_latest_lease_renewal_date()
+    outage_date = timezone.now() - Job.LEASE_DURATION
+    if latest_renewal_date and latest_renewal_date < outage_date:
+        print("No lease was renewed since " + str(latest_renewal_date) + ", skipping")
+        return
+
+    expired_jobs = Job.objects.filter(
+        status__in=(Job.Status.DISPATCHED, Job.Status.TESTING),
+        lease_expiration_date__lt=timezone.now(),
+    )
+
+    for job in expired_jobs:
+        with transaction.atomic():
+            # Lock the job and skip it if the lease was renewed in the meantime.
+            job = expired_jobs.select_for_update().filter(pk=job.pk).first()
+            if job is None:
+                continue
+
+            print(job, end=": ")
+            print("lease of " + job.dispatch_runner + " expired")
+
+            job.status_details = (
+                "Re-queued after the lease of " + job.dispatch_runner + " expired"
+            )
+            job.reset_lease()
+            job.save()
+
+            if job.parent_job_id:
+                job.parent_job.update_from_shards()
+
+    print("Finished reclaiming expired jobs!")
+
+
+def summarize_job_results():
+    """
+    Recounts the result summaries of all jobs results are attached to (shards
+    attach their results to the parent job).
+    """
+    print("Summarizing job results...")
+
+    for job in Job.objects.filter(parent_job__isnull=True).select_related("revision"):
+        job.summarize_results()
+        print(job, end=": ")
+        print(f"{job.lit_results_total} LIT and {job.cts_results_total} CTS results")
+
+    print("Finished summarizing job results!")
+
+
+def update_test_durations():
+    """
+    Recomputes the median duration of every CTS test from the results of the
+    recently completed jobs.
+    """
+    print("Updating test durations...")
+
+    recent_jobs = Job.objects.filter(
+        status=Job.Status.COMPLETED, parent_job__isnull=True
+    ).order_by("-date_added")[:DURATION_HISTORY_JOB_COUNT]
+
+    results = CtsResult.objects.filter(parent_job__in=list(recent_jobs)).values_list(
+        "test_category", "test_name", "start_time", "end_time"
+    )
+
+    durations = {}
+    for test_category, test_name, start_time, end_time in results.iterator():
+        duration = (end_time - start_time).total_seconds()
+        durations.setdefault((test_category, test_name), []).append(duration)
+
+    with transaction.atomic():
+        TestDuration.objects.all().delete()
+        TestDuration.objects.bulk_create(
+            TestDuration(
+                test_category=test_category,
+                test_name=test_name,
+                median_duration=statistics.median(samples),
+                sample_count=len(samples),
+            )
+            for (test_category, test_name), samples in durations.items()
+        )
+
+    print("Finished updating test durations!")
+
+
+def get_category_durations():
+    """
+    Returns a dictionary mapping each CTS category to the summed median
+    duration of its tests in seconds.
+    """
+    return dict(
+        TestDuration.objects.values("test_category")
+        .annotate(duration=Sum("median_duration"))
+        .values_list("test_category", "duration")
+    )
+
+
+def get_test_durations(jobs):
+    """
+    Returns a dictionary mapping each CTS test selected in any of the given jobs
+    (as category/name) to its median duration in seconds.
+    """
+    selected_cts_tests = set()
+    for job in jobs:
+        selected_cts_tests.update(job.get_selected_cts_tests())
+    if not selected_cts_tests:
+        return {}
+
+    durations = TestDuration.objects.filter(
+        test_category__in={test.split("/")[0] for test in selected_cts_tests}
+    ).values_list("test_category", "test_name", "median_duration")
+    return {
+        test_category + "/" + test_name: duration
+        for test_category, test_name, duration in durations
+        if test_category + "/" + test_name in selected_cts_tests
+    }
+
+
+def estimate_job_duration(job, category_durations, test_durations=None):
+    """
+    Returns the estimated time to run the CTS tests scheduled in the job
+    sequentially, or None if no durations are known. Durations of selected
+    tests are queried unless given (see get_test_durations).
+    """
+    selected_cts_tests = job.get_selected_cts_tests()
+    if selected_cts_tests:
+        # Targeted jobs only run some tests of their categories.
+        if test_durations is None:
+            test_durations = get_test_durations([job])
+        seconds = sum(test_durations.get(test, 0) for test in selected_cts_tests)
+    else:
+        seconds = sum(
+            category_durations.get(name[len("run_cts_") :], 0)
+            for name in job.get_scheduled_testgroups()
+            if name.startswith("run_cts_")
+        )
+    if not seconds:
+        return None
+    return timedelta(seconds=int(seconds))
+
+
+def prioritize_job(job, category_durations, test_durations=None):
+    """
+    Sets the dispatch key of the job: its creation date moved ahead by the boost
+    of its priority class and back by its weighted estimated duration. Jobs
+    waiting long enough go ahead of any job queued later, so none starves.
+    """
+    boost = get_priority_boosts()[Job.PriorityClass(job.priority_class).name.lower()]
+    duration = estimate_job_duration(
+        job, category_durations, test_durations
+    ) or timedelta(0)
+    job.dispatch_key = (
+        (job.date_added or timezone.now())
+        - boost
+        + duration * get_priority_duration_weight()
+    )
+
+
+def prioritize_queued_jobs():
+    """
+    Recomputes the dispatch keys of queued and deferred jobs, e.g. after test
+    durations were updated or for jobs added by hand.
+    """
+    print("Prioritizing queued jobs...")
+
+    category_durations = get_category_durations()
+    jobs = list(Job.objects.filter(status__in=(Job.Status.QUEUED, Job.Status.DEFERRED)))
+    test_durations = get_test_durations(jobs)
+    for job in jobs:
+        prioritize_job(job, category_durations, test_durations)
+    Job.objects.bulk_update(jobs, ["dispatch_key"])
+
+    print("Finished prioritizing queued jobs!")
+
+
+def estimate_remaining_duration(job, category_durations, test_durations=None):
+    """
+    Returns the estimated time until the job is finished, based on the
+    reported progress of running jobs, or None if not known.
+    """
+    completion_date = job.get_estimated_completion_date()
+    if completion_date:
+        return max(completion_date - timezone.now(), timedelta(0))
+
+    duration = estimate_job_duration(job, category_durations, test_durations)
+    if duration is None:
+        return None
+    if job.dispatch_date:
+        return max(duration - (timezone.now() - job.dispatch_date), timedelta(0))
+    return duration
+
+
+def estimate_queue_drain_time(jobs, category_durations, test_durations=None):
+    """
+    Returns the estimated time until all the given queued and running jobs are
+    finished by the currently busy runners (at least one).
+    """
+    if test_durations is None:
+        test_durations = get_test_durations(jobs)
+
+    remaining = timedelta(0)
+    runners = set()
+    for job in jobs:
+        if job.shard_count:
+            # Sharded jobs are tested through their shards.
+            continue
+
+        if job.dispatch_runner:
+            runners.add(job.dispatch_runner)
+
+        duration = estimate_remaining_duration(job, category_durations, test_durations)
+        if duration:
+            remaining += duration
+
+    return timedelta(seconds=int(remaining.total_seconds() / max(len(runners), 1)))
+
+
+def _get_main_branch_history(results):
+    """
+    Returns the given results of primary jobs for main branch revisions with
+    their jobs and revisions, latest revision first.
+    """
+    return (
+        results.filter(
+            parent_job__primary_job=True,
+            parent_job__revision__staging=False,
+            parent_job__revision__branch=get_tested_repository_main_branch_name(),
+        )
+        .select_related("parent_job__revision")
+        .order_by("-parent_job__revision__date")[:TEST_HISTORY_LENGTH]
+    )
+
+
+def get_lit_test_history(test_path):
+    """
+    Returns the results of a LIT test across the latest main branch revisions.
+    """
+    return _get_main_branch_history(LitResult.objects.filter(test_path=test_path))
+
+
+def get_cts_test_history(test_category, test_name):
+    """
+    Returns the results of a CTS test across the latest main branch revisions,
+    without their test outputs.
+    """
+    return _get_main_branch_history(
+        CtsResult.objects.filter(
+            test_category=test_category, test_name=test_name
+        ).defer(
+            "standard_output",
+            "standard_error",
+            "standard_output_compressed",
+            "standard_error_compressed",
+        )
+    )
+
+
+def update_test_flakiness():
+    """
+    Recounts the failed runs of every LIT and CTS test in the recently completed
+    jobs, and how many of them passed when re-run. Only tests which failed at
+    least once are kept.
+    """
+    print("Updating test flakiness...")
+
+    recent_jobs = list(
+        Job.objects.filter(
+            status=Job.Status.COMPLETED, parent_job__isnull=True
+        ).order_by("-date_added")[:FLAKINESS_HISTORY_JOB_COUNT]
+    )
+    run_counts = {
+        "run_count": Count("pk"),
+        "failure_count": Count("pk", filter=Q(passing=False)),
+    }
+
+    lit_counts = (
+        LitResult.objects.filter(parent_job__in=recent_jobs)
+        .values("test_path")
+        .annotate(
+            **run_counts,
+            flaky_count=Count("pk", filter=Q(passing=False, rerun_pass_count__gt=0)),
+        )
+        .filter(failure_count__gt=0)
+    )
+    cts_counts = (
+        CtsResult.objects.filter(parent_job__in=recent_jobs)
+        .values("test_category", "test_name")
+        .annotate(
+            **run_counts,
+            flaky_count=Count(
+                "pk",
+                filter=Q(passing=False)
+                & (Q(rerun_pass_count__gt=0) | Q(rerun_passing=True)),
+            ),
+        )
+        .filter(failure_count__gt=0)
+    )
+
+    with transaction.atomic():
+        TestFlakiness.objects.all().delete()
+        TestFlakiness.objects.bulk_create(
+            TestFlakiness(
+                suite=TestFlakiness.Suite.LIT,
+                test_name=counts.pop("test_path"),
+                **counts,
+            )
+            for counts in lit_counts
+        )
+        TestFlakiness.objects.bulk_create(
+            TestFlakiness(suite=TestFlakiness.Suite.CTS, **counts)
+            for counts in cts_counts
+        )
+
+    print("Finished updating test flakiness!")
+
+
+def get_known_flaky_tests():
+    """
+    Returns the paths of known flaky LIT tests and the (category, name) pairs of
+    known flaky CTS tests as two sets.
+    """
+    lit_tests = set()
+    cts_tests = set()
+    known_flaky = TestFlakiness.objects.filter(
+        flaky_count__gte=TestFlakiness.KNOWN_FLAKY_RUN_COUNT
+    )
+    for suite, test_category, test_name in known_flaky.values_list(
+        "suite", "test_category", "test_name"
+    ):
+        if suite == TestFlakiness.Suite.LIT:
+            lit_tests.add(test_name)
+        else:
+            cts_tests.add((test_category, test_name))
+
+    return lit_tests, cts_tests
+
+
+def get_regressed_tests(baseline_job, regression_job):
+    """
+    Returns the paths of LIT tests and the CTS tests (as category/name) passing
+    in the baseline job but failing in the regression job, except failures of
+    flaky tests.
+    """
+    known_flaky_lit_tests, known_flaky_cts_tests = get_known_flaky_tests()
+    flaky_fields = ["passing", "rerun_pass_count"]
+
+    passing_lit_tests = set(
+        LitResult.objects.filter(parent_job=baseline_job, passing=True).values_list(
+            "test_path", flat=True
+        )
+    )
+    lit_tests = [
+        result.test_path
+        for result in LitResult.objects.filter(
+            parent_job=regression_job, passing=False
+        ).only("test_path", *flaky_fields)
+        if result.test_path in passing_lit_tests
+        and result.test_path not in known_flaky_lit_tests
+        and not result.is_flaky()
+    ]
+
+    passing_cts_tests = set(
+        CtsResult.objects.filter(parent_job=baseline_job, passing=True).values_list(
+            "test_category", "test_name"
+        )
+    )
+    cts_tests = [
+        result.test_category + "/" + result.test_name
+        for result in CtsResult.objects.filter(
+            parent_job=regression_job, passing=False
+        ).only("test_category", "test_name", "rerun_passing", *flaky_fields)
+        if (result.test_category, result.test_name) in passing_cts_tests
+        and (result.test_category, result.test_name) not in known_flaky_cts_tests
+        and not result.is_flaky()
+    ]
+
+    return lit_tests, cts_tests
+
+
+def start_bisections():
+    """
+    Starts a bisection for every pair of consecutive completed main branch
+    primary jobs among the latest ones in which tests regressed. Regressions
+    between adjacent revisions need no bisection and are recorded as found.
+    """
+    print("Starting bisections...")
+
+    jobs = list(
+        Job.objects.filter(
+            primary_job=True,
+            status=Job.Status.COMPLETED,
+            revision__branch=get_tested_repository_main_branch_name(),
+            revision__staging=False,
+        )
+        .select_related("revision")
+        .order_by("-revision__date")[:BISECTION_HISTORY_JOB_COUNT]
+    )
+
+    for regression_job, baseline_job in zip(jobs, jobs[1:]):
+        if Bisection.objects.filter(regression_job=regression_job).exists():
+            continue
+
+        lit_tests, cts_tests = get_regressed_tests(baseline_job, regression_job)
+        if not lit_tests and not cts_tests:
+            continue
+
+        # Bisect on a bounded number of the regressed tests.
+        lit_tests = lit_tests[:BISECTION_MAX_TESTS]
+        cts_tests = cts_tests[: BISECTION_MAX_TESTS - len(lit_tests)]
+
+        bisection = Bisection(
+            baseline_job=baseline_job,
+            regression_job=regression_job,
+            good_revision=baseline_job.revision,
+            bad_revision=regression_job.revision,
+            lit_tests="\n".join(lit_tests),
+            cts_tests="\n".join(cts_tests),
+        )
+        if not bisection.get_revisions_in_range().exists():
+            bisection.status = Bisection.Status.FOUND
+            bisection.date_finished = timezone.now()
+
+        bisection.save()
+        print(bisection)
+
+    print("Finished starting bisections!")
+
+
+def _queue_bisection_job(bisection, revision):
+    """
+    Queues a targeted job running only the regressed tests of the bisection on
+    the given revision. A job deferred for the revision runs all tests, so it is
+    queued with the priority of the bisection instead.
+    """
+    job = requeue_deferred_job(revision)
+    if job is not None:
+        category_durations = get_category_durations()
+        for queued_job in [job, *job.shards.filter(status=Job.Status.QUEUED)]:
+            queued_job.priority_class = Job.PriorityClass.BISECTION
+            prioritize_job(queued_job, category_durations)
+            queued_job.save(update_fields=["priority_class", "dispatch_key"])
+        return job
+
+    cts_tests = bisection.get_cts_tests()
+    cts_categories = {test.split("/")[0] for test in cts_tests}
+
+    job = Job(
+        revision=revision,
+        status=Job.Status.QUEUED,
+        run_lit_all=bool(bisection.lit_tests),
+        selected_lit_tests=bisection.lit_tests,
+        selected_cts_tests=bisection.cts_tests,
+        priority_class=Job.PriorityClass.BISECTION,
+    )
+    for name in job.get_scheduled_testgroups():
+        if name.startswith("run_cts_"):
+            setattr(job, name, name[len("run_cts_") :] in cts_categories)
+    prioritize_job(job, get_category_durations())
+    job.save()
+    return job
+
+
+def _is_failing_bisection_job(bisection, job):
+    """
+    Checks whether any regressed test of the bisection failed in the given
+    completed job. Failures of tests which passed when re-run do not count.
+    """
+    lit_results = LitResult.objects.filter(
+        parent_job=job, passing=False, test_path__in=bisection.get_lit_tests()
+    )
+    if any(not result.is_flaky() for result in lit_results):
+        return True
+
+    cts_results = CtsResult.objects.filter(parent_job=job, passing=False)
+    cts_tests = set(bisection.get_cts_tests())
+    return any(
+        result.test_category + "/" + result.test_name in cts_tests
+        and not result.is_flaky()
+        for result in cts_results.only(
+            "test_category", "test_name", "passing", "rerun_pass_count", "rerun_passing"
+        )
+    )
+
+
+def update_bisections():
+    """
+    Advances running bisections: narrows the range of revisions with the result
+    of the finished step and queues a targeted job for the middle revision of
+    the remaining range, until the first bad revision is found.
+    """
+    print("Updating bisections...")
+
+    for bisection in Bisection.objects.filter(status=Bisection.Status.RUNNING):
+        job = bisection.current_job
+        if job:
+            if job.status in (
+                Job.Status.QUEUED,
+                Job.Status.DISPATCHED,
+                Job.Status.TESTING,
+            ):
+                continue
+
+            if job.status == Job.Status.SKIPPED:
+                bisection.status = Bisection.Status.CANCELLED
+                bisection.date_finished = timezone.now()
+                bisection.save()
+                print(bisection)
+                continue
+
+            if job.status == Job.Status.BUILD_FAILED:
+                bisection.skipped_revisions.add(job.revision)
+            elif _is_failing_bisection_job(bisection, job):
+                bisection.bad_revision = job.revision
+            else:
+                bisection.good_revision = job.revision
+            bisection.current_job = None
+
+        revisions = list(bisection.get_candidate_revisions())
+        if revisions:
+            revision = revisions[len(revisions) // 2]
+            bisection.current_job = _queue_bisection_job(bisection, revision)
+            bisection.step_count += 1
+        elif bisection.get_revisions_in_range().exists():
+            # Only revisions which could not be built are left in range.
+            bisection.status = Bisection.Status.UNRESOLVED
+            bisection.date_finished = timezone.now()
+        else:
+            bisection.status = Bisection.Status.FOUND
+            bisection.date_finished = timezone.now()
+
+        bisection.save()
+        print(bisection)
+
+    print("Finished updating bisections!")
+
+
+def compress_logs():
+    """
+    Compresses test outputs of results stored before outputs were compressed.
+    """
+    print("Compressing logs...")
+
+    old_results = CtsResult.objects.exclude(standard_output="", standard_error="")
+    for result in old_results.iterator():
+        print(result)
+        result.compress_logs()
+        result.save(
+            update_fields=[
+                "standard_output",
+                "standard_error",
+                "standard_output_compressed",
+                "standard_error_compressed",
+            ]
+        )
+
+    print("Finished compressing logs!")
@@ -4,10 +4,28 @@ from ...dispatcher import *
 
 
 class Command(BaseCommand):
-    help = "Creates new jobs for newly fetched revisions every 10 mins"
+    help = (
+        "Creates new jobs for newly fetched revisions, reclaims jobs with "
+        "expired leases, bisects regressions, updates test durations and "
+        "flakiness and prioritizes queued jobs every 10 mins"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=1,
+            help="Number of shards the test plan of every job is split into",
+        )
 
     def handle(self, *args, **options):
         while True:
-            create_jobs()
+            reclaim_expired_jobs()
+            update_test_durations()
+            update_test_flakiness()
+            create_jobs(options["shards"])
+            start_bisections()
+            update_bisections()
+            prioritize_queued_jobs()
             print("Sleeping for 10 mins...")
             time.sleep(10 * 60)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ...dispatcher import *
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts bisections of tests regressed between main branch primary jobs "
+        "and queues the next step of running bisections"
+    )
+
+    def handle(self, *args, **options):
+        start_bisections()
+        update_bisections()
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from ...dispatcher import *
+
+
+class Command(BaseCommand):
+    help = "Compresses test outputs stored uncompressed"
+
+    def handle(self, *args, **options):
+        compress_logs()
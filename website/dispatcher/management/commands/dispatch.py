@@ -5,5 +5,13 @@ from ...dispatcher import *
 class Command(BaseCommand):
     help = "Creates new jobs for newly fetched revisions"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=1,
+            help="Number of shards the test plan of every job is split into",
+        )
+
     def handle(self, *args, **options):
-        create_jobs()
+        create_jobs(options["shards"])
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from ...dispatcher import *
+
+
+class Command(BaseCommand):
+    help = "Updates flakiness statistics of tests from recently completed jobs"
+
+    def handle(self, *args, **options):
+        update_test_flakiness()
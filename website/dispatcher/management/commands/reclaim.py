@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from ...dispatcher import *
+
+
+class Command(BaseCommand):
+    help = "Returns jobs with expired leases to the queue"
+
+    def handle(self, *args, **options):
+        reclaim_expired_jobs()
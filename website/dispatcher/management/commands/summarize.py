@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from ...dispatcher import *
+
+
+class Command(BaseCommand):
+    help = "Recounts the result summaries of all jobs from their results"
+
+    def handle(self, *args, **options):
+        summarize_job_results()
@@ -1,8 +1,12 @@
+import math
+from datetime import timedelta
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.utils.safestring import mark_safe
 from fetcher.models import Revision
 import bleach
+import zlib
 
 
 # Model representing a test plan to be executed on a runner
@@ -59,29 +63,368 @@ class Job(models.Model):
         TESTING = "T", _("Testing")
         COMPLETED = "C", _("Completed")
         BUILD_FAILED = "F", _("Build failed")
+        DEFERRED = "W", _("Deferred")
 
     status = models.CharField(
         max_length=1, choices=Status.choices, default=Status.QUEUED
     )
     status_details = models.TextField(blank=True)
+
+    class LitSelection(models.TextChoices):
+        ALL = "A", _("All tests")
+        AFFECTED_FIRST = "F", _("Affected tests first")
+        AFFECTED_ONLY = "O", _("Affected tests only")
+
+    lit_selection = models.CharField(
+        max_length=1, choices=LitSelection.choices, default=LitSelection.ALL
+    )
     dispatch_date = models.DateTimeField(blank=True, null=True)
     dispatch_runner = models.CharField(max_length=30, blank=True)
+    # Runner whose expired lease returned the job to the queue. Its partial results
+    # are kept until the job is dispatched to another runner.
+    reclaimed_runner = models.CharField(max_length=30, blank=True)
+    lease_renewal_date = models.DateTimeField(blank=True, null=True)
+    lease_expiration_date = models.DateTimeField(blank=True, null=True)
+    progress_current_test = models.CharField(max_length=250, blank=True)
+    progress_tests_done = models.IntegerField(default=0)
+    progress_tests_remaining = models.IntegerField(default=0)
+    progress_start_date = models.DateTimeField(blank=True, null=True)
+    parent_job = models.ForeignKey(
+        "self", on_delete=models.CASCADE, null=True, blank=True, related_name="shards"
+    )
+    shard_index = models.IntegerField(default=0)
+    shard_count = models.IntegerField(default=0)
+    # Tests run by a targeted job, one per line (CTS tests as category/name).
+    # All tests of the scheduled test groups run if empty.
+    selected_lit_tests = models.TextField(blank=True)
+    selected_cts_tests = models.TextField(blank=True)
+
+    class PriorityClass(models.TextChoices):
+        INTERACTIVE = "I", _("Interactive")
+        BISECTION = "B", _("Bisection")
+        RERUN = "R", _("Re-run")
+        PRIMARY = "P", _("Primary")
+
+    priority_class = models.CharField(
+        max_length=1, choices=PriorityClass.choices, default=PriorityClass.RERUN
+    )
+    # Queued jobs are dispatched in the order of this key: the creation date moved
+    # ahead by the boost of the priority class and back by the estimated duration.
+    dispatch_key = models.DateTimeField(default=timezone.now)
+    # Summary of the results attached to the job, counted as results are added
+    lit_results_total = models.IntegerField(default=0)
+    lit_results_passing = models.IntegerField(default=0)
+    lit_results_failing = models.IntegerField(default=0)
+    cts_results_total = models.IntegerField(default=0)
+    cts_results_passing = models.IntegerField(default=0)
+    cts_results_failing = models.IntegerField(default=0)
+    cts_results_timedout = models.IntegerField(default=0)
+    cts_results_duration = models.DurationField(default=timedelta(0))
+
+    # Time a dispatched job stays assigned to its runner without a lease renewal
+    LEASE_DURATION = timedelta(minutes=15)
+
+    # Fields of the result summary
+    RESULT_SUMMARY_FIELDS = [
+        "lit_results_total",
+        "lit_results_passing",
+        "lit_results_failing",
+        "cts_results_total",
+        "cts_results_passing",
+        "cts_results_failing",
+        "cts_results_timedout",
+        "cts_results_duration",
+    ]
 
     def __str__(self):
         return (
             "Job " + str(self.pk)
+            + (" shard " + str(self.shard_index) if self.parent_job_id else "")
             + " (" + self.status + ")"
             + " for " + self.revision.hash[:16] + " / " + self.revision.title[:80]
         )
 
     class Meta:
         ordering = ["-date_added"]
+        indexes = [
+            models.Index(fields=["status", "dispatch_key"]),
+            models.Index(fields=["dispatch_runner", "dispatch_date"]),
+        ]
+
+    def is_active(self):
+        """
+        Checks whether the job is dispatched or being tested (was not cancelled).
+        A shard is cancelled together with its parent job.
+        """
+        if self.parent_job_id and self.parent_job.status not in (
+            Job.Status.QUEUED,
+            Job.Status.DISPATCHED,
+            Job.Status.TESTING,
+        ):
+            return False
+        return self.status in (Job.Status.DISPATCHED, Job.Status.TESTING)
+
+    def is_dispatched_to(self, runner):
+        """
+        Checks whether the job is active and dispatched to the given runner, which
+        may then report its status and results.
+        """
+        return self.dispatch_runner == runner and self.is_active()
+
+    def resume_lease(self, runner):
+        """
+        Gives a reclaimed job back to the runner its lease expired for, unless the
+        job was dispatched again in the meantime. Returns True if the job was
+        resumed.
+        """
+        if not runner or self.reclaimed_runner != runner:
+            return False
+
+        now = timezone.now()
+        resumed = Job.objects.filter(
+            pk=self.pk, status=Job.Status.QUEUED, reclaimed_runner=runner
+        ).update(
+            status=Job.Status.TESTING,
+            status_details="Resumed by " + runner + " after its lease expired",
+            dispatch_runner=runner,
+            dispatch_date=now,
+            lease_renewal_date=now,
+            lease_expiration_date=now + Job.LEASE_DURATION,
+            reclaimed_runner="",
+        )
+        if not resumed:
+            return False
+
+        self.refresh_from_db()
+        if self.parent_job_id:
+            self.parent_job.update_from_shards()
+        return True
+
+    def accepts_runner(self, runner):
+        """
+        Checks whether the runner may report the status and results of the job,
+        resuming the job if its lease expired while the runner was unreachable.
+        """
+        return self.is_dispatched_to(runner) or (
+            self.resume_lease(runner) and self.is_dispatched_to(runner)
+        )
+
+    def get_result_job(self):
+        """
+        Returns the job test results are attached to (the parent of a shard).
+        """
+        return self.parent_job if self.parent_job_id else self
+
+    def get_scheduled_testgroups(self):
+        """
+        Returns names of the "run_" fields enabled for the job.
+        """
+        return [
+            field.name
+            for field in Job._meta.get_fields()
+            if field.name.startswith("run_") and getattr(self, field.name)
+        ]
+
+    def get_selected_lit_tests(self):
+        """
+        Returns the paths of the LIT tests a targeted job runs.
+        """
+        return self.selected_lit_tests.splitlines()
+
+    def get_selected_cts_tests(self):
+        """
+        Returns the CTS tests (as category/name) a targeted job runs.
+        """
+        return self.selected_cts_tests.splitlines()
+
+    def count_results(self, lit_results=(), cts_results=()):
+        """
+        Adds newly created results to the result summary of the job. Counters are
+        incremented by the database, so results uploaded at the same time by
+        several shards are all counted.
+        """
+        lit_results_passing = sum(result.passing for result in lit_results)
+        cts_results_passing = sum(result.passing for result in cts_results)
+        cts_results_timedout = sum(result.timedout for result in cts_results)
+        cts_results_duration = sum(
+            (result.end_time - result.start_time for result in cts_results),
+            timedelta(0),
+        )
+        Job.objects.filter(pk=self.pk).update(
+            lit_results_total=models.F("lit_results_total") + len(lit_results),
+            lit_results_passing=(
+                models.F("lit_results_passing") + lit_results_passing
+            ),
+            lit_results_failing=(
+                models.F("lit_results_failing")
+                + len(lit_results) - lit_results_passing
+            ),
+            cts_results_total=models.F("cts_results_total") + len(cts_results),
+            cts_results_passing=(
+                models.F("cts_results_passing") + cts_results_passing
+            ),
+            cts_results_failing=(
+                models.F("cts_results_failing")
+                + len(cts_results) - cts_results_passing
+            ),
+            cts_results_timedout=(
+                models.F("cts_results_timedout") + cts_results_timedout
+            ),
+            cts_results_duration=(
+                models.F("cts_results_duration") + cts_results_duration
+            ),
+        )
+
+    def summarize_results(self):
+        """
+        Recounts the result summary of the job from all its results.
+        """
+        lit_summary = LitResult.objects.filter(parent_job=self).aggregate(
+            total=models.Count("pk"),
+            passing=models.Count("pk", filter=models.Q(passing=True)),
+        )
+        cts_summary = CtsResult.objects.filter(parent_job=self).aggregate(
+            total=models.Count("pk"),
+            passing=models.Count("pk", filter=models.Q(passing=True)),
+            timedout=models.Count("pk", filter=models.Q(timedout=True)),
+            duration=models.Sum(models.F("end_time") - models.F("start_time")),
+        )
+
+        self.lit_results_total = lit_summary["total"]
+        self.lit_results_passing = lit_summary["passing"]
+        self.lit_results_failing = lit_summary["total"] - lit_summary["passing"]
+        self.cts_results_total = cts_summary["total"]
+        self.cts_results_passing = cts_summary["passing"]
+        self.cts_results_failing = cts_summary["total"] - cts_summary["passing"]
+        self.cts_results_timedout = cts_summary["timedout"]
+        self.cts_results_duration = cts_summary["duration"] or timedelta(0)
+        self.save(update_fields=Job.RESULT_SUMMARY_FIELDS)
+
+    def delete_partial_results(self):
+        """
+        Deletes the results a runner uploaded for the job before its lease was
+        reclaimed. Shards share the results of the parent job, only the results of
+        tests scheduled in the shard are deleted.
+        """
+        lit_results = LitResult.objects.filter(parent_job=self.get_result_job())
+        cts_results = CtsResult.objects.filter(parent_job=self.get_result_job())
+        if self.parent_job_id:
+            if not self.run_lit_all:
+                lit_results = lit_results.none()
+            cts_results = cts_results.filter(
+                test_category__in=[
+                    name[len("run_cts_") :]
+                    for name in self.get_scheduled_testgroups()
+                    if name.startswith("run_cts_")
+                ]
+            )
+
+        for result in cts_results.exclude(dump=""):
+            result.dump.delete(save=False)
+        cts_results.delete()
+        lit_results.delete()
+        self.get_result_job().summarize_results()
+
+    def update_from_shards(self):
+        """
+        Derives the status of a sharded job from the statuses of its shards.
+        """
+        if self.status not in (
+            Job.Status.QUEUED,
+            Job.Status.DISPATCHED,
+            Job.Status.TESTING,
+        ):
+            return
+
+        statuses = set(self.shards.values_list("status", flat=True))
+        if Job.Status.BUILD_FAILED in statuses:
+            self.status = Job.Status.BUILD_FAILED
+        elif statuses <= {Job.Status.COMPLETED, Job.Status.SKIPPED}:
+            self.status = Job.Status.COMPLETED
+        elif statuses == {Job.Status.QUEUED}:
+            self.status = Job.Status.QUEUED
+        else:
+            self.status = Job.Status.TESTING
+        self.save(update_fields=["status"])
+
+    def grant_lease(self, runner):
+        """
+        Assigns the job to the given runner until the lease expires.
+        """
+        self.dispatch_runner = runner
+        self.dispatch_date = timezone.now()
+        self.lease_renewal_date = self.dispatch_date
+        self.lease_expiration_date = self.dispatch_date + Job.LEASE_DURATION
+
+    def renew_lease(self, current_test=None, tests_done=None, tests_remaining=None):
+        """
+        Extends the lease of the job and records the progress reported by the
+        runner.
+        """
+        self.lease_renewal_date = timezone.now()
+        self.lease_expiration_date = self.lease_renewal_date + Job.LEASE_DURATION
+
+        if current_test is not None:
+            self.progress_current_test = current_test
+        if tests_done is not None:
+            self.progress_tests_done = tests_done
+        if tests_remaining is not None:
+            self.progress_tests_remaining = tests_remaining
+
+        # Estimate the remaining time from the last report before the first
+        # counted test finished, so uncounted tests run earlier (e.g. LIT tests)
+        # do not make the estimate too optimistic.
+        if (self.progress_start_date is None or not self.progress_tests_done) and (
+            self.progress_tests_done or self.progress_tests_remaining
+        ):
+            self.progress_start_date = self.lease_renewal_date
+
+    def reset_lease(self):
+        """
+        Returns the job to the queue, dropping its runner and progress. The
+        runner is remembered until the job is dispatched again, so it can resume
+        the job if it was only unreachable.
+        """
+        self.status = Job.Status.QUEUED
+        self.reclaimed_runner = self.dispatch_runner
+        self.dispatch_runner = ""
+        self.dispatch_date = None
+        self.lease_renewal_date = None
+        self.lease_expiration_date = None
+        self.progress_current_test = ""
+        self.progress_tests_done = 0
+        self.progress_tests_remaining = 0
+        self.progress_start_date = None
+
+    def get_progress_percentage(self):
+        """
+        Returns the percentage of reported tests finished.
+        """
+        total = self.progress_tests_done + self.progress_tests_remaining
+        if not total:
+            return 0
+        return int(100 * self.progress_tests_done / total)
+
+    def get_estimated_completion_date(self):
+        """
+        Returns the estimated completion date extrapolated from the test rate
+        since the first progress report, or None if not known yet.
+        """
+        if self.progress_start_date is None or not self.progress_tests_done:
+            return None
+
+        elapsed = self.lease_renewal_date - self.progress_start_date
+        remaining = elapsed * self.progress_tests_remaining / self.progress_tests_done
+        return self.lease_renewal_date + remaining
 
     def sanitize(self):
         """
         Sanitizes the object's data before passing to a view.
         """
         self.revision.sanitize()
+        self.progress_current_test = mark_safe(
+            bleach.clean(self.progress_current_test)
+        )
 
 
 # Model representing a LIT test result
@@ -90,6 +433,8 @@ class LitResult(models.Model):
     date_added = models.DateTimeField(auto_now_add=True)
     test_path = models.CharField(max_length=200)
     passing = models.BooleanField(default=False)
+    rerun_count = models.PositiveSmallIntegerField(default=0)
+    rerun_pass_count = models.PositiveSmallIntegerField(default=0)
 
     def __str__(self):
         return (
@@ -100,6 +445,14 @@ class LitResult(models.Model):
 
     class Meta:
         ordering = ["-date_added"]
+        # Results of a test across jobs are looked up for its history.
+        indexes = [models.Index(fields=["test_path", "parent_job"])]
+
+    def is_flaky(self):
+        """
+        Returns True if the test failed but passed when re-run.
+        """
+        return not self.passing and self.rerun_pass_count > 0
 
     def sanitize(self):
         """
@@ -119,6 +472,8 @@ class CtsResult(models.Model):
     end_time = models.DateTimeField()
     standard_output = models.TextField(blank=True)
     standard_error = models.TextField(blank=True)
+    standard_output_compressed = models.BinaryField(blank=True, null=True)
+    standard_error_compressed = models.BinaryField(blank=True, null=True)
     test_executable = models.CharField(max_length=250, blank=True)
     test_arguments = models.CharField(max_length=100, blank=True)
     suite_version = models.CharField(max_length=15, blank=True)
@@ -126,6 +481,21 @@ class CtsResult(models.Model):
     neo_version = models.CharField(max_length=15, blank=True)
     dump = models.FileField(upload_to="dumps/", blank=True)
 
+    class DumpPolicy(models.TextChoices):
+        ALWAYS = "A", _("Always")
+        ON_FAILURE = "F", _("Re-run on failure")
+        NEVER = "N", _("Never")
+
+    dump_policy = models.CharField(
+        max_length=1, choices=DumpPolicy.choices, default=DumpPolicy.ALWAYS
+    )
+    rerun_passing = models.BooleanField(blank=True, null=True)
+    rerun_count = models.PositiveSmallIntegerField(default=0)
+    rerun_pass_count = models.PositiveSmallIntegerField(default=0)
+    output_truncated = models.BooleanField(default=False)
+    full_output = models.FileField(upload_to="outputs/", blank=True)
+    full_output_requested = models.BooleanField(default=False)
+
     def __str__(self):
         return (
             "CTS " + self.test_category + "/" + self.test_name
@@ -135,13 +505,230 @@ class CtsResult(models.Model):
 
     class Meta:
         ordering = ["-date_added"]
+        # Results of a test across jobs are looked up for its history.
+        indexes = [
+            models.Index(fields=["test_category", "test_name", "parent_job"])
+        ]
+
+    @staticmethod
+    def compress_log(text):
+        """
+        Compresses a test output for storage.
+        """
+        return zlib.compress(text.encode("utf-8"))
+
+    def get_log(self, field):
+        """
+        Returns the test output stored in the given field ("standard_output" or
+        "standard_error"), which is compressed except for old results.
+        """
+        compressed = getattr(self, field + "_compressed")
+        if compressed:
+            return zlib.decompress(bytes(compressed)).decode("utf-8")
+        return getattr(self, field)
+
+    def get_log_prefix(self, field, size=None):
+        """
+        Returns the first size bytes (all if None) of the UTF-8 encoded test output
+        stored in the given field, only decompressing as much of it as needed.
+        """
+        compressed = getattr(self, field + "_compressed")
+        if not compressed:
+            return getattr(self, field).encode("utf-8")[:size]
+
+        decompressor = zlib.decompressobj()
+        if size is None:
+            return decompressor.decompress(compressed) + decompressor.flush()
+        return decompressor.decompress(compressed, size)
+
+    def get_duration(self):
+        """
+        Returns the time the test ran.
+        """
+        return self.end_time - self.start_time
+
+    def is_flaky(self):
+        """
+        Returns True if the test failed but passed when re-run.
+        """
+        if self.passing:
+            return False
+        return self.rerun_pass_count > 0 or bool(self.rerun_passing)
+
+    def compress_logs(self):
+        """
+        Moves uncompressed test outputs to the compressed fields.
+        """
+        for field in ("standard_output", "standard_error"):
+            text = getattr(self, field)
+            if text:
+                setattr(self, field + "_compressed", self.compress_log(text))
+                setattr(self, field, "")
 
     def sanitize(self):
         """
         Sanitizes the object's data before passing to a view.
         """
         self.parent_job.sanitize()
-        self.standard_output = mark_safe(bleach.clean(self.standard_output))
-        self.standard_error = mark_safe(bleach.clean(self.standard_error))
         self.test_executable = mark_safe(bleach.clean(self.test_executable))
         self.test_arguments = mark_safe(bleach.clean(self.test_arguments))
+
+
+# Model representing the typical duration of a CTS test in recent jobs
+class TestDuration(models.Model):
+    test_category = models.CharField(max_length=50)
+    test_name = models.CharField(max_length=200)
+    median_duration = models.FloatField()
+    sample_count = models.IntegerField()
+
+    def __str__(self):
+        return (
+            "Duration of CTS " + self.test_category + "/" + self.test_name
+            + ": " + str(round(self.median_duration, 1)) + " s"
+        )
+
+    class Meta:
+        unique_together = ["test_category", "test_name"]
+
+
+# Model representing how often a test failed and passed when re-run in recent
+# jobs
+class TestFlakiness(models.Model):
+    # Number of flaky runs making a test known to be flaky
+    KNOWN_FLAKY_RUN_COUNT = 2
+
+    class Suite(models.TextChoices):
+        LIT = "L", _("LIT")
+        CTS = "C", _("CTS")
+
+    suite = models.CharField(max_length=1, choices=Suite.choices)
+    # Empty for LIT tests, which are identified by their path only
+    test_category = models.CharField(max_length=50, blank=True)
+    test_name = models.CharField(max_length=200)
+    run_count = models.IntegerField()
+    failure_count = models.IntegerField()
+    flaky_count = models.IntegerField()
+
+    def __str__(self):
+        return (
+            "Flakiness of " + self.get_suite_display() + " " + self.get_test_id()
+            + ": " + str(self.flaky_count) + " of " + str(self.run_count) + " runs"
+        )
+
+    class Meta:
+        unique_together = ["suite", "test_category", "test_name"]
+
+    def get_test_id(self):
+        """
+        Returns the LIT test path or the CTS test category and name.
+        """
+        if self.suite == TestFlakiness.Suite.LIT:
+            return self.test_name
+        return self.test_category + "/" + self.test_name
+
+    def get_flake_rate(self):
+        """
+        Returns the percentage of runs which failed but passed when re-run.
+        """
+        return round(100 * self.flaky_count / self.run_count)
+
+    def is_known_flaky(self):
+        """
+        Returns True if the test was flaky often enough to distrust its failures.
+        """
+        return self.flaky_count >= TestFlakiness.KNOWN_FLAKY_RUN_COUNT
+
+
+# Model representing the search for the first main branch revision failing tests
+# which passed in the previous completed primary job
+class Bisection(models.Model):
+    date_added = models.DateTimeField(auto_now_add=True)
+    date_finished = models.DateTimeField(blank=True, null=True)
+    baseline_job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="+")
+    regression_job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="+")
+    # Latest revision known to pass and earliest revision known to fail the tests
+    good_revision = models.ForeignKey(
+        Revision, on_delete=models.CASCADE, related_name="+"
+    )
+    bad_revision = models.ForeignKey(
+        Revision, on_delete=models.CASCADE, related_name="+"
+    )
+    # Revisions which could not be tested since their build failed
+    skipped_revisions = models.ManyToManyField(
+        Revision, blank=True, related_name="+"
+    )
+    current_job = models.ForeignKey(
+        Job, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    step_count = models.IntegerField(default=0)
+    # Regressed tests, one per line (CTS tests as category/name)
+    lit_tests = models.TextField(blank=True)
+    cts_tests = models.TextField(blank=True)
+
+    class Status(models.TextChoices):
+        RUNNING = "R", _("Running")
+        FOUND = "F", _("First bad revision found")
+        UNRESOLVED = "U", _("Unresolved")
+        CANCELLED = "C", _("Cancelled")
+
+    status = models.CharField(
+        max_length=1, choices=Status.choices, default=Status.RUNNING
+    )
+
+    def __str__(self):
+        return (
+            "Bisection " + str(self.pk) + " (" + self.status + ")"
+            + " between " + self.good_revision.hash[:16]
+            + " and " + self.bad_revision.hash[:16]
+        )
+
+    class Meta:
+        ordering = ["-date_added"]
+
+    def get_lit_tests(self):
+        """
+        Returns the paths of the regressed LIT tests.
+        """
+        return self.lit_tests.splitlines()
+
+    def get_cts_tests(self):
+        """
+        Returns the regressed CTS tests (as category/name).
+        """
+        return self.cts_tests.splitlines()
+
+    def get_revisions_in_range(self):
+        """
+        Returns the main branch revisions committed between the good and the bad
+        revision in commit order.
+        """
+        return Revision.objects.filter(
+            branch=self.bad_revision.branch,
+            staging=False,
+            date__gt=self.good_revision.date,
+            date__lt=self.bad_revision.date,
+        ).order_by("date")
+
+    def get_candidate_revisions(self):
+        """
+        Returns the revisions in range which can still be tested.
+        """
+        return self.get_revisions_in_range().exclude(
+            pk__in=self.skipped_revisions.all()
+        )
+
+    def get_remaining_steps(self, candidate_revision_count=None):
+        """
+        Returns the number of steps needed at most to finish the bisection. The
+        candidate revisions are counted unless their number is given.
+        """
+        if candidate_revision_count is None:
+            candidate_revision_count = self.get_candidate_revisions().count()
+        return math.ceil(math.log2(candidate_revision_count + 1))
+
+    def sanitize(self):
+        """
+        Sanitizes the object's data before passing to a view.
+        """
+        self.good_revision.sanitize()
+        self.bad_revision.sanitize()
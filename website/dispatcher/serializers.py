@@ -1,10 +1,29 @@
+from datetime import timezone
+
 from rest_framework import serializers
 
-from .models import CtsResult, Job, LitResult
+from .dispatcher import estimate_job_duration, get_category_durations
+from .models import CtsResult, Job, LitResult, TestDuration, TestFlakiness
 
 
 class JobSerializer(serializers.ModelSerializer):
     revision_hash = serializers.CharField(source="revision.hash", read_only=True)
+    changed_files = serializers.ListField(
+        source="revision.get_changed_files", read_only=True
+    )
+    estimated_duration = serializers.SerializerMethodField()
+    selected_lit_tests = serializers.ListField(
+        source="get_selected_lit_tests", read_only=True
+    )
+    selected_cts_tests = serializers.ListField(
+        source="get_selected_cts_tests", read_only=True
+    )
+
+    def get_estimated_duration(self, job):
+        duration = estimate_job_duration(job, get_category_durations())
+        if duration is None:
+            return None
+        return duration.total_seconds()
 
     class Meta:
         model = Job
@@ -12,6 +31,11 @@ class JobSerializer(serializers.ModelSerializer):
             "pk",
             "status",
             "revision_hash",
+            "changed_files",
+            "lit_selection",
+            "estimated_duration",
+            "selected_lit_tests",
+            "selected_cts_tests",
             "run_lit_all",
             "run_cts_allocations",
             "run_cts_api",
@@ -65,10 +89,27 @@ class JobDeserializer(serializers.ModelSerializer):
 class LitResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = LitResult
-        fields = ("test_path", "passing")
+        fields = ("test_path", "passing", "rerun_count", "rerun_pass_count")
 
 
 class CtsResultSerializer(serializers.ModelSerializer):
+    # A missing value in form data means the test was not re-run.
+    rerun_passing = serializers.BooleanField(
+        allow_null=True, required=False, default=None
+    )
+    # Test outputs are only received, they are stored compressed.
+    standard_output = serializers.CharField(
+        write_only=True, required=False, allow_blank=True
+    )
+    standard_error = serializers.CharField(
+        write_only=True, required=False, allow_blank=True
+    )
+
+    def validate(self, data):
+        for field in ("standard_output", "standard_error"):
+            data[field + "_compressed"] = CtsResult.compress_log(data.pop(field, ""))
+        return data
+
     class Meta:
         model = CtsResult
         fields = (
@@ -86,4 +127,95 @@ class CtsResultSerializer(serializers.ModelSerializer):
             "igc_version",
             "neo_version",
             "dump",
+            "dump_policy",
+            "rerun_passing",
+            "rerun_count",
+            "rerun_pass_count",
+            "output_truncated",
+        )
+
+
+class JobProgressSerializer(serializers.Serializer):
+    current_test = serializers.CharField(
+        max_length=250, required=False, allow_blank=True
+    )
+    tests_done = serializers.IntegerField(min_value=0, required=False)
+    tests_remaining = serializers.IntegerField(min_value=0, required=False)
+
+
+class TestDurationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TestDuration
+        fields = ("test_category", "test_name", "median_duration", "sample_count")
+
+
+class RequestedOutputSerializer(serializers.ModelSerializer):
+    revision_hash = serializers.CharField(
+        source="parent_job.revision.hash", read_only=True
+    )
+    # Runners identify their runs by the start time they reported (in UTC).
+    start_time = serializers.DateTimeField(
+        read_only=True, default_timezone=timezone.utc
+    )
+
+    class Meta:
+        model = CtsResult
+        fields = ("pk", "revision_hash", "test_category", "test_name", "start_time")
+
+
+class FullOutputSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CtsResult
+        fields = ("full_output",)
+
+
+class TestFlakinessSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TestFlakiness
+        fields = (
+            "suite",
+            "test_category",
+            "test_name",
+            "run_count",
+            "failure_count",
+            "flaky_count",
+        )
+
+
+class LitTestHistorySerializer(serializers.ModelSerializer):
+    revision_hash = serializers.CharField(source="parent_job.revision.hash")
+    revision_date = serializers.DateTimeField(source="parent_job.revision.date")
+
+    class Meta:
+        model = LitResult
+        fields = (
+            "revision_hash",
+            "revision_date",
+            "parent_job",
+            "passing",
+            "rerun_count",
+            "rerun_pass_count",
+        )
+
+
+class CtsTestHistorySerializer(serializers.ModelSerializer):
+    revision_hash = serializers.CharField(source="parent_job.revision.hash")
+    revision_date = serializers.DateTimeField(source="parent_job.revision.date")
+    duration = serializers.SerializerMethodField()
+
+    def get_duration(self, result):
+        return result.get_duration().total_seconds()
+
+    class Meta:
+        model = CtsResult
+        fields = (
+            "revision_hash",
+            "revision_date",
+            "parent_job",
+            "passing",
+            "timedout",
+            "duration",
+            "rerun_count",
+            "rerun_pass_count",
+            "rerun_passing",
         )
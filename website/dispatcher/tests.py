@@ -1,3 +1,300 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+import urllib.request
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.utils import timezone
+from fetcher.config import get_tested_repository_main_branch_name
+from fetcher.models import Revision
+from .dispatcher import reclaim_expired_jobs, start_bisections, update_bisections
+from .models import Bisection, Job, LitResult
+from .views import Dispatch
 
-# Create your tests here.
+# Number of simulated runners dispatching jobs at the same time
+RUNNER_COUNT = 8
+
+# Number of queued jobs to be dispatched
+JOB_COUNT = 40
+
+
+# Runners authenticate on every request, so use a fast password hasher. The live
+# server handles every request with its own connection to the file-backed test
+# database, so the runners really claim jobs concurrently.
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class DispatchConcurrencyTests(LiveServerTestCase):
+    def setUp(self):
+        for i in range(JOB_COUNT):
+            revision = Revision.objects.create(
+                hash=f"{i:040x}", title=f"Revision {i}", date=timezone.now()
+            )
+            Job.objects.create(revision=revision)
+
+        for i in range(RUNNER_COUNT):
+            User.objects.create_user(f"runner{i}", password="password")
+
+    def dispatch_until_empty(self, runner, dispatched_jobs, errors):
+        credentials = base64.b64encode(f"{runner}:password".encode("utf-8"))
+        try:
+            while True:
+                request = urllib.request.Request(
+                    self.live_server_url + "/api/dispatch/",
+                    method="POST",
+                    headers={"Authorization": "Basic " + credentials.decode("utf-8")},
+                )
+                with urllib.request.urlopen(request) as response:
+                    if response.status == 204:
+                        return
+                    dispatched_jobs.append((json.load(response)["pk"], runner))
+        except Exception as exception:
+            # Report failed requests instead of losing them with the thread.
+            errors.append(f"{runner}: {exception!r}")
+
+    def test_each_job_dispatched_once(self):
+        dispatched_jobs = []
+        errors = []
+        threads = [
+            threading.Thread(
+                target=self.dispatch_until_empty,
+                args=(f"runner{i}", dispatched_jobs, errors),
+            )
+            for i in range(RUNNER_COUNT)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        dispatched_pks = [pk for pk, _ in dispatched_jobs]
+        self.assertEqual(len(dispatched_pks), JOB_COUNT)
+        self.assertEqual(
+            set(dispatched_pks), set(Job.objects.values_list("pk", flat=True))
+        )
+        self.assertFalse(Job.objects.filter(status=Job.Status.QUEUED).exists())
+
+        for pk, runner in dispatched_jobs:
+            self.assertEqual(Job.objects.get(pk=pk).dispatch_runner, runner)
+
+
+class DispatchOrderTests(TestCase):
+    def setUp(self):
+        self.runner = User.objects.create_user("runner")
+        self.revisions = [
+            Revision.objects.create(
+                hash=f"{i:040x}", title=f"Revision {i}", date=timezone.now()
+            )
+            for i in range(2)
+        ]
+
+    def create_shards(self, revision, dispatch_key):
+        parent_job = Job.objects.create(revision=revision, shard_count=2)
+        return [
+            Job.objects.create(
+                revision=revision,
+                parent_job=parent_job,
+                shard_index=i,
+                dispatch_key=dispatch_key,
+            )
+            for i in range(2)
+        ]
+
+    def dispatch(self):
+        self.client.force_login(self.runner)
+        response = self.client.post("/api/dispatch/")
+        if response.status_code == 204:
+            return None
+        return response.json()["pk"]
+
+    def test_shards_of_last_revision_go_first(self):
+        now = timezone.now()
+        built_shards = self.create_shards(self.revisions[0], now)
+        other_shards = self.create_shards(self.revisions[1], now - timedelta(hours=1))
+        job = Job.objects.create(
+            revision=self.revisions[1], dispatch_key=now - timedelta(hours=2)
+        )
+
+        # Without a last revision the earliest dispatch key goes first.
+        self.assertEqual(self.dispatch(), job.pk)
+        self.assertEqual(self.dispatch(), other_shards[0].pk)
+
+        # Once the runner built a revision, its other shards go first.
+        Job.objects.filter(pk=built_shards[0].pk).update(
+            status=Job.Status.COMPLETED,
+            dispatch_runner="runner",
+            dispatch_date=now + timedelta(minutes=1),
+        )
+        self.assertEqual(self.dispatch(), built_shards[1].pk)
+        self.assertEqual(self.dispatch(), other_shards[1].pk)
+        self.assertIsNone(self.dispatch())
+
+    def test_single_query_per_lookup(self):
+        self.create_shards(self.revisions[0], timezone.now())
+        with self.assertNumQueries(1):
+            Dispatch().get_object("runner")
+
+
+class LateUploadTests(TestCase):
+    def setUp(self):
+        revision = Revision.objects.create(
+            hash="0" * 40, title="Revision", date=timezone.now()
+        )
+        self.job = Job.objects.create(revision=revision)
+        self.old_runner = User.objects.create_user("old_runner")
+        self.new_runner = User.objects.create_user("new_runner")
+
+    def dispatch(self, runner):
+        self.client.force_login(runner)
+        response = self.client.post("/api/dispatch/")
+        self.assertEqual(response.json()["pk"], self.job.pk)
+
+    def post_lit_results(self, runner, test_paths):
+        self.client.force_login(runner)
+        return self.client.post(
+            f"/api/job/{self.job.pk}/lit/bulk/",
+            [{"test_path": test_path, "passing": True} for test_path in test_paths],
+            content_type="application/json",
+        )
+
+    def test_reclaimed_job_rejects_late_upload(self):
+        self.dispatch(self.old_runner)
+        self.assertEqual(
+            self.post_lit_results(self.old_runner, ["a.ll"]).status_code, 201
+        )
+
+        # The lease of the old runner expires and the job is dispatched again.
+        Job.objects.filter(pk=self.job.pk).update(
+            lease_expiration_date=timezone.now() - timedelta(minutes=1)
+        )
+        reclaim_expired_jobs()
+        self.dispatch(self.new_runner)
+
+        self.assertEqual(
+            self.post_lit_results(self.old_runner, ["a.ll"]).status_code, 409
+        )
+        self.client.force_login(self.old_runner)
+        response = self.client.put(
+            f"/api/job/{self.job.pk}/",
+            {"status": Job.Status.COMPLETED},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+
+        self.assertEqual(
+            self.post_lit_results(self.new_runner, ["b.ll"]).status_code, 201
+        )
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.Status.DISPATCHED)
+        self.assertEqual(self.job.dispatch_runner, "new_runner")
+        self.assertEqual(
+            list(LitResult.objects.values_list("test_path", flat=True)), ["b.ll"]
+        )
+        self.assertEqual(self.job.lit_results_total, 1)
+
+    def test_reclaimed_job_resumed_by_late_upload(self):
+        self.dispatch(self.old_runner)
+        self.post_lit_results(self.old_runner, ["a.ll"])
+
+        # The lease expires while the API is reachable.
+        Job.objects.filter(pk=self.job.pk).update(
+            lease_expiration_date=timezone.now() - timedelta(minutes=1)
+        )
+        reclaim_expired_jobs()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.Status.QUEUED)
+
+        # The runner reports back before the job is dispatched again.
+        self.assertEqual(
+            self.post_lit_results(self.old_runner, ["b.ll"]).status_code, 201
+        )
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.Status.TESTING)
+        self.assertEqual(self.job.dispatch_runner, "old_runner")
+        self.assertEqual(self.job.lit_results_total, 2)
+
+    def test_no_reclaim_after_outage(self):
+        self.dispatch(self.old_runner)
+
+        # No lease was renewed for longer than a lease, e.g. the API was down.
+        Job.objects.filter(pk=self.job.pk).update(
+            lease_renewal_date=timezone.now() - timedelta(hours=1),
+            lease_expiration_date=timezone.now() - timedelta(minutes=45),
+        )
+        reclaim_expired_jobs()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.Status.DISPATCHED)
+
+        # The first runner request after the outage renews all running leases.
+        self.client.force_login(self.new_runner)
+        self.client.post("/api/dispatch/")
+        self.job.refresh_from_db()
+        self.assertGreater(self.job.lease_expiration_date, timezone.now())
+
+
+class ProgressEstimateTests(TestCase):
+    def setUp(self):
+        revision = Revision.objects.create(
+            hash="0" * 40, title="Revision", date=timezone.now()
+        )
+        self.job = Job.objects.create(revision=revision)
+        self.job.grant_lease("runner")
+
+    def test_estimate_ignores_time_before_first_counted_test(self):
+        # Uncounted tests run for an hour before the first counted test.
+        self.job.renew_lease("a.ll", 0, 10)
+        self.job.progress_start_date -= timedelta(hours=1)
+        self.job.renew_lease("b.ll", 0, 10)
+        start_date = self.job.progress_start_date
+        self.assertEqual(start_date, self.job.lease_renewal_date)
+
+        # Half of the counted tests finish in ten minutes.
+        self.job.renew_lease("api/test_a", 5, 5)
+        self.assertEqual(self.job.progress_start_date, start_date)
+        self.job.lease_renewal_date = start_date + timedelta(minutes=10)
+        self.assertEqual(
+            self.job.get_estimated_completion_date(),
+            start_date + timedelta(minutes=20),
+        )
+
+
+class BisectionTests(TestCase):
+    def setUp(self):
+        self.jobs = []
+        for i in range(5):
+            revision = Revision.objects.create(
+                hash=f"{i:040x}",
+                title=f"Revision {i}",
+                branch=get_tested_repository_main_branch_name(),
+                staging=False,
+                skip=False,
+                date=timezone.now() + timedelta(minutes=i),
+            )
+            self.jobs.append(
+                Job.objects.create(
+                    revision=revision,
+                    primary_job=True,
+                    status=Job.Status.DEFERRED,
+                    priority_class=Job.PriorityClass.PRIMARY,
+                )
+            )
+
+        # A test passing for the first revision fails for the last one.
+        for job, passing in ((self.jobs[0], True), (self.jobs[-1], False)):
+            job.status = Job.Status.COMPLETED
+            job.save()
+            LitResult.objects.create(parent_job=job, test_path="a.ll", passing=passing)
+
+    def test_deferred_revision_requeued_for_bisection(self):
+        start_bisections()
+        update_bisections()
+
+        bisection = Bisection.objects.get()
+        job = bisection.current_job
+        self.assertEqual(job.pk, self.jobs[2].pk)
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertEqual(job.priority_class, Job.PriorityClass.BISECTION)
+        self.assertEqual(Job.objects.count(), len(self.jobs))
+        self.assertEqual(
+            Job.objects.filter(status=Job.Status.DEFERRED).count(), len(self.jobs) - 3
+        )
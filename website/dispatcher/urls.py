@@ -4,7 +4,19 @@ from . import views
 
 urlpatterns = [
     path("job/<int:pk>/", views.JobDetail.as_view()),
+    path("job/<int:pk>/lease/", views.JobLeaseRenewal.as_view()),
     path("dispatch/", views.Dispatch.as_view()),
+    path("durations/", views.TestDurationList.as_view()),
+    path("flakiness/", views.TestFlakinessList.as_view()),
+    path("history/lit/<path:test_path>/", views.LitTestHistory.as_view()),
+    path(
+        "history/cts/<str:test_category>/<str:test_name>/",
+        views.CtsTestHistory.as_view(),
+    ),
     path("job/<int:job_pk>/lit/", views.LitResultDetail.as_view()),
     path("job/<int:job_pk>/cts/", views.CtsResultDetail.as_view()),
+    path("job/<int:job_pk>/lit/bulk/", views.LitResultBulk.as_view()),
+    path("job/<int:job_pk>/cts/bulk/", views.CtsResultBulk.as_view()),
+    path("outputs/requested/", views.RequestedOutputList.as_view()),
+    path("cts/<int:pk>/output/", views.CtsResultFullOutput.as_view()),
 ]
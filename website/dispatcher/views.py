@@ -1,24 +1,44 @@
-from datetime import datetime
+import json
 
+from django.db import transaction
+from django.db.models import Case, Subquery, Value, When
 from django.http import Http404
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .dispatcher import (
+    estimate_queue_drain_time,
+    get_category_durations,
+    get_cts_test_history,
+    get_lit_test_history,
+    renew_leases_after_outage,
+    requeue_deferred_job,
+)
 from .models import *
 from .serializers import *
 
+# Number of jobs first in the queue searched for shards of the revision last
+# dispatched to a runner
+DISPATCH_CANDIDATE_COUNT = 20
+
 
 class JobDetail(APIView):
     """
     Retrieve job details or update job status.
+
+    Only the runner a job is dispatched to can update its status, and only while
+    the job is dispatched or being tested. A runner whose lease expired resumes
+    the job if it was not dispatched to another runner yet, otherwise it gets
+    HTTP 409, as with results it uploads for the job.
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_object(self, pk):
+    def get_object(self, pk, lock=False):
+        jobs = Job.objects.select_for_update() if lock else Job.objects
         try:
-            return Job.objects.get(pk=pk)
+            return jobs.get(pk=pk)
         except Job.DoesNotExist:
             raise Http404
 
@@ -28,87 +48,416 @@ class JobDetail(APIView):
         return Response(serializer.data)
 
     def put(self, request, pk, format=None):
-        job = self.get_object(pk)
-        serializer = JobDeserializer(job, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+        with transaction.atomic():
+            job = self.get_object(pk, lock=True)
+            if not job.accepts_runner(request.user.username):
+                return Response(status=status.HTTP_409_CONFLICT)
+
+            serializer = JobDeserializer(job, data=request.data)
+            if serializer.is_valid():
+                serializer.save()
+                if job.parent_job_id:
+                    job.parent_job.update_from_shards()
+                return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class Dispatch(APIView):
     """
-    Retrieve a queued job to be tested.
+    Retrieve a queued job to be tested or the estimated time to drain the
+    queue.
+
+    Every job is dispatched to exactly one runner: the job is claimed with a
+    conditional update which only succeeds while the job is still queued, so
+    concurrent requests retry with the next queued job instead.
+
+    Queued jobs are dispatched in the order of their dispatch keys, which rank
+    them by priority class, waiting time and estimated duration. Sharded jobs
+    are only dispatched through their shards. Among the first queued jobs,
+    shards of the revision last dispatched to the runner are preferred, since
+    the runner has already built it.
+
+    Deferred jobs are only returned to the queue when no other job is queued.
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_object(self):
-        jobs = Job.objects.filter(status=Job.Status.QUEUED).order_by("date_added")
-        if jobs.exists():
-            return jobs[0]
-        else:
-            return None
+    def get_object(self, runner):
+        # A single query reads the first queued jobs from the index on the status
+        # and dispatch key. Among them, shards of the revision last dispatched to
+        # the runner go first. Shards of a revision are queued together, so they
+        # are next to each other in the dispatch order.
+        last_revision = (
+            Job.objects.filter(dispatch_runner=runner)
+            .order_by("-dispatch_date")
+            .values("revision_id")[:1]
+        )
+        jobs = list(
+            Job.objects.filter(status=Job.Status.QUEUED, shard_count=0)
+            .annotate(
+                built=Case(
+                    When(
+                        parent_job__isnull=False,
+                        revision_id=Subquery(last_revision),
+                        then=Value(True),
+                    ),
+                    default=Value(False),
+                )
+            )
+            .order_by("dispatch_key")[:DISPATCH_CANDIDATE_COUNT]
+        )
+        return next((job for job in jobs if job.built), jobs[0] if jobs else None)
+
+    def claim_object(self, runner):
+        while True:
+            job = self.get_object(runner)
+            if job is None:
+                # Test a deferred revision if the runner would be idle otherwise.
+                if requeue_deferred_job():
+                    continue
+                return None
+
+            job.status = Job.Status.DISPATCHED
+            job.grant_lease(runner)
+            claimed = Job.objects.filter(pk=job.pk, status=Job.Status.QUEUED).update(
+                status=job.status,
+                dispatch_runner=job.dispatch_runner,
+                dispatch_date=job.dispatch_date,
+                lease_renewal_date=job.lease_renewal_date,
+                lease_expiration_date=job.lease_expiration_date,
+                reclaimed_runner="",
+            )
+            if claimed:
+                # The job is tested again from the start, so results of the
+                # runner its lease was reclaimed from are no longer needed.
+                if job.reclaimed_runner:
+                    with transaction.atomic():
+                        Job.objects.select_for_update().filter(pk=job.pk).first()
+                        job.delete_partial_results()
+                    job.reclaimed_runner = ""
+                if job.parent_job_id:
+                    job.parent_job.update_from_shards()
+                return job
+
+    def get(self, request, format=None):
+        jobs = Job.objects.filter(
+            status__in=(Job.Status.QUEUED, Job.Status.DISPATCHED, Job.Status.TESTING)
+        )
+        drain_time = estimate_queue_drain_time(jobs, get_category_durations())
+        return Response(
+            {
+                "queued_jobs": jobs.filter(
+                    status=Job.Status.QUEUED, shard_count=0
+                ).count(),
+                "estimated_drain_time": drain_time.total_seconds(),
+            }
+        )
 
     def post(self, request, format=None):
-        job = self.get_object()
+        renew_leases_after_outage()
+        job = self.claim_object(self.request.user.username)
         if job is None:
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        job.status = Job.Status.DISPATCHED
-        job.dispatch_date = datetime.now()
-        job.dispatch_runner = self.request.user.username
-        job.save()
-
         serializer = JobSerializer(job)
         return Response(serializer.data)
 
 
+class TestDurationList(APIView):
+    """
+    List the median durations of CTS tests in recently completed jobs.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        serializer = TestDurationSerializer(TestDuration.objects.all(), many=True)
+        return Response(serializer.data)
+
+
+class TestFlakinessList(APIView):
+    """
+    List how often tests failed and passed when re-run in recently completed jobs.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        serializer = TestFlakinessSerializer(TestFlakiness.objects.all(), many=True)
+        return Response(serializer.data)
+
+
+class LitTestHistory(APIView):
+    """
+    List the results of a LIT test across the latest main branch revisions.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, test_path, format=None):
+        serializer = LitTestHistorySerializer(
+            get_lit_test_history(test_path), many=True
+        )
+        return Response(serializer.data)
+
+
+class CtsTestHistory(APIView):
+    """
+    List the results of a CTS test across the latest main branch revisions.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, test_category, test_name, format=None):
+        serializer = CtsTestHistorySerializer(
+            get_cts_test_history(test_category, test_name), many=True
+        )
+        return Response(serializer.data)
+
+
+class JobLeaseRenewal(APIView):
+    """
+    Renew the lease of a job dispatched to the requesting runner, record the
+    reported progress and report whether the job was cancelled. A job reclaimed
+    after its lease expired is resumed if it was not dispatched again yet.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self, pk):
+        try:
+            return Job.objects.get(pk=pk)
+        except Job.DoesNotExist:
+            raise Http404
+
+    def post(self, request, pk, format=None):
+        runner = request.user.username
+        job = self.get_object(pk)
+        serializer = JobProgressSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        renew_leases_after_outage()
+        job.resume_lease(runner)
+        if job.dispatch_runner != runner:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+
+        # Only renew the lease while the job is still dispatched to the runner, so
+        # a job reclaimed or cancelled in the meantime is not revived.
+        job.renew_lease(**serializer.validated_data)
+        renewed = Job.objects.filter(
+            pk=job.pk,
+            dispatch_runner=runner,
+            status__in=(Job.Status.DISPATCHED, Job.Status.TESTING),
+        ).update(
+            lease_renewal_date=job.lease_renewal_date,
+            lease_expiration_date=job.lease_expiration_date,
+            progress_current_test=job.progress_current_test,
+            progress_tests_done=job.progress_tests_done,
+            progress_tests_remaining=job.progress_tests_remaining,
+            progress_start_date=job.progress_start_date,
+        )
+        if not renewed:
+            job.refresh_from_db()
+            if job.dispatch_runner != runner:
+                return Response(status=status.HTTP_403_FORBIDDEN)
+
+        return Response({"status": job.status, "cancelled": not job.is_active()})
+
+
 class LitResultDetail(APIView):
     """
-    Create a new LIT test result.
+    Create a new LIT test result. Only the runner the job is dispatched to
+    can add results, and only while the job is tested (HTTP 409 otherwise).
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_parent_job(self, job_pk):
+    def get_job(self, job_pk):
+        # Lock the job, so it is not reclaimed while the results are saved.
         try:
-            return Job.objects.get(pk=job_pk)
+            return Job.objects.select_for_update().get(pk=job_pk)
         except Job.DoesNotExist:
             raise Http404
 
     def post(self, request, job_pk, format=None):
-        parent_job = self.get_parent_job(job_pk)
-
         serializer = LitResultSerializer(data=request.data)
         if serializer.is_valid():
-            result = serializer.save()
-            result.parent_job = parent_job
-            result.save()
+            with transaction.atomic():
+                job = self.get_job(job_pk)
+                if not job.accepts_runner(request.user.username):
+                    return Response(status=status.HTTP_409_CONFLICT)
+                parent_job = job.get_result_job()
+                result = serializer.save(parent_job=parent_job)
+                parent_job.count_results(lit_results=[result])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class CtsResultDetail(APIView):
     """
-    Create a new CTS test result.
+    Create a new CTS test result. Only the runner the job is dispatched to
+    can add results, and only while the job is tested (HTTP 409 otherwise).
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_parent_job(self, job_pk):
+    def get_job(self, job_pk):
+        # Lock the job, so it is not reclaimed while the results are saved.
         try:
-            return Job.objects.get(pk=job_pk)
+            return Job.objects.select_for_update().get(pk=job_pk)
         except Job.DoesNotExist:
             raise Http404
 
     def post(self, request, job_pk, format=None):
-        parent_job = self.get_parent_job(job_pk)
-
         serializer = CtsResultSerializer(data=request.data)
         if serializer.is_valid():
-            result = serializer.save()
-            result.parent_job = parent_job
-            result.save()
+            with transaction.atomic():
+                job = self.get_job(job_pk)
+                if not job.accepts_runner(request.user.username):
+                    return Response(status=status.HTTP_409_CONFLICT)
+                parent_job = job.get_result_job()
+                result = serializer.save(parent_job=parent_job)
+                parent_job.count_results(cts_results=[result])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LitResultBulk(APIView):
+    """
+    Create many new LIT test results at once. Only the runner the job is dispatched to
+    can add results, and only while the job is tested (HTTP 409 otherwise).
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_job(self, job_pk):
+        # Lock the job, so it is not reclaimed while the results are saved.
+        try:
+            return Job.objects.select_for_update().get(pk=job_pk)
+        except Job.DoesNotExist:
+            raise Http404
+
+    def post(self, request, job_pk, format=None):
+        serializer = LitResultSerializer(data=request.data, many=True)
+        if serializer.is_valid():
+            with transaction.atomic():
+                job = self.get_job(job_pk)
+                if not job.accepts_runner(request.user.username):
+                    return Response(status=status.HTTP_409_CONFLICT)
+                parent_job = job.get_result_job()
+                results = LitResult.objects.bulk_create(
+                    [
+                        LitResult(parent_job=parent_job, **data)
+                        for data in serializer.validated_data
+                    ]
+                )
+                parent_job.count_results(lit_results=results)
+            return Response(
+                {"created": len(serializer.validated_data)},
+                status=status.HTTP_201_CREATED,
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CtsResultBulk(APIView):
+    """
+    Create many new CTS test results at once. Only the runner the job is dispatched to
+    can add results, and only while the job is tested (HTTP 409 otherwise).
+
+    Results are sent either as a JSON array or as a multipart form with the JSON
+    array in the "results" field and the dump of the n-th result in "dump_<n>".
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_job(self, job_pk):
+        # Lock the job, so it is not reclaimed while the results are saved.
+        try:
+            return Job.objects.select_for_update().get(pk=job_pk)
+        except Job.DoesNotExist:
+            raise Http404
+
+    def get_results_data(self, request):
+        if isinstance(request.data, list):
+            return request.data
+
+        try:
+            results_data = json.loads(request.data.get("results", "[]"))
+        except ValueError:
+            return None
+
+        if not isinstance(results_data, list):
+            return None
+
+        for index, result_data in enumerate(results_data):
+            dump = request.FILES.get("dump_" + str(index))
+            if dump and isinstance(result_data, dict):
+                result_data["dump"] = dump
+
+        return results_data
+
+    def post(self, request, job_pk, format=None):
+        results_data = self.get_results_data(request)
+        if results_data is None:
+            return Response(
+                {"results": ["Expected a JSON array of results."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = CtsResultSerializer(data=results_data, many=True)
+        if serializer.is_valid():
+            with transaction.atomic():
+                job = self.get_job(job_pk)
+                if not job.accepts_runner(request.user.username):
+                    return Response(status=status.HTTP_409_CONFLICT)
+                parent_job = job.get_result_job()
+                results = CtsResult.objects.bulk_create(
+                    [
+                        CtsResult(parent_job=parent_job, **data)
+                        for data in serializer.validated_data
+                    ]
+                )
+                parent_job.count_results(cts_results=results)
+            return Response(
+                {"created": len(serializer.validated_data)},
+                status=status.HTTP_201_CREATED,
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RequestedOutputList(APIView):
+    """
+    List CTS results whose full output was requested but not uploaded yet.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        results = CtsResult.objects.filter(
+            full_output_requested=True, full_output=""
+        ).select_related("parent_job__revision")
+        serializer = RequestedOutputSerializer(results, many=True)
+        return Response(serializer.data)
+
+
+class CtsResultFullOutput(APIView):
+    """
+    Upload the full output of a CTS result.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self, pk):
+        try:
+            return CtsResult.objects.get(pk=pk)
+        except CtsResult.DoesNotExist:
+            raise Http404
+
+    def post(self, request, pk, format=None):
+        result = self.get_object(pk)
+        serializer = FullOutputSerializer(result, data=request.data)
+        if serializer.is_valid():
+            serializer.save(full_output_requested=False)
+            return Response(status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
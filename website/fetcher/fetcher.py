@@ -90,6 +90,7 @@ def fetch_main_branch_revisions():
             staging=False,
             date=date,
             skip=skip,
+            changed_files=changed_files,
         )
         revision.save()
         print(revision)
@@ -173,6 +174,18 @@ def fetch_staging_revisions():
         if Revision.objects.filter(hash=hash).exists():
             continue
 
+        # Get the list of files changed on the branch since it forked off the
+        # main branch.
+        changed_files = subprocess.check_output(
+            [
+                "git",
+                "diff",
+                "--name-only",
+                get_tested_repository_main_branch_name() + "..." + hash,
+            ],
+            cwd=repository_path,
+        ).decode("utf-8")
+
         revision = Revision(
             hash=hash,
             title=title,
@@ -180,6 +193,7 @@ def fetch_staging_revisions():
             staging=True,
             date=date,
             skip=False,
+            changed_files=changed_files,
         )
         revision.save()
         print(revision)
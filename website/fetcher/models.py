@@ -12,6 +12,7 @@ class Revision(models.Model):
     staging = models.BooleanField(default=True)
     date = models.DateTimeField()
     skip = models.BooleanField(default=True)
+    changed_files = models.TextField(blank=True)
     date_added = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -25,3 +26,9 @@ class Revision(models.Model):
         Sanitizes the object's data before passing to a view.
         """
         self.title = mark_safe(bleach.clean(self.title))
+
+    def get_changed_files(self):
+        """
+        Get the list of files changed by this revision.
+        """
+        return self.changed_files.splitlines()
@@ -1,3 +1,149 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from fetcher.config import get_tested_repository_main_branch_name
+from fetcher.models import Revision
+from dispatcher.models import Bisection, CtsResult, Job, LitResult
 
-# Create your tests here.
+# Number of rows shown by each page when counting queries first
+INITIAL_ROW_COUNT = 2
+
+# Number of rows added before counting queries again
+ADDED_ROW_COUNT = 20
+
+
+class QueryCountTests(TestCase):
+    def setUp(self):
+        self.revision_count = 0
+        self.revision = self.create_revision(staging=False)
+        self.add_rows(INITIAL_ROW_COUNT)
+
+    def create_revision(self, staging):
+        self.revision_count += 1
+        return Revision.objects.create(
+            hash=f"{self.revision_count:040x}",
+            title=f"Revision {self.revision_count}",
+            branch=get_tested_repository_main_branch_name(),
+            staging=staging,
+            skip=False,
+            date=timezone.now() + timedelta(minutes=self.revision_count),
+        )
+
+    def add_rows(self, count):
+        """
+        Add count rows to each of the pages: revisions with primary jobs, queued
+        jobs with selected tests, and jobs and bisections of self.revision.
+        """
+        statuses = [Job.Status.COMPLETED, Job.Status.QUEUED, Job.Status.TESTING]
+        for i in range(count):
+            for staging in (False, True):
+                Job.objects.create(
+                    revision=self.create_revision(staging),
+                    primary_job=True,
+                    status=statuses[i % len(statuses)],
+                )
+
+            job = Job.objects.create(
+                revision=self.revision,
+                selected_cts_tests="api/test_a\nbasic/test_b",
+                priority_class=Job.PriorityClass.BISECTION,
+            )
+            bisection = Bisection.objects.create(
+                baseline_job=job,
+                regression_job=job,
+                good_revision=self.create_revision(staging=False),
+                bad_revision=self.revision,
+                current_job=job,
+            )
+            bisection.skipped_revisions.add(self.create_revision(staging=False))
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_constant_query_count(self):
+        urls = [
+            "/dashboard/",
+            "/commited/",
+            "/staging/",
+            "/queue/",
+            f"/revision/{self.revision.hash}/",
+        ]
+        query_counts = {url: self.count_queries(url) for url in urls}
+
+        self.add_rows(ADDED_ROW_COUNT)
+        for url in urls:
+            self.assertEqual(self.count_queries(url), query_counts[url], url)
+
+
+class CtsResultLogTests(TestCase):
+    def setUp(self):
+        revision = Revision.objects.create(
+            hash="0" * 40, title="Revision", date=timezone.now()
+        )
+        self.output = "".join(f"line {i}\n" for i in range(100000))
+        self.result = CtsResult.objects.create(
+            parent_job=Job.objects.create(revision=revision),
+            test_category="api",
+            test_name="test_a",
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            standard_output_compressed=CtsResult.compress_log(self.output),
+            output_truncated=True,
+        )
+        self.url = f"/cts_result/{self.result.pk}/log/stdout/"
+
+    def test_range(self):
+        data = self.output.encode("utf-8")
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, data[100:200])
+        self.assertEqual(response["Content-Range"], "bytes 100-199/*")
+
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(data) - 10}-")
+        self.assertEqual(response.content, data[-10:])
+        self.assertEqual(
+            response["Content-Range"],
+            f"bytes {len(data) - 10}-{len(data) - 1}/{len(data)}",
+        )
+
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(data)}-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_request_output_requires_staff(self):
+        url = f"/cts_result/{self.result.pk}/request_output/"
+        self.client.post(url)
+        self.result.refresh_from_db()
+        self.assertFalse(self.result.full_output_requested)
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.client.post(url)
+        self.result.refresh_from_db()
+        self.assertTrue(self.result.full_output_requested)
+
+
+class JobCompareCacheTests(TestCase):
+    def setUp(self):
+        revision = Revision.objects.create(
+            hash="0" * 40, title="Revision", date=timezone.now()
+        )
+        self.jobs = [
+            Job.objects.create(revision=revision, status=Job.Status.COMPLETED)
+            for _ in range(2)
+        ]
+        self.url = f"/job/compare/{self.jobs[0].pk}/{self.jobs[1].pk}/"
+
+    def test_comparison_updated_with_results(self):
+        caches["comparisons"].clear()
+        self.assertNotContains(self.client.get(self.url), "a.ll")
+
+        result = LitResult.objects.create(parent_job=self.jobs[0], test_path="a.ll")
+        self.jobs[0].count_results(lit_results=[result])
+        self.assertContains(self.client.get(self.url), "a.ll")
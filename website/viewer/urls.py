@@ -9,6 +9,26 @@ urlpatterns = [
     path("revision/<str:hash>/", views.revision, name="revision"),
     path("job/<int:pk>/", views.job, name="job"),
     path("job/compare/<int:pk1>/<int:pk2>/", views.job_compare, name="job_compare"),
+    path(
+        "history/lit/<path:test_path>/",
+        views.lit_test_history,
+        name="lit_test_history",
+    ),
+    path(
+        "history/cts/<str:test_category>/<str:test_name>/",
+        views.cts_test_history,
+        name="cts_test_history",
+    ),
     path("cts_result/<int:pk>/", views.cts_result, name="cts_result"),
+    path(
+        "cts_result/<int:pk>/log/<str:stream>/",
+        views.cts_result_log,
+        name="cts_result_log",
+    ),
+    path(
+        "cts_result/<int:pk>/request_output/",
+        views.cts_result_request_output,
+        name="cts_result_request_output",
+    ),
     path("", views.index, name="index"),
 ]
@@ -1,17 +1,49 @@
 from datetime import timedelta
 
+import re
+
+import bleach
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache, caches
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import Http404, HttpResponse
+from django.db.models import Exists, F, Func, OuterRef, Q, Subquery
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.template import loader
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.views.decorators.clickjacking import xframe_options_deny
 from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
 
 from fetcher.config import get_tested_repository_main_branch_name
+from dispatcher.config import get_priority_boosts, get_priority_duration_weight
 from fetcher.models import *
+from dispatcher.dispatcher import (
+    estimate_job_duration,
+    estimate_queue_drain_time,
+    get_category_durations,
+    get_cts_test_history,
+    get_known_flaky_tests,
+    get_lit_test_history,
+    get_test_durations,
+)
 from dispatcher.models import *
 
+# Number of bytes of a test output rendered with the CTS result page, the rest is
+# loaded on demand
+LOG_PREVIEW_SIZE = 64 * 1024
+
+# Number of result pairs per page of a job comparison
+RESULT_PAIRS_PER_PAGE = 500
+
+# Number of latest main branch primary jobs shown on the dashboard
+DASHBOARD_JOB_COUNT = 30
+
+# Test output fields of CTS results by the stream name used in URLs
+LOG_FIELDS = {"stdout": "standard_output", "stderr": "standard_error"}
+
 
 @xframe_options_deny
 def index(request):
@@ -23,22 +55,49 @@ def index(request):
 @xframe_options_deny
 def dashboard(request):
     template = loader.get_template("dashboard.html")
-    context = {"page_title": "Dashboard"}
+
+    # Get primary jobs of the latest main branch revisions. Pass rates come from
+    # the result summaries of the jobs.
+    jobs = (
+        Job.objects.filter(
+            primary_job=True,
+            revision__staging=False,
+            revision__branch=get_tested_repository_main_branch_name(),
+        )
+        .select_related("revision")
+        .order_by("-revision__date")[:DASHBOARD_JOB_COUNT]
+    )
+
+    # Sanitize any strings in the jobs.
+    for job in jobs:
+        job.sanitize()
+
+    context = {"page_title": "Dashboard", "jobs": jobs}
     return HttpResponse(template.render(context, request))
 
 
-def _get_status_for_revision(revision):
+def _annotate_primary_job_status(revisions):
     """
-    Get status for revisions's primary job or None if revision is skipped or
-    a primary job does not exist.
+    Annotate revisions with the status of their latest primary job (None if a
+    primary job does not exist).
     """
-    if revision.skip:
-        return None
+    primary_jobs = Job.objects.filter(primary_job=True, revision=OuterRef("pk"))
+    return revisions.annotate(
+        primary_job_status=Subquery(primary_jobs.values("status")[:1])
+    )
 
-    jobs = Job.objects.filter(primary_job=True, revision=revision)
-    if not jobs.exists():
-        return None
-    return jobs[0].status
+
+def _get_revision_status_pairs(revisions):
+    """
+    Get pairs of sanitized revisions annotated by _annotate_primary_job_status
+    and their primary job status or None if revision is skipped.
+    """
+    revision_status_pairs = []
+    for revision in revisions:
+        revision.sanitize()
+        status = None if revision.skip else revision.primary_job_status
+        revision_status_pairs.append((revision, status))
+    return revision_status_pairs
 
 
 @xframe_options_deny
@@ -52,12 +111,16 @@ def commited(request):
     )
 
     # Get last tested revision to show at the top of the page.
-    last_tested_revision = None
-    for revision in revisions.filter(skip=False).order_by("date_added"):
-        if Job.objects.filter(revision=revision, status=Job.Status.COMPLETED).exists():
-            last_tested_revision = revision
+    completed_jobs = Job.objects.filter(
+        revision=OuterRef("pk"), status=Job.Status.COMPLETED
+    )
+    last_tested_revision = (
+        revisions.filter(Exists(completed_jobs), skip=False)
+        .order_by("date_added")
+        .last()
+    )
 
-    paginator = Paginator(revisions, 100)
+    paginator = Paginator(_annotate_primary_job_status(revisions), 100)
     page_number = request.GET.get("page")
     page_object = paginator.get_page(page_number)
 
@@ -65,13 +128,8 @@ def commited(request):
     if last_tested_revision:
         last_tested_revision.sanitize()
 
-    for revision in page_object:
-        revision.sanitize()
-
     # Get primary job status for each revision.
-    revision_status_pairs = []
-    for revision in page_object:
-        revision_status_pairs.append((revision, _get_status_for_revision(revision)))
+    revision_status_pairs = _get_revision_status_pairs(page_object)
 
     context = {
         "page_title": "Commited",
@@ -91,14 +149,10 @@ def staging(request):
     recently = timezone.now() - timedelta(days=60)
     revisions = Revision.objects.filter(staging=True, date__gte=recently)
 
-    # Sanitize any strings in the revisions.
-    for revision in revisions:
-        revision.sanitize()
-
     # Get primary job status for each revision.
-    revision_status_pairs = []
-    for revision in revisions:
-        revision_status_pairs.append((revision, _get_status_for_revision(revision)))
+    revision_status_pairs = _get_revision_status_pairs(
+        _annotate_primary_job_status(revisions)
+    )
 
     context = {"page_title": "Staging", "revision_status_pairs": revision_status_pairs}
     return HttpResponse(template.render(context, request))
@@ -110,15 +164,39 @@ def _get_latest_main_branch_primary_job():
     """
     latest_revision = Revision.objects.filter(
         skip=False, branch=get_tested_repository_main_branch_name()
-    )
-    if latest_revision.exists():
-        return Job.objects.filter(
-            revision=latest_revision.latest("date_added"),
+    ).order_by("-date_added")
+    return (
+        Job.objects.filter(
+            revision=Subquery(latest_revision.values("pk")[:1]),
             primary_job=True,
             status=Job.Status.COMPLETED,
-        ).first()
+        )
+        .select_related("revision")
+        .first()
+    )
+
 
-    return None
+def _annotate_candidate_revision_count(bisections):
+    """
+    Annotate bisections with the number of revisions which can still be tested
+    (see Bisection.get_candidate_revisions).
+    """
+    skipped_revisions = Bisection.skipped_revisions.through.objects.filter(
+        bisection=OuterRef(OuterRef("pk"))
+    )
+    candidate_revisions = (
+        Revision.objects.filter(
+            branch=OuterRef("bad_revision__branch"),
+            staging=False,
+            date__gt=OuterRef("good_revision__date"),
+            date__lt=OuterRef("bad_revision__date"),
+        )
+        .exclude(pk__in=skipped_revisions.values("revision"))
+        .order_by()
+        .annotate(count=Func(F("pk"), function="COUNT"))
+        .values("count")
+    )
+    return bisections.annotate(candidate_revision_count=Subquery(candidate_revisions))
 
 
 @xframe_options_deny
@@ -126,17 +204,36 @@ def queue(request):
     template = loader.get_template("queue.html")
 
     # Retrieve all jobs that are not yet completed.
-    jobs = Job.objects.filter(
-        Q(status=Job.Status.QUEUED)
-        | Q(status=Job.Status.DISPATCHED)
-        | Q(status=Job.Status.TESTING)
-    ).order_by("date_added")
+    jobs = list(
+        Job.objects.filter(
+            Q(status=Job.Status.QUEUED)
+            | Q(status=Job.Status.DISPATCHED)
+            | Q(status=Job.Status.TESTING)
+        )
+        .select_related("revision")
+        .order_by("dispatch_key")
+    )
+
+    # Count the jobs deferred until runners have spare capacity.
+    deferred_job_count = Job.objects.filter(
+        status=Job.Status.DEFERRED, parent_job__isnull=True
+    ).count()
 
     # Get a job to compare the queued jobs to.
     latest_main_branch_primary_job = _get_latest_main_branch_primary_job()
 
+    # Estimate job durations from the recent test durations.
+    category_durations = get_category_durations()
+    test_durations = get_test_durations(jobs)
+    estimated_drain_time = estimate_queue_drain_time(
+        jobs, category_durations, test_durations
+    )
+
     # Sanitize any strings in the jobs.
     for job in jobs:
+        job.estimated_duration = estimate_job_duration(
+            job, category_durations, test_durations
+        )
         job.sanitize()
 
     if latest_main_branch_primary_job:
@@ -145,6 +242,10 @@ def queue(request):
     context = {
         "page_title": "Queue",
         "jobs": jobs,
+        "estimated_drain_time": estimated_drain_time,
+        "deferred_job_count": deferred_job_count,
+        "priority_boosts": get_priority_boosts(),
+        "priority_duration_weight": get_priority_duration_weight(),
         "latest_main_branch_primary_job": latest_main_branch_primary_job,
     }
     return HttpResponse(template.render(context, request))
@@ -159,8 +260,19 @@ def revision(request, hash):
     except Revision.DoesNotExist:
         raise Http404("Revision does not exist!")
 
-    # Get all jobs for the given revision.
-    jobs = Job.objects.filter(revision=revision)
+    # Get all jobs for the given revision. Shards are shown with their job.
+    jobs = Job.objects.filter(
+        revision=revision, parent_job__isnull=True
+    ).select_related("revision")
+
+    # Get bisections of regressions first seen in the revision and bisections
+    # which found the revision to be the first bad one.
+    bisections = _annotate_candidate_revision_count(
+        Bisection.objects.filter(
+            Q(regression_job__revision=revision)
+            | Q(bad_revision=revision, status=Bisection.Status.FOUND)
+        ).select_related("good_revision", "bad_revision")
+    )
 
     # Get a job to compare the given job to.
     latest_main_branch_primary_job = _get_latest_main_branch_primary_job()
@@ -174,15 +286,45 @@ def revision(request, hash):
     for job in jobs:
         job.sanitize()
 
+    for bisection in bisections:
+        bisection.remaining_steps = bisection.get_remaining_steps(
+            bisection.candidate_revision_count
+        )
+        bisection.sanitize()
+
     context = {
         "page_title": "Revision " + revision.hash[:16],
         "revision": revision,
         "jobs": jobs,
+        "bisections": bisections,
         "latest_main_branch_primary_job": latest_main_branch_primary_job,
     }
     return HttpResponse(template.render(context, request))
 
 
+def _flag_known_flaky_results(lit_results, cts_results):
+    """
+    Sets known_flaky on the given LIT and CTS results, True for results of tests
+    known to be flaky.
+    """
+    known_flaky_lit_tests, known_flaky_cts_tests = get_known_flaky_tests()
+    for result in lit_results:
+        result.known_flaky = result.test_path in known_flaky_lit_tests
+    for result in cts_results:
+        test = (result.test_category, result.test_name)
+        result.known_flaky = test in known_flaky_cts_tests
+
+
+def _is_flaky_result_pair(result_pair):
+    """
+    Checks whether a status change within a pair of flagged results is likely
+    noise, because the test is known to be flaky or was flaky in either job.
+    """
+    return any(
+        result and (result.known_flaky or result.is_flaky()) for result in result_pair
+    )
+
+
 @xframe_options_deny
 def job(request, pk):
     template = loader.get_template("job.html")
@@ -199,53 +341,127 @@ def job(request, pk):
     # Sanitize any strings.
     job.sanitize()
 
-    # Calculate passrate stats for all collected results.
-    lit_results_total = lit_results.count()
-    lit_results_passing = lit_results.filter(passing=True).count()
-    lit_results_failing = lit_results_total - lit_results_passing
-
-    cts_results_total = cts_results.count()
-    cts_results_passing = cts_results.filter(passing=True).count()
-    cts_results_failing = cts_results_total - cts_results_passing
+    # Flag results of known flaky tests and count the results that were flaky.
+    lit_results = list(lit_results)
+    cts_results = list(cts_results)
+    _flag_known_flaky_results(lit_results, cts_results)
+    lit_results_flaky = sum(result.is_flaky() for result in lit_results)
+    cts_results_flaky = sum(result.is_flaky() for result in cts_results)
 
     context = {
         "page_title": "Job " + str(job.pk),
         "job": job,
         "lit_results": lit_results,
         "cts_results": cts_results,
-        "lit_results_total": lit_results_total,
-        "lit_results_passing": lit_results_passing,
-        "lit_results_failing": lit_results_failing,
-        "cts_results_total": cts_results_total,
-        "cts_results_passing": cts_results_passing,
-        "cts_results_failing": cts_results_failing,
+        "lit_results_flaky": lit_results_flaky,
+        "cts_results_flaky": cts_results_flaky,
     }
     return HttpResponse(template.render(context, request))
 
 
+def _join_results(job1_results, job2_results, get_key):
+    """
+    Pairs up the results of two jobs by test key in one pass over each list. The
+    results of job 1 keep their order, results only in job 2 follow.
+    """
+    job2_results_by_key = {}
+    for result in job2_results:
+        job2_results_by_key.setdefault(get_key(result), result)
+
+    result_pairs = []
+    for result in job1_results:
+        result_pairs.append((result, job2_results_by_key.pop(get_key(result), None)))
+
+    for result in job2_results_by_key.values():
+        result_pairs.append((None, result))
+
+    return result_pairs
+
+
+def _compare_jobs(job1, job2):
+    """
+    Fetches the results of both jobs at once and joins them by test. Returns the
+    LIT and CTS result pairs.
+    """
+    lit_fields = ("test_path", "passing", "rerun_pass_count")
+    cts_fields = (
+        "test_category",
+        "test_name",
+        "passing",
+        "rerun_pass_count",
+        "rerun_passing",
+    )
+
+    results = {}
+    for name, job in (("job1", job1), ("job2", job2)):
+        results[name + "_lit"] = list(
+            LitResult.objects.filter(parent_job=job)
+            .order_by("date_added")
+            .only(*lit_fields)
+        )
+        results[name + "_cts"] = list(
+            CtsResult.objects.filter(parent_job=job)
+            .order_by("date_added")
+            .only(*cts_fields)
+        )
+
+    return {
+        "lit_result_pairs": _join_results(
+            results["job1_lit"], results["job2_lit"], lambda result: result.test_path
+        ),
+        "cts_result_pairs": _join_results(
+            results["job1_cts"],
+            results["job2_cts"],
+            lambda result: (result.test_category, result.test_name),
+        ),
+    }
+
+
+def _is_changed_result_pair(result_pair):
+    """
+    Checks whether a test passed in only one of the compared jobs or only ran in
+    one of them.
+    """
+    job1_result, job2_result = result_pair[:2]
+    if job1_result is None or job2_result is None:
+        return True
+    return job1_result.passing != job2_result.passing
+
+
+def _get_job_summary_key(job):
+    """
+    Get a cache key part identifying the job in its current status with its
+    current results.
+    """
+    # The result counters change with any added or removed result.
+    return "-".join(
+        str(value)
+        for value in [job.pk, job.status]
+        + [
+            getattr(job, field)
+            for field in Job.RESULT_SUMMARY_FIELDS
+            if field != "cts_results_duration"
+        ]
+    )
+
+
 @xframe_options_deny
 def job_compare(request, pk1, pk2):
     template = loader.get_template("job_compare.html")
 
     try:
-        job1 = Job.objects.get(pk=pk1)
-        job2 = Job.objects.get(pk=pk2)
+        job1 = Job.objects.select_related("revision").get(pk=pk1)
+        job2 = Job.objects.select_related("revision").get(pk=pk2)
     except Job.DoesNotExist:
         raise Http404("Job does not exist!")
 
+    only_differences = request.GET.get("differences") == "1"
+
     # Collect recent completed jobs available for comparison.
     recently = timezone.now() - timedelta(days=60)
     available_comparison_jobs = Job.objects.filter(
         primary_job=True, status=Job.Status.COMPLETED, date_added__gte=recently
-    )
-
-    # Get all test results for job 1.
-    job1_lit_results = LitResult.objects.filter(parent_job=job1).order_by("date_added")
-    job1_cts_results = CtsResult.objects.filter(parent_job=job1).order_by("date_added")
-
-    # Get all test results for job 2.
-    job2_lit_results = LitResult.objects.filter(parent_job=job2).order_by("date_added")
-    job2_cts_results = CtsResult.objects.filter(parent_job=job2).order_by("date_added")
+    ).select_related("revision")
 
     # Sanitize any strings.
     for job in available_comparison_jobs:
@@ -254,73 +470,110 @@ def job_compare(request, pk1, pk2):
     job1.sanitize()
     job2.sanitize()
 
-    # Calculate passrate stats for job 1.
-    job1_lit_results_total = job1_lit_results.count()
-    job1_lit_results_passing = job1_lit_results.filter(passing=True).count()
-    job1_lit_results_failing = job1_lit_results_total - job1_lit_results_passing
-
-    job1_cts_results_total = job1_cts_results.count()
-    job1_cts_results_passing = job1_cts_results.filter(passing=True).count()
-    job1_cts_results_failing = job1_cts_results_total - job1_cts_results_passing
-
-    # Calculate passrate stats for job 2.
-    job2_lit_results_total = job2_lit_results.count()
-    job2_lit_results_passing = job2_lit_results.filter(passing=True).count()
-    job2_lit_results_failing = job2_lit_results_total - job2_lit_results_passing
-
-    job2_cts_results_total = job2_cts_results.count()
-    job2_cts_results_passing = job2_cts_results.filter(passing=True).count()
-    job2_cts_results_failing = job2_cts_results_total - job2_cts_results_passing
-
-    # Collect LIT test result pairs for job 1 and job 2.
-    lit_result_pairs = []
-    job2_lit_results_paired = []
-    for job1_result in job1_lit_results:
-        job2_result = job2_lit_results.filter(test_path=job1_result.test_path).first()
-        lit_result_pairs.append((job1_result, job2_result))
-        job2_lit_results_paired.append(job2_result)
-
-    for job2_result in job2_lit_results:
-        if not job2_result in job2_lit_results_paired:
-            lit_result_pairs.append((None, job2_result))
-
-    # Collect CTS test result pairs for job 1 and job 2.
-    cts_result_pairs = []
-    job2_cts_results_paired = []
-    for job1_result in job1_cts_results:
-        job2_result = job2_cts_results.filter(
-            test_category=job1_result.test_category, test_name=job1_result.test_name
-        ).first()
-        cts_result_pairs.append((job1_result, job2_result))
-        job2_cts_results_paired.append(job2_result)
-
-    for job2_result in job2_cts_results:
-        if not job2_result in job2_cts_results_paired:
-            cts_result_pairs.append((None, job2_result))
+    # Only comparisons of finished jobs are cached, keyed by the result summaries
+    # of the jobs, so a comparison is computed again once any result changes.
+    if job1.status == Job.Status.COMPLETED and job2.status == Job.Status.COMPLETED:
+        comparison = caches["comparisons"].get_or_set(
+            "job_compare_"
+            + "_".join(_get_job_summary_key(job) for job in (job1, job2)),
+            lambda: _compare_jobs(job1, job2),
+        )
+    else:
+        comparison = _compare_jobs(job1, job2)
+
+    # Optionally keep only the tests whose status changed.
+    lit_result_pairs = comparison["lit_result_pairs"]
+    cts_result_pairs = comparison["cts_result_pairs"]
+    if only_differences:
+        lit_result_pairs = list(filter(_is_changed_result_pair, lit_result_pairs))
+        cts_result_pairs = list(filter(_is_changed_result_pair, cts_result_pairs))
+
+    lit_page_object = Paginator(lit_result_pairs, RESULT_PAIRS_PER_PAGE).get_page(
+        request.GET.get("lit_page")
+    )
+    cts_page_object = Paginator(cts_result_pairs, RESULT_PAIRS_PER_PAGE).get_page(
+        request.GET.get("cts_page")
+    )
+
+    # Flag the pairs whose status changes are likely noise.
+    _flag_known_flaky_results(
+        [result for pair in lit_page_object for result in pair if result],
+        [result for pair in cts_page_object for result in pair if result],
+    )
 
     context = {
         "page_title": "Job " + str(job1.pk) + ":" + str(job2.pk) + " compare",
         "job1": job1,
         "job2": job2,
-        "lit_result_pairs": lit_result_pairs,
-        "cts_result_pairs": cts_result_pairs,
-        "job1_lit_results_total": job1_lit_results_total,
-        "job1_lit_results_passing": job1_lit_results_passing,
-        "job1_lit_results_failing": job1_lit_results_failing,
-        "job1_cts_results_total": job1_cts_results_total,
-        "job1_cts_results_passing": job1_cts_results_passing,
-        "job1_cts_results_failing": job1_cts_results_failing,
-        "job2_lit_results_total": job2_lit_results_total,
-        "job2_lit_results_passing": job2_lit_results_passing,
-        "job2_lit_results_failing": job2_lit_results_failing,
-        "job2_cts_results_total": job2_cts_results_total,
-        "job2_cts_results_passing": job2_cts_results_passing,
-        "job2_cts_results_failing": job2_cts_results_failing,
+        "only_differences": only_differences,
+        "lit_page_object": lit_page_object,
+        "lit_result_pairs": [
+            pair + (_is_flaky_result_pair(pair),) for pair in lit_page_object
+        ],
+        "cts_page_object": cts_page_object,
+        "cts_result_pairs": [
+            pair + (_is_flaky_result_pair(pair),) for pair in cts_page_object
+        ],
         "available_comparison_jobs": available_comparison_jobs,
     }
     return HttpResponse(template.render(context, request))
 
 
+def _get_test_history_context(test_id, suite, results):
+    """
+    Get the context of a test history page with the results of the test across
+    main branch revisions sorted oldest first.
+    """
+    results = list(reversed(results))
+    for result in results:
+        result.sanitize()
+
+    return {
+        "page_title": "History of " + test_id,
+        "test_id": test_id,
+        "suite": suite,
+        "results": results,
+        "results_total": len(results),
+        "results_passing": sum(result.passing for result in results),
+        "results_flaky": sum(result.is_flaky() for result in results),
+    }
+
+
+@xframe_options_deny
+def lit_test_history(request, test_path):
+    template = loader.get_template("test_history.html")
+    context = _get_test_history_context(
+        test_path, "LIT", get_lit_test_history(test_path)
+    )
+    return HttpResponse(template.render(context, request))
+
+
+@xframe_options_deny
+def cts_test_history(request, test_category, test_name):
+    template = loader.get_template("test_history.html")
+    context = _get_test_history_context(
+        test_category + "/" + test_name,
+        "CTS",
+        get_cts_test_history(test_category, test_name),
+    )
+    context["results_timedout"] = sum(result.timedout for result in context["results"])
+    return HttpResponse(template.render(context, request))
+
+
+def _render_log_preview(text):
+    """
+    Render the sanitized beginning of a test output (up to the last full line
+    within LOG_PREVIEW_SIZE bytes) and get its size in bytes and the total size.
+    """
+    data = text.encode("utf-8")
+    preview = data[:LOG_PREVIEW_SIZE]
+    if len(data) > LOG_PREVIEW_SIZE and b"\n" in preview:
+        preview = preview[: preview.rfind(b"\n") + 1]
+
+    html = linebreaksbr(mark_safe(bleach.clean(preview.decode("utf-8", "ignore"))))
+    return {"html": str(html), "offset": len(preview), "size": len(data)}
+
+
 @xframe_options_deny
 def cts_result(request, pk):
     template = loader.get_template("cts_result.html")
@@ -333,11 +586,77 @@ def cts_result(request, pk):
     # Sanitize any strings.
     result.sanitize()
 
+    # Render the beginning of the test outputs once, the rest is loaded lazily.
+    logs = {}
+    for stream, field in LOG_FIELDS.items():
+        logs[stream] = cache.get_or_set(
+            "cts_result_log_preview_" + str(pk) + "_" + stream,
+            lambda: _render_log_preview(result.get_log(field)),
+            None,
+        )
+        logs[stream]["html"] = mark_safe(logs[stream]["html"])
+
     context = {
         "page_title": str(result),
         "result": result,
+        "stdout": logs["stdout"],
+        "stderr": logs["stderr"],
         "test_executable": result.test_executable[
             result.test_executable.find("/test_conformance") :
         ],
     }
     return HttpResponse(template.render(context, request))
+
+
+@xframe_options_deny
+@staff_member_required
+@require_POST
+def cts_result_request_output(request, pk):
+    try:
+        result = CtsResult.objects.get(pk=pk)
+    except CtsResult.DoesNotExist:
+        raise Http404("Result does not exist!")
+
+    # The runner keeping the full output uploads it after its current job.
+    if result.output_truncated and not result.full_output:
+        result.full_output_requested = True
+        result.save(update_fields=["full_output_requested"])
+
+    return HttpResponseRedirect(reverse("cts_result", args=[pk]))
+
+
+@xframe_options_deny
+def cts_result_log(request, pk, stream):
+    if stream not in LOG_FIELDS:
+        raise Http404("Log does not exist!")
+
+    try:
+        result = CtsResult.objects.get(pk=pk)
+    except CtsResult.DoesNotExist:
+        raise Http404("Result does not exist!")
+
+    content_type = "text/plain; charset=utf-8"
+
+    # Serve a single byte range if requested, only decompressing the output up to
+    # the end of the range. The total size is unknown if the output is longer.
+    match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+    if match:
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else None
+        valid = end is None or start <= end
+        size = end + 1 if valid and end is not None else None
+        data = result.get_log_prefix(LOG_FIELDS[stream], size)
+        if not valid or start >= len(data):
+            response = HttpResponse(status=416, content_type=content_type)
+            response["Content-Range"] = "bytes */" + str(len(data))
+            return response
+
+        total_size = "*" if size == len(data) else str(len(data))
+        response = HttpResponse(data[start:], status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{len(data) - 1}/{total_size}"
+    else:
+        data = result.get_log_prefix(LOG_FIELDS[stream])
+        response = HttpResponse(data, content_type=content_type)
+
+    response["Accept-Ranges"] = "bytes"
+    return response
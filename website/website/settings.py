@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -77,10 +78,48 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Runners call the API concurrently: wait for the database lock instead
+        # of failing. Jobs are claimed with conditional updates, so no job is
+        # dispatched twice whatever the locking.
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        # A file-backed test database gives every thread of live server tests
+        # its own connection, as with concurrent requests in production. It is
+        # kept out of the source tree.
+        'TEST': {
+            'NAME': os.path.join(tempfile.gettempdir(), 'website_test_db.sqlite3'),
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Job comparisons are large, so they are shared by all worker processes on
+    # disk and only a bounded number of them is kept.
+    'comparisons': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'website_comparisons'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100,
+        },
+    },
+}
+
+
+# Testing
+# https://docs.djangoproject.com/en/4.0/topics/testing/advanced/#defining-a-test-runner
+
+TEST_RUNNER = 'website.test_runner.ProjectTestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Apps of the project, their migrations are generated on deployment only
+PROJECT_APPS = ["fetcher", "dispatcher", "viewer"]
+
+
+class ProjectTestRunner(DiscoverRunner):
+    """
+    Test runner creating the tables of the project's apps straight from their
+    models, so "manage.py test" works without generating migrations locally.
+    """
+
+    def setup_databases(self, **kwargs):
+        with override_settings(MIGRATION_MODULES={app: None for app in PROJECT_APPS}):
+            return super().setup_databases(**kwargs)